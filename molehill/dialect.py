@@ -0,0 +1,32 @@
+from typing import List
+
+DIALECTS = ["hive", "presto"]
+
+
+def check_dialect(dialect: str) -> None:
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unknown dialect: {dialect}")
+
+
+def string_type(dialect: str) -> str:
+    """Name of string type for cast."""
+    check_dialect(dialect)
+    return "varchar" if dialect == "presto" else "string"
+
+
+def random(seed: int, dialect: str) -> str:
+    """Expression of a random number in [0, 1). Presto doesn't support a seed."""
+    check_dialect(dialect)
+    return "random()" if dialect == "presto" else f"rand({seed})"
+
+
+def stable_random(columns: List[str], dialect: str) -> str:
+    """Expression of a number in [0, 1) computed from a hash of columns, which is the same for a row on every run."""
+    check_dialect(dialect)
+    _values = ", '\\t', ".join(f"coalesce(cast({column} as {string_type(dialect)}), '')" for column in columns)
+    if dialect == "presto":
+        # Lower 53 bits of a 64 bit hash are exactly representable as a double
+        _hash = f"bitwise_and(from_big_endian_64(xxhash64(to_utf8(concat({_values})))), 9007199254740991)"
+        return f"cast({_hash} as double) / 9007199254740992"
+    # Hivemall mhash returns a feature index in [1, 2^24]
+    return f"(mhash(concat({_values})) - 1) / 16777216.0"
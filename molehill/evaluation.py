@@ -1,5 +1,7 @@
+import math
 import textwrap
-from typing import Union, List
+from collections import OrderedDict
+from typing import Union, List, Optional, Tuple
 from .utils import build_query
 
 
@@ -7,14 +9,42 @@ from .utils import build_query
 KNOWN_METRICS = {"logloss", "auc", "mse", "rmse", "mse", "mae", "r2", "fmeasure",
                  "average_precision", "hitrate", "ndcg", "precision_at", "recall_at"}
 # metrics molehill extended
-EXTENDED_METRICS = {"accuracy", "precision", "recall", "fmeasure_binary"}
+EXTENDED_METRICS = {"accuracy", "precision", "recall", "fmeasure_binary", "pr_auc"}
 PROBABILITY_REQUIRE_METRICS = {"logloss", "auc"}
+# metrics computed from a histogram of probabilities
+HISTOGRAM_METRICS = {"auc", "pr_auc"}
+DEFAULT_AUC_BINS = 10000
+# metrics computed from additive partial aggregations for leaderboard and bootstrap
+PARTIAL_METRICS = {"auc", "pr_auc", "logloss", "mse", "rmse", "mae", "r2", "accuracy", "precision", "recall"}
+
+
+_MSE = "sum(squared_error) / sum(n)"
+# Formulas of metrics from partial sums of :func:`_partial_sums`. auc and pr_auc require cumulative counts of bins.
+_PARTIAL_METRIC_FORMULAS = {
+    "auc": "sum(neg * (cum_pos - 0.5 * pos)) / (sum(pos) * sum(neg)) as auc",
+    "pr_auc": "sum(pos * cast(cum_pos as double) / (cum_pos + cum_neg)) / sum(pos) as pr_auc",
+    "logloss": "sum(log_loss) / sum(n) as logloss",
+    "mse": f"{_MSE} as mse",
+    "rmse": f"sqrt({_MSE}) as rmse",
+    "mae": "sum(absolute_error) / sum(n) as mae",
+    "r2": "1 - sum(squared_error) / (sum(target_squared_sum) - pow(sum(target_sum), 2) / sum(n)) as r2",
+    "accuracy": "cast(sum(true_positive) as double) / sum(n) as accuracy",
+    "precision": "cast(sum(true_positive) as double) / sum(predicted_positive) as \"precision\"",
+    "recall": "cast(sum(true_positive) as double) / sum(pos) as recall",
+}
+
+
+def _metric_column(metric: str) -> str:
+    """Refer a metric column. precision is quoted since a double-quoted name is a string literal in Hive."""
+    return "`precision`" if metric == "precision" else metric
 
 
 def _build_evaluate_clause(
-        metrics: List[str], scoring_template: str, inv_template: str, predicted_column: str, target_column: str):
+        metrics: List[str], scoring_template: str, inv_template: str, predicted_column: str, target_column: str,
+        target_alias: str = "t"):
 
-    true_positive = f"sum(if(p.{predicted_column} = t.{target_column} and t.{target_column} = 1, 1, 0))"
+    _target = f"{target_alias}.{target_column}"
+    true_positive = f"sum(if(p.{predicted_column} = {_target} and {_target} = 1, 1, 0))"
     _results = []
     for _metric in metrics:
         if _metric == "fmeasure":
@@ -36,7 +66,7 @@ def _build_evaluate_clause(
         elif _metric == "precision":
             _results.append(f"cast({true_positive} as double)/sum(if(p.{predicted_column} = 1, 1, 0)) as \"precision\"")
         elif _metric == "recall":
-            _results.append(f"cast({true_positive} as double)/sum(if(t.{target_column} = 1, 1, 0)) as recall")
+            _results.append(f"cast({true_positive} as double)/sum(if({_target} = 1, 1, 0)) as recall")
         else:
             _results.append(scoring_template.format_map({
                 "scoring": _metric, "predicted_column": predicted_column, "target_column": target_column
@@ -49,9 +79,12 @@ def evaluate(
         metrics: Union[str, List[str]],
         target_column: str,
         predicted_column: str,
-        target_table: str = "test",
+        target_table: Optional[str] = "test",
         prediction_table: str = "prediction",
-        id_column: str = "rowid") -> str:
+        id_column: str = "rowid",
+        auc_bins: Optional[int] = None,
+        bootstrap: Optional[int] = None,
+        confidence: float = 0.95) -> str:
     """Build evaluation query.
 
     Parameters
@@ -62,12 +95,22 @@ def evaluate(
         A table name for prediction results.
     predicted_column : :obj:`str`
         Predicted column name in a prediction table.
-    target_table : :obj:`str`
-        Test table name.
+    target_table : :obj:`str`, optional
+        Test table name. If None, target column is read from a prediction table built with
+        ``passthrough_columns`` of a predictor, and the prediction table isn't joined with a test table.
     target_column : :obj:`str`
         Target column name for actual value in a test table.
     id_column : :obj:`str`
         Id column name to join prediction and test table.
+    auc_bins : int, optional
+        The number of probability bins to compute auc and pr_auc from a histogram without a global sort.
+        Pairs of positive and negative examples in the same bin are counted as ties, so the error is bounded
+        by the ratio of such pairs. pr_auc always uses a histogram with 10000 bins by default.
+    bootstrap : int, optional
+        The number of bootstrap replicates. If set, "{metric}_lower" and "{metric}_upper" percentile
+        intervals are computed in a single pass with Poisson(1) weights of each row per replicate.
+    confidence : float
+        Confidence level of bootstrap intervals. Default: 0.95
 
     Returns
     -------
@@ -83,7 +126,18 @@ def evaluate(
 
         raise ValueError("Unknown metric: {}".format(", ".join(unknown_metrics)))
 
+    if bootstrap:
+        return _evaluate_with_bootstrap(
+            _metrics, target_column, predicted_column, target_table, prediction_table, id_column,
+            auc_bins, bootstrap, confidence)
+
+    if auc_bins or "pr_auc" in _metrics:
+        return _evaluate_with_histogram(
+            _metrics, target_column, predicted_column, target_table, prediction_table, id_column,
+            auc_bins or DEFAULT_AUC_BINS)
+
     has_auc = 'auc' in _metrics
+    _alias = "t" if target_table else "p"
 
     if has_auc:
         scoring_template = "{scoring}({predicted_column}, {target_column}) as {scoring}"
@@ -91,13 +145,11 @@ def evaluate(
 
         evaluations = _build_evaluate_clause(_metrics, scoring_template, inv_template, predicted_column, target_column)
 
-        select_clause = f"p.{predicted_column}, t.{target_column}"
+        select_clause = f"p.{predicted_column}, {_alias}.{target_column}"
 
-        cond = textwrap.dedent("""\
-        join
-          {test} t on (p.{id} = t.{id})
-        order by
-          probability desc""".format_map({"test": target_table, "id": id_column}))
+        cond = "order by\n  probability desc"
+        if target_table:
+            cond = f"join\n  {target_table} t on (p.{id_column} = t.{id_column})\n" + cond
 
         return build_query(
             evaluations,
@@ -112,14 +164,488 @@ def evaluate(
         )
 
     else:
-        scoring_template = "{scoring}(p.{predicted_column}, t.{target_column}) as {scoring}"
-        inv_template = "{scoring}(t.{target_column}, p.{predicted_column}) as {scoring}"
+        scoring_template = "{scoring}(p.{predicted_column}, %s.{target_column}) as {scoring}" % _alias
+        inv_template = "{scoring}(%s.{target_column}, p.{predicted_column}) as {scoring}" % _alias
 
         # TODO: Handle option for scoring
-        evaluations = _build_evaluate_clause(_metrics, scoring_template, inv_template, predicted_column, target_column)
+        evaluations = _build_evaluate_clause(
+            _metrics, scoring_template, inv_template, predicted_column, target_column, _alias)
 
-        cond = textwrap.dedent(f"""\
-        join
-          {target_table} t on (p.{id_column} = t.{id_column})""")
+        cond = None
+        if target_table:
+            cond = textwrap.dedent(f"""\
+            join
+              {target_table} t on (p.{id_column} = t.{id_column})""")
 
         return build_query(evaluations, f"{prediction_table} p", cond)
+
+
+def _evaluate_with_histogram(
+        metrics: List[str],
+        target_column: str,
+        predicted_column: str,
+        target_table: Optional[str],
+        prediction_table: str,
+        id_column: str,
+        auc_bins: int) -> str:
+    """Build evaluation query computing auc and pr_auc from cumulative counts of a probability histogram."""
+
+    if auc_bins < 1:
+        raise ValueError("auc_bins should be positive.")
+
+    _alias = "t" if target_table else "p"
+    _join = f"join\n  {target_table} t on (p.{id_column} = t.{id_column})" if target_table else None
+    _bin = f"least(floor(p.probability * {auc_bins}), {auc_bins - 1})"
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["histogram"] = build_query(
+        [f"{_bin} as bin",
+         f"sum(if({_alias}.{target_column} = 1, 1, 0)) as pos",
+         f"sum(if({_alias}.{target_column} = 1, 0, 1)) as neg"],
+        f"{prediction_table} p",
+        "\n".join(filter(None, [_join, f"group by\n  {_bin}"])),
+        without_semicolon=True)
+
+    # Window functions sort only bins, not examples
+    _window = "over (order by bin desc rows between unbounded preceding and current row)"
+    _with_clauses["cumulative"] = build_query(
+        ["pos", "neg", f"sum(pos) {_window} as cum_pos", f"sum(neg) {_window} as cum_neg"],
+        "histogram",
+        without_semicolon=True)
+    _with_clauses["curve"] = build_query(
+        ["sum(neg * (cum_pos - 0.5 * pos)) / (sum(pos) * sum(neg)) as auc",
+         "sum(pos * cast(cum_pos as double) / (cum_pos + cum_neg)) / sum(pos) as pr_auc"],
+        "cumulative",
+        without_semicolon=True)
+
+    _source = "curve c"
+    other_metrics = [metric for metric in metrics if metric not in HISTOGRAM_METRICS]
+    if other_metrics:
+        scoring_template = "{scoring}(p.{predicted_column}, %s.{target_column}) as {scoring}" % _alias
+        inv_template = "{scoring}(%s.{target_column}, p.{predicted_column}) as {scoring}" % _alias
+        _with_clauses["scores"] = build_query(
+            _build_evaluate_clause(
+                other_metrics, scoring_template, inv_template, predicted_column, target_column, _alias),
+            f"{prediction_table} p",
+            _join,
+            without_semicolon=True)
+        _source += "\ncross join scores s"
+
+    _select_clauses = []
+    for metric in metrics:
+        if metric in HISTOGRAM_METRICS:
+            _select_clauses.append(f"c.{metric}")
+        else:
+            _select_clauses.append(f"s.{_metric_column(metric)}")
+
+    return build_query(_select_clauses, _source, with_clauses=_with_clauses)
+
+
+def _poisson_weight(uniform: str, max_weight: int = 7) -> str:
+    """Build an expression of a Poisson(1) random number from a uniform random number in [0, 1)."""
+
+    _cases = []
+    cdf = 0.0
+    for k in range(max_weight):
+        cdf += math.exp(-1) / math.factorial(k)
+        _cases.append(f"when {uniform} < {cdf:.6f} then {k}")
+
+    return "case {} else {} end".format(" ".join(_cases), max_weight)
+
+
+def _evaluate_with_bootstrap(
+        metrics: List[str],
+        target_column: str,
+        predicted_column: str,
+        target_table: Optional[str],
+        prediction_table: str,
+        id_column: str,
+        auc_bins: Optional[int],
+        bootstrap: int,
+        confidence: float) -> str:
+    """Build evaluation query with bootstrap percentile intervals.
+
+    Each row is replicated with posexplode and weighted by a Poisson(1) random number generated from
+    a hash of id and replicate, so replicates are computed from a single scan of predictions.
+    Replicate 0 has weight 1 for point estimates.
+    """
+
+    unsupported_metrics = [metric for metric in metrics if metric not in PARTIAL_METRICS]
+    if unsupported_metrics:
+        raise ValueError("Unsupported metric for bootstrap: {}".format(", ".join(unsupported_metrics)))
+    if bootstrap < 1:
+        raise ValueError("bootstrap should be positive.")
+    if not 0.0 < confidence < 1.0:
+        raise ValueError("confidence should be in (0, 1).")
+
+    _target = f"t.{target_column}" if target_table else f"p.{target_column}"
+    _join = f"join\n  {target_table} t on (p.{id_column} = t.{id_column})" if target_table else None
+    _uniform = f"(mhash(concat(cast(p.{id_column} as string), ':', cast(r.replicate as string))) - 1) / 16777216.0"
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["labeled"] = build_query(
+        [f"p.{id_column}", f"p.{predicted_column} as predicted", f"{_target} as target"],
+        f"{prediction_table} p",
+        _join,
+        without_semicolon=True)
+    _with_clauses["sampled"] = build_query(
+        ["r.replicate", "p.predicted", "p.target", f"{_uniform} as uniform"],
+        f"labeled p\nLATERAL VIEW posexplode(split(space({bootstrap}), ' ')) r as replicate, x",
+        without_semicolon=True)
+    _with_clauses["replicated"] = build_query(
+        ["replicate", "predicted", "target", f"if(replicate = 0, 1, {_poisson_weight('uniform')}) as weight"],
+        "sampled",
+        without_semicolon=True)
+
+    _select_clauses, _metrics_source = _aggregate_partial_metrics(
+        _with_clauses, metrics, "replicate", "replicated p", None, "p.target", auc_bins, weight="p.weight")
+    _with_clauses["replicate_metrics"] = build_query(
+        _select_clauses, _metrics_source, "group by\n  replicate", without_semicolon=True)
+
+    _lower = (1.0 - confidence) / 2
+    _upper = 1.0 - _lower
+    _results = []
+    for metric in metrics:
+        _metric = _metric_column(metric)
+        _results.extend([
+            f"max(if(replicate = 0, {_metric}, null)) as {_metric}",
+            f"percentile_approx(if(replicate > 0, {_metric}, null), {_lower:g}) as {metric}_lower",
+            f"percentile_approx(if(replicate > 0, {_metric}, null), {_upper:g}) as {metric}_upper"])
+
+    return build_query(_results, "replicate_metrics", with_clauses=_with_clauses)
+
+
+def leaderboard(
+        metrics: Union[str, List[str]],
+        target_column: str,
+        predictions: List[Tuple[str, str, str]],
+        target_table: Optional[str] = "test",
+        id_column: str = "rowid",
+        auc_bins: Optional[int] = None) -> str:
+    """Build a query to evaluate multiple predictions with one join of test labels.
+
+    Prediction tables are unioned with a model name and joined with the test table once.
+    Metrics are aggregated per model and probability bin into additive partial sums,
+    and then combined per model.
+
+    Parameters
+    ----------
+    metrics : :obj:`str` or :obj:`list` of :obj:`str`
+        Metrics for evaluation. Supported metrics are auc, pr_auc, logloss, mse, rmse, mae, r2,
+        accuracy, precision and recall.
+    target_column : :obj:`str`
+        Target column name for actual value in a test table.
+    predictions : :obj:`list` of :obj:`tuple`
+        A list of (model name, prediction table, predicted column) tuples.
+    target_table : :obj:`str`, optional
+        Test table name. If None, target column is read from prediction tables.
+    id_column : :obj:`str`
+        Id column name to join prediction and test table.
+    auc_bins : int, optional
+        The number of probability bins for auc and pr_auc. Default: 10000
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns a row per model.
+    """
+
+    _metrics = [metrics] if isinstance(metrics, str) else metrics
+    _metrics = [metric.lower() for metric in _metrics]
+
+    unsupported_metrics = [metric for metric in _metrics if metric not in PARTIAL_METRICS]
+    if unsupported_metrics:
+        raise ValueError("Unsupported metric for leaderboard: {}".format(", ".join(unsupported_metrics)))
+    if len(predictions) == 0:
+        raise ValueError("predictions should not be empty.")
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _carried_target = [] if target_table else [target_column]
+    _with_clauses["predictions"] = "\nunion all\n".join(
+        build_query([f"'{model}' as model", id_column] + _carried_target + [f"{predicted_column} as predicted"],
+                    table, without_semicolon=True)
+        for model, table, predicted_column in predictions)
+
+    _target = f"t.{target_column}" if target_table else f"p.{target_column}"
+    _join = f"join\n  {target_table} t on (p.{id_column} = t.{id_column})" if target_table else None
+    _select_clauses, _source = _aggregate_partial_metrics(
+        _with_clauses, _metrics, "model", "predictions p", _join, _target, auc_bins)
+
+    return build_query(
+        _select_clauses,
+        _source,
+        "group by\n  model",
+        with_clauses=_with_clauses)
+
+
+def _aggregate_partial_metrics(
+        with_clauses: OrderedDict,
+        metrics: List[str],
+        group_column: str,
+        source: str,
+        join: Optional[str],
+        target: str,
+        auc_bins: Optional[int],
+        weight: Optional[str] = None) -> Tuple[List[str], str]:
+    """Add CTEs aggregating additive partial sums per group and probability bin to with_clauses.
+
+    Source should be aliased as p and have group_column and predicted columns. Rows are counted
+    with weight if it's given. It returns select clauses of metrics per group and their source,
+    which should be grouped by group_column.
+    """
+
+    _partials = _partial_sums(target, weight)
+    _partial_names = [clause.rsplit(" as ", 1)[1] for clause in _partials]
+
+    _group_by = f"p.{group_column}"
+    _source = "histogram"
+    use_histogram = bool(set(metrics) & HISTOGRAM_METRICS)
+    if use_histogram:
+        _bins = auc_bins or DEFAULT_AUC_BINS
+        _bin = f"least(floor(p.predicted * {_bins}), {_bins - 1})"
+        _partials.insert(0, f"{_bin} as bin")
+        _group_by += f", {_bin}"
+
+    with_clauses["histogram"] = build_query(
+        [f"p.{group_column}"] + _partials,
+        source,
+        "\n".join(filter(None, [join, f"group by\n  {_group_by}"])),
+        without_semicolon=True)
+
+    if use_histogram:
+        # Window functions sort only bins per group, not examples
+        _window = (f"over (partition by {group_column} order by bin desc"
+                   " rows between unbounded preceding and current row)")
+        with_clauses["cumulative"] = build_query(
+            [group_column] + _partial_names + [f"sum(pos) {_window} as cum_pos", f"sum(neg) {_window} as cum_neg"],
+            "histogram",
+            without_semicolon=True)
+        _source = "cumulative"
+
+    return [group_column] + [_PARTIAL_METRIC_FORMULAS[metric] for metric in metrics], _source
+
+
+def _partial_sums(target: str, weight: Optional[str] = None) -> List[str]:
+    """Build additive partial sums of a source aliased as p with a predicted column."""
+
+    _w = weight or "1"
+    _weighted = f"{weight} * " if weight else ""
+    _probability = "greatest(least(p.predicted, 1.0 - 1e-15), 1e-15)"
+    _true_positive = f"if(p.predicted = {target} and {target} = 1, {_w}, 0)"
+    return [
+        f"sum({weight}) as n" if weight else "count(1) as n",
+        f"sum(if({target} = 1, {_w}, 0)) as pos",
+        f"sum(if({target} = 1, 0, {_w})) as neg",
+        f"sum({_weighted}-({target} * ln({_probability}) + (1 - {target}) * ln(1 - {_probability}))) as log_loss",
+        f"sum({_weighted}pow(p.predicted - {target}, 2)) as squared_error",
+        f"sum({_weighted}abs(p.predicted - {target})) as absolute_error",
+        f"sum({_weighted}{target}) as target_sum",
+        f"sum({_weighted}pow({target}, 2)) as target_squared_sum",
+        f"sum({_true_positive}) as true_positive",
+        f"sum(if(p.predicted = 1, {_w}, 0)) as predicted_positive"
+    ]
+
+
+def evaluate_slices(
+        metrics: Union[str, List[str]],
+        target_column: str,
+        predicted_column: str,
+        slice_columns: List[str],
+        target_table: Optional[str] = "test",
+        prediction_table: str = "prediction",
+        id_column: str = "rowid",
+        auc_bins: Optional[int] = None) -> str:
+    """Build a query to evaluate predictions per value of slice columns with GROUPING SETS.
+
+    Metrics of all slices and overall metrics are aggregated in one scan, and written in long format
+    with slice_column, slice_value, num_rows, metric and value columns. slice_column of overall metrics is "overall".
+
+    Parameters
+    ----------
+    metrics : :obj:`str` or :obj:`list` of :obj:`str`
+        Metrics for evaluation. Supported metrics are auc, pr_auc, logloss, mse, rmse, mae, r2,
+        accuracy, precision and recall.
+    target_column : :obj:`str`
+        Target column name for actual value in a test table.
+    predicted_column : :obj:`str`
+        Predicted column name in a prediction table.
+    slice_columns : :obj:`list` of :obj:`str`
+        Column names to slice predictions. They should be categorical.
+    target_table : :obj:`str`, optional
+        Test table name with slice columns. If None, target and slice columns are read from a prediction table.
+    prediction_table : :obj:`str`
+        A table name for prediction results.
+    id_column : :obj:`str`
+        Id column name to join prediction and test table.
+    auc_bins : int, optional
+        The number of probability bins for auc and pr_auc. Default: 10000
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns a row per slice and metric.
+    """
+
+    _metrics = [metrics] if isinstance(metrics, str) else metrics
+    _metrics = [metric.lower() for metric in _metrics]
+
+    unsupported_metrics = [metric for metric in _metrics if metric not in PARTIAL_METRICS]
+    if unsupported_metrics:
+        raise ValueError("Unsupported metric for slices: {}".format(", ".join(unsupported_metrics)))
+    if len(slice_columns) == 0:
+        raise ValueError("slice_columns should not be empty.")
+
+    _alias = "t" if target_table else "p"
+    _join = f"join\n  {target_table} t on (p.{id_column} = t.{id_column})" if target_table else None
+    use_histogram = bool(set(_metrics) & HISTOGRAM_METRICS)
+    _bins = auc_bins or DEFAULT_AUC_BINS
+    _bin = [f"least(floor(p.{predicted_column} * {_bins}), {_bins - 1}) as bin"] if use_histogram else []
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["labeled"] = build_query(
+        [f"{_alias}.{column}" for column in slice_columns]
+        + [f"p.{predicted_column} as predicted", f"{_alias}.{target_column} as target"] + _bin,
+        f"{prediction_table} p",
+        _join,
+        without_semicolon=True)
+
+    # Rolled up slice columns are distinguished from NULL values with grouping()
+    _slice_column = "case {} else 'overall' end as slice_column".format(
+        " ".join(f"when grouping({column}) = 0 then '{column}'" for column in slice_columns))
+    _slice_value = "case {} end as slice_value".format(
+        " ".join(f"when grouping({column}) = 0 then cast({column} as string)" for column in slice_columns))
+    _bin_column = ["bin"] if use_histogram else []
+    _grouping_sets = [[column] + _bin_column for column in slice_columns] + [_bin_column]
+    _grouping_sets_clause = ", ".join("({})".format(", ".join(columns)) for columns in _grouping_sets)
+    _with_clauses["histogram"] = build_query(
+        [_slice_column, _slice_value] + _bin_column + _partial_sums("p.target"),
+        "labeled p",
+        "group by\n  {}\n  grouping sets ({})".format(", ".join(slice_columns + _bin_column), _grouping_sets_clause),
+        without_semicolon=True)
+
+    _source = "histogram"
+    if use_histogram:
+        _window = ("over (partition by slice_column, slice_value order by bin desc"
+                   " rows between unbounded preceding and current row)")
+        _with_clauses["cumulative"] = build_query(
+            ["slice_column", "slice_value"] + [clause.rsplit(" as ", 1)[1] for clause in _partial_sums("p.target")]
+            + [f"sum(pos) {_window} as cum_pos", f"sum(neg) {_window} as cum_neg"],
+            "histogram",
+            without_semicolon=True)
+        _source = "cumulative"
+
+    _map = ", ".join("'{}', {}".format(metric, _PARTIAL_METRIC_FORMULAS[metric].rsplit(" as ", 1)[0])
+                     for metric in _metrics)
+    _with_clauses["sliced_metrics"] = build_query(
+        ["slice_column", "slice_value", "sum(n) as num_rows", f"map({_map}) as metrics"],
+        _source,
+        "group by\n  slice_column, slice_value",
+        without_semicolon=True)
+
+    return build_query(
+        ["slice_column", "slice_value", "num_rows", "m.metric", "m.value"],
+        "sliced_metrics\nLATERAL VIEW explode(metrics) m as metric, value",
+        with_clauses=_with_clauses)
+
+
+def evaluate_thresholds(
+        target_column: str,
+        predicted_column: str = "probability",
+        target_table: Optional[str] = "test",
+        prediction_table: str = "prediction",
+        id_column: str = "rowid",
+        bins: int = 100) -> str:
+    """Build a query to compute metrics at every threshold from a histogram of probabilities.
+
+    Predictions are aggregated into probability bins once, and precision, recall, F1 and accuracy
+    at each threshold, calibration and lift/gain are derived from cumulative counts of the bins.
+
+    Parameters
+    ----------
+    target_column : :obj:`str`
+        Target column name for actual value. It should be 0 or 1.
+    predicted_column : :obj:`str`
+        Predicted probability column name in a prediction table. Default: "probability"
+    target_table : :obj:`str`, optional
+        Test table name. If None, target column is read from a prediction table.
+    prediction_table : :obj:`str`
+        A table name for prediction results.
+    id_column : :obj:`str`
+        Id column name to join prediction and test table.
+    bins : int
+        The number of probability bins. Thresholds are lower bounds of bins. Default: 100
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns a row per non-empty bin, ordered by threshold.
+    """
+
+    if bins < 1:
+        raise ValueError("bins should be positive.")
+
+    _target = f"t.{target_column}" if target_table else f"p.{target_column}"
+    _join = f"join\n  {target_table} t on (p.{id_column} = t.{id_column})\n" if target_table else ""
+    _bin = f"least(floor(p.{predicted_column} * {bins}), {bins - 1})"
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["histogram"] = build_query(
+        [f"{_bin} as bin",
+         "count(1) as n",
+         f"sum(if({_target} = 1, 1, 0)) as pos",
+         f"sum(p.{predicted_column}) as sum_probability"],
+        f"{prediction_table} p",
+        f"{_join}group by\n  {_bin}",
+        without_semicolon=True)
+
+    # Examples in bins at or above a threshold are predicted as positive
+    _window = "over (order by bin desc rows between unbounded preceding and current row)"
+    _with_clauses["cumulative"] = build_query(
+        ["bin", "n", "pos", "sum_probability",
+         f"sum(n) {_window} as cum_n",
+         f"sum(pos) {_window} as tp",
+         f"sum(n - pos) {_window} as fp",
+         "sum(n) over () as total",
+         "sum(pos) over () as total_pos"],
+        "histogram",
+        without_semicolon=True)
+
+    return build_query(
+        [f"cast(bin as double) / {bins} as threshold",
+         "n",
+         "cast(tp as double) / (tp + fp) as \"precision\"",
+         "cast(tp as double) / total_pos as recall",
+         "2.0 * tp / (cum_n + total_pos) as f1",
+         "cast(tp + (total - total_pos) - fp as double) / total as accuracy",
+         "sum_probability / n as mean_probability",
+         "cast(pos as double) / n as positive_rate",
+         "cast(cum_n as double) / total as depth",
+         "(cast(tp as double) / cum_n) / (cast(total_pos as double) / total) as lift"],
+        "cumulative",
+        "order by\n  threshold",
+        with_clauses=_with_clauses)
+
+
+def best_threshold(threshold_table: str, metric: str = "f1") -> str:
+    """Build a query to choose the threshold maximizing a metric of :func:`evaluate_thresholds` output.
+
+    Parameters
+    ----------
+    threshold_table : :obj:`str`
+        A table name of :func:`evaluate_thresholds` output.
+    metric : :obj:`str`
+        Metric to be maximized. Default: "f1"
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns a row of threshold, precision, recall, f1 and accuracy.
+    """
+
+    if metric not in ["precision", "recall", "f1", "accuracy"]:
+        raise ValueError(f"Unsupported metric for threshold: {metric}")
+
+    return build_query(
+        ["threshold", _metric_column("precision"), "recall", "f1", "accuracy"],
+        threshold_table,
+        f"order by\n  {_metric_column(metric)} desc, threshold\nlimit 1")
@@ -11,12 +11,14 @@ def main():
     parser.add_argument('--dest', type=str,
                         help='output file name')
     parser.add_argument('--overwrite', action='store_true', help='overwrite existing file/dir')
+    parser.add_argument('--mode', type=str, choices=['train', 'score'], default='train',
+                        help='train: dump a train workflow, score: dump a scoring workflow with stored models')
 
     args = parser.parse_args()
 
     print(f"Start converting: {args.yaml}")
     pipe = Pipeline()
-    pipe.dump_pipeline(args.yaml, args.dest, overwrite=args.overwrite)
+    pipe.dump_pipeline(args.yaml, args.dest, overwrite=args.overwrite, mode=args.mode)
     print(f"Finish dump file: {pipe.workflow_path}")
 
 
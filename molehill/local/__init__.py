@@ -0,0 +1,4 @@
+from .engine import LocalEngine
+from .rewriter import rewrite_query, substitute
+from .runner import WorkflowRunner
+from .numpy_engine import NumpyEngine, load_columns, save_columns
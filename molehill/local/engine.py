@@ -0,0 +1,194 @@
+import sqlite3
+import sys
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from .functions import SCALAR_FUNCTIONS, AGGREGATE_FUNCTIONS, RandomGenerator, RowId
+from .rewriter import rewrite_query
+
+
+class LocalEngine:
+    """Execute queries built by molehill with SQLite and Python implementations of Hivemall functions.
+
+    It's meant for fast iteration and testing on sampled data, not for large data.
+    Arrays are stored as JSON text.
+
+    Parameters
+    ----------
+    database : :obj:`str`
+        SQLite database path. Default: ":memory:"
+
+    Attributes
+    ----------
+    max_workers : int, optional
+        The number of tasks which can run concurrently with :meth:`run_task`, or None for no limit.
+        An in-memory database is a single connection, so tasks run one by one.
+        A file database has a connection per thread, and only writing results is serialized.
+    """
+
+    def __init__(self, database: str = ":memory:") -> None:
+        self.database = database
+        self.max_workers = 1 if database == ":memory:" else None  # type: Optional[int]
+        # Non deterministic functions keep their states per engine
+        self._rand = RandomGenerator()
+        self._rowid = RowId()
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._shared = self._connect() if self.max_workers == 1 else None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Connection of the current thread."""
+        if self._shared is not None:
+            return self._shared
+        if getattr(self._local, "connection", None) is None:
+            self._local.connection = self._connect()
+        return self._local.connection
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections of a file database wait for each other's writes instead of failing
+        connection = sqlite3.connect(self.database, check_same_thread=False, timeout=600)
+        connection.row_factory = sqlite3.Row
+        if self.max_workers != 1:
+            # Readers don't block a writer and vice versa
+            connection.execute("pragma journal_mode=wal")
+
+        # deterministic flag, which lets SQLite reuse results, is available since Python 3.8
+        _options = {"deterministic": True} if sys.version_info >= (3, 8) else {}
+        for name, func, num_args in SCALAR_FUNCTIONS:
+            connection.create_function(name, num_args, func, **_options)
+        for name, aggregate, num_args in AGGREGATE_FUNCTIONS:
+            connection.create_aggregate(name, num_args, aggregate)
+        connection.create_function("rand", -1, self._rand)
+        connection.create_function("rowid", 0, self._rowid)
+        return connection
+
+    def load_rows(self, table: str, columns: List[str], rows: Iterable[Sequence[Any]]) -> None:
+        """Create a table from rows. An existing table is replaced.
+
+        Parameters
+        ----------
+        table : :obj:`str`
+            Table name.
+        columns : :obj:`list` of :obj:`str`
+            Column names.
+        rows : iterable of sequence
+            Rows of values in the order of columns.
+        """
+
+        self.connection.execute(f"drop table if exists {table}")
+        self.connection.execute("create table {} ({})".format(table, ", ".join(columns)))
+        self.connection.executemany(
+            "insert into {} values ({})".format(table, ", ".join("?" * len(columns))), rows)
+        self.connection.commit()
+
+    def execute(self, query: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Execute a query built by molehill and return rows.
+
+        Parameters
+        ----------
+        query : :obj:`str`
+            Query built by molehill.
+        params : :obj:`dict`, optional
+            Digdag parameters, e.g. {"source": "titanic", "td": {"last_results": {...}}}.
+
+        Returns
+        -------
+        :obj:`list` of :obj:`dict`
+            Rows of the result.
+        """
+
+        cursor = self.connection.execute(rewrite_query(query, params))
+        return [dict(row) for row in cursor.fetchall()]
+
+    def create_table(self, table: str, query: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """Execute a query and store the result like "create_table" of td> operator.
+
+        Parameters
+        ----------
+        table : :obj:`str`
+            Table name. An existing table is replaced.
+        query : :obj:`str`
+            Query built by molehill.
+        params : :obj:`dict`, optional
+            Digdag parameters.
+        """
+
+        self.connection.execute(f"drop table if exists {table}")
+        self.connection.execute(f"create table {table} as\n{rewrite_query(query, params)}")
+        self.connection.commit()
+
+    def insert_into(self, table: str, query: str, params: Optional[Dict[str, Any]] = None) -> None:
+        """Execute a query and append the result like "insert_into" of td> operator."""
+
+        self.connection.execute(f"insert into {table}\n{rewrite_query(query, params)}")
+        self.connection.commit()
+
+    def fetch_table(self, table: str) -> List[Dict[str, Any]]:
+        """Fetch all rows of a table."""
+        return [dict(row) for row in self.connection.execute(f"select * from {table}").fetchall()]
+
+    def run_task(
+            self,
+            query: Optional[str],
+            config: Dict[str, Any],
+            params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """Run a td> or td_ddl> task. It can be used as an executor of :class:`WorkflowRunner`.
+
+        Parameters
+        ----------
+        query : :obj:`str`, optional
+            Query of a td> task. None for a td_ddl> task.
+        config : :obj:`dict`
+            Task configuration, e.g. {"create_table": "titanic_train"}.
+        params : :obj:`dict`, optional
+            Digdag parameters.
+
+        Returns
+        -------
+        :obj:`list` of :obj:`dict`
+            Rows of the result. Empty if the result is stored into a table.
+        """
+
+        if self.max_workers == 1 or query is None:
+            with self._lock:
+                return self._run_task(query, config, params)
+
+        # Results are computed concurrently on the connection of this thread, and only writing them is serialized
+        table = config.get("create_table") or config.get("insert_into")
+        cursor = self.connection.execute(rewrite_query(query, params))
+        if not table:
+            return [dict(row) for row in cursor.fetchall()]
+        columns = [column[0] for column in cursor.description]
+        rows = cursor.fetchall()
+        with self._lock:
+            if config.get("create_table"):
+                self.connection.execute(f"drop table if exists {table}")
+                self.connection.execute("create table {} ({})".format(table, ", ".join(f'"{c}"' for c in columns)))
+            self.connection.executemany(
+                "insert into {} values ({})".format(table, ", ".join("?" * len(columns))), rows)
+            self.connection.commit()
+        return []
+
+    def _run_task(
+            self,
+            query: Optional[str],
+            config: Dict[str, Any],
+            params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        if query is None:
+            self._run_ddl(config)
+            return []
+        if config.get("create_table"):
+            self.create_table(config["create_table"], query, params)
+            return []
+        if config.get("insert_into"):
+            self.insert_into(config["insert_into"], query, params)
+            return []
+        return self.execute(query, params)
+
+    def _run_ddl(self, config: Dict[str, Any]) -> None:
+        for table in config.get("drop_tables", []):
+            self.connection.execute(f"drop table if exists {table}")
+        for rename in config.get("rename_tables", []):
+            self.connection.execute(f"drop table if exists {rename['to']}")
+            self.connection.execute(f"alter table {rename['from']} rename to {rename['to']}")
+        self.connection.commit()
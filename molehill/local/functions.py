@@ -0,0 +1,416 @@
+import itertools
+import json
+import math
+import random
+import re
+import shlex
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Hive arrays are stored as JSON text in SQLite
+NUM_FEATURES = 2 ** 24
+MURMUR3_SEED = 0x9747b28c
+
+
+def to_array(value: Optional[str]) -> List[Any]:
+    """Load an array stored as JSON text."""
+    if value is None:
+        return []
+    return json.loads(value)
+
+
+def from_array(values: List[Any]) -> str:
+    """Store an array as JSON text."""
+    return json.dumps(values)
+
+
+def murmurhash3_32(data: str, seed: int = MURMUR3_SEED) -> int:
+    """MurmurHash3 x86 32-bit hash of a UTF-8 string as an unsigned int."""
+    key = data.encode("utf-8")
+    c1, c2 = 0xcc9e2d51, 0x1b873593
+    h = seed & 0xffffffff
+    rounded_end = len(key) & ~0x3
+
+    for i in range(0, rounded_end, 4):
+        k = int.from_bytes(key[i:i + 4], "little")
+        k = (k * c1) & 0xffffffff
+        k = ((k << 15) | (k >> 17)) & 0xffffffff
+        k = (k * c2) & 0xffffffff
+        h ^= k
+        h = ((h << 13) | (h >> 19)) & 0xffffffff
+        h = (h * 5 + 0xe6546b64) & 0xffffffff
+
+    k = 0
+    tail = key[rounded_end:]
+    if len(tail) == 3:
+        k ^= tail[2] << 16
+    if len(tail) >= 2:
+        k ^= tail[1] << 8
+    if len(tail) >= 1:
+        k ^= tail[0]
+        k = (k * c1) & 0xffffffff
+        k = ((k << 15) | (k >> 17)) & 0xffffffff
+        k = (k * c2) & 0xffffffff
+        h ^= k
+
+    h ^= len(key)
+    h ^= h >> 16
+    h = (h * 0x85ebca6b) & 0xffffffff
+    h ^= h >> 13
+    h = (h * 0xc2b2ae35) & 0xffffffff
+    h ^= h >> 16
+    return h
+
+
+def mhash(word: Any, num_features: int = NUM_FEATURES) -> Optional[int]:
+    """Feature index in [1, num_features] computed like Hivemall with Java's signed int remainder."""
+    if word is None:
+        return None
+    h = murmurhash3_32(str(word))
+    h = h - 2 ** 32 if h >= 2 ** 31 else h
+    # Java % truncates toward zero, and Hivemall adds num_features to a negative remainder
+    r = -(-h % num_features) if h < 0 else h % num_features
+    return (r + num_features if r < 0 else r) + 1
+
+
+def _format_value(value: Any) -> str:
+    return repr(float(value))
+
+
+def quantitative_features(names: str, *values: Any) -> str:
+    return from_array([f"{name}:{_format_value(value)}"
+                       for name, value in zip(to_array(names), values) if value is not None])
+
+
+def categorical_features(names: str, *values: Any) -> str:
+    return from_array([f"{name}#{value}" for name, value in zip(to_array(names), values) if value is not None])
+
+
+def array(*values: Any) -> str:
+    return from_array(list(values))
+
+
+def array_concat(*arrays: Optional[str]) -> str:
+    return from_array([value for _array in arrays for value in to_array(_array)])
+
+
+def extract_feature(feature_value: Optional[str]) -> Optional[str]:
+    if feature_value is None:
+        return None
+    return str(feature_value).split(":", 1)[0]
+
+
+def extract_weight(feature_value: Optional[str]) -> Optional[float]:
+    if feature_value is None:
+        return None
+    _splitted = str(feature_value).split(":", 1)
+    return float(_splitted[1]) if len(_splitted) == 2 else 1.0
+
+
+def feature_hashing(features: Optional[str], options: Optional[str] = None) -> Optional[str]:
+    if features is None:
+        return None
+
+    _options = _parse_options(options)
+    num_features = int(_options.get("num_features", _options.get("features", NUM_FEATURES)))
+    hashed = []
+    for feature in to_array(features):
+        name, _, value = str(feature).partition(":")
+        hashed.append(f"{mhash(name, num_features)}:{value}" if value else str(mhash(name, num_features)))
+    return from_array(hashed)
+
+
+def add_bias(features: Optional[str]) -> str:
+    return from_array(to_array(features) + ["0:1.0"])
+
+
+def rescale(value: Optional[float], min_value: float, max_value: float) -> Optional[float]:
+    if value is None:
+        return None
+    if max_value == min_value:
+        return 0.5
+    return (value - min_value) / (max_value - min_value)
+
+
+def zscore(value: Optional[float], mean: float, stddev: float) -> Optional[float]:
+    if value is None:
+        return None
+    if stddev == 0:
+        return 0.0
+    return (value - mean) / stddev
+
+
+def sigmoid(value: Optional[float]) -> Optional[float]:
+    if value is None:
+        return None
+    # Avoid overflow of exp for large negative values
+    if value < 0:
+        return math.exp(value) / (1.0 + math.exp(value))
+    return 1.0 / (1.0 + math.exp(-value))
+
+
+def amplify(n_times: int, *columns: Any) -> str:
+    """UDTF to repeat a row n times. It returns rows as a JSON array."""
+    return json.dumps([list(columns)] * int(n_times))
+
+
+def space(n: int) -> str:
+    return " " * int(n)
+
+
+def split(value: Optional[str], pattern: str) -> Optional[str]:
+    if value is None:
+        return None
+    return from_array(re.split(pattern, value))
+
+
+def concat(*values: Any) -> Optional[str]:
+    if any(value is None for value in values):
+        return None
+    return "".join(str(value) for value in values)
+
+
+def concat_ws(separator: str, *values: Any) -> str:
+    _values = []
+    for value in values:
+        if isinstance(value, str) and value.startswith("["):
+            _values.extend(str(v) for v in to_array(value))
+        elif value is not None:
+            _values.append(str(value))
+    return separator.join(_values)
+
+
+def least(*values: Any) -> Any:
+    return None if any(value is None for value in values) else min(values)
+
+
+def greatest(*values: Any) -> Any:
+    return None if any(value is None for value in values) else max(values)
+
+
+def _parse_options(options: Optional[str]) -> Dict[str, str]:
+    """Parse a Hivemall option string, e.g. "-loss logloss -iters 20"."""
+    parsed = {}  # type: Dict[str, str]
+    tokens = shlex.split(options or "")
+    for i, token in enumerate(tokens):
+        if token.startswith("-"):
+            has_value = i + 1 < len(tokens) and not re.match(r"^-[a-z_]", tokens[i + 1])
+            parsed[token.lstrip("-")] = tokens[i + 1] if has_value else "true"
+    return parsed
+
+
+class RandomGenerator:
+    """rand(seed) of Hive. Numbers are reproducible per seed within an engine running tasks one by one."""
+
+    def __init__(self) -> None:
+        self.generators = {}  # type: Dict[Any, random.Random]
+
+    def __call__(self, seed: Optional[int] = None) -> float:
+        if seed not in self.generators:
+            self.generators[seed] = random.Random(seed)
+        return self.generators[seed].random()
+
+
+class RowId:
+    """rowid() of Hivemall. It returns sequential numbers, which are unique across threads sharing it."""
+
+    def __init__(self) -> None:
+        self._count = itertools.count(1)
+
+    def __call__(self) -> int:
+        return next(self._count)
+
+
+class _Collect:
+    """Base class of aggregations which collect all rows and compute a result at once."""
+
+    def __init__(self) -> None:
+        self.rows = []  # type: List[Tuple[Any, ...]]
+
+    def step(self, *args: Any) -> None:
+        self.rows.append(args)
+
+    def finalize(self) -> Any:
+        return self.compute(self.rows)
+
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Any:
+        raise NotImplementedError
+
+
+class StddevPop(_Collect):
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        values = [row[0] for row in rows if row[0] is not None]
+        if not values:
+            return None
+        mean = sum(values) / len(values)
+        return math.sqrt(sum((value - mean) ** 2 for value in values) / len(values))
+
+
+class Percentile(_Collect):
+    """Exact percentile used for approx_percentile and percentile_approx."""
+
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        values = sorted(row[0] for row in rows if row[0] is not None)
+        if not values:
+            return None
+        percentile = rows[0][1]
+        return values[min(len(values) - 1, max(0, int(math.ceil(percentile * len(values))) - 1))]
+
+
+class Auc(_Collect):
+    """auc(predicted, actual) of Hivemall computed from ranks. Rows don't need to be sorted."""
+
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        ranked = sorted((row for row in rows if row[0] is not None), key=lambda row: row[0])
+        num_pos = sum(1 for _, label in ranked if label == 1)
+        num_neg = len(ranked) - num_pos
+        if num_pos == 0 or num_neg == 0:
+            return None
+
+        # Average ranks of ties
+        rank_sum = 0.0
+        i = 0
+        while i < len(ranked):
+            j = i
+            while j + 1 < len(ranked) and ranked[j + 1][0] == ranked[i][0]:
+                j += 1
+            rank = (i + j) / 2.0 + 1
+            rank_sum += rank * sum(1 for k in range(i, j + 1) if ranked[k][1] == 1)
+            i = j + 1
+
+        return (rank_sum - num_pos * (num_pos + 1) / 2.0) / (num_pos * num_neg)
+
+
+class LogLoss(_Collect):
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        if not rows:
+            return None
+        eps = 1e-15
+        losses = []
+        for predicted, actual in rows:
+            p = min(max(predicted, eps), 1.0 - eps)
+            losses.append(-(actual * math.log(p) + (1 - actual) * math.log(1 - p)))
+        return sum(losses) / len(losses)
+
+
+class Mse(_Collect):
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        return sum((p - a) ** 2 for p, a in rows) / len(rows) if rows else None
+
+
+class Rmse(Mse):
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        mse = super().compute(rows)
+        return None if mse is None else math.sqrt(mse)
+
+
+class Mae(_Collect):
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        return sum(abs(p - a) for p, a in rows) / len(rows) if rows else None
+
+
+class R2(_Collect):
+    def compute(self, rows: List[Tuple[Any, ...]]) -> Optional[float]:
+        if not rows:
+            return None
+        mean = sum(a for _, a in rows) / len(rows)
+        total = sum((a - mean) ** 2 for _, a in rows)
+        return 1.0 - sum((p - a) ** 2 for p, a in rows) / total if total else None
+
+
+class _LinearTrainer(_Collect):
+    """Linear model trainer UDTF with AdaGrad. It returns (feature, weight) rows as a JSON array.
+
+    Supported options are -loss, -iters, -eta0 and -lambda for L2 regularization.
+    """
+
+    classification = True
+
+    def compute(self, rows: List[Tuple[Any, ...]]) -> str:
+        options = _parse_options(rows[0][2] if rows and len(rows[0]) > 2 else None)
+        default_loss = "logloss" if self.classification else "squared"
+        loss = options.get("loss", default_loss)
+        iters = int(options.get("iters", 10))
+        eta0 = float(options.get("eta0", 0.1))
+        l2 = 0.0 if options.get("reg") == "no" else float(options.get("lambda", 0.0))
+
+        examples = [([(extract_feature(fv), extract_weight(fv)) for fv in to_array(features)], float(label))
+                    for features, label, *_ in rows]
+        weights = OrderedDict()  # type: OrderedDict[str, float]
+        squared_gradients = {}  # type: Dict[str, float]
+
+        for _ in range(iters):
+            for features, label in examples:
+                score = sum(weights.get(feature, 0.0) * value for feature, value in features)
+                gradient = self._gradient(loss, score, label)
+                for feature, value in features:
+                    g = gradient * value + l2 * weights.get(feature, 0.0)
+                    squared_gradients[feature] = squared_gradients.get(feature, 0.0) + g * g
+                    step = eta0 * g / math.sqrt(squared_gradients[feature] + 1e-6)
+                    weights[feature] = weights.get(feature, 0.0) - step
+
+        return json.dumps([[feature, weight] for feature, weight in weights.items()])
+
+    def _gradient(self, loss: str, score: float, label: float) -> float:
+        if loss in ["logloss", "log", "logistic"]:
+            return sigmoid(score) - label
+        if loss == "hinge":
+            y = 1.0 if label > 0 else -1.0
+            return -y if y * score < 1.0 else 0.0
+        if loss in ["squared", "squaredloss"]:
+            return score - label
+        raise ValueError(f"Unsupported loss for local execution: {loss}")
+
+
+class TrainClassifier(_LinearTrainer):
+    classification = True
+
+
+class TrainRegressor(_LinearTrainer):
+    classification = False
+
+
+# Scalar functions and the number of arguments. -1 means variable arguments.
+SCALAR_FUNCTIONS = [
+    ("mhash", mhash, -1),
+    ("quantitative_features", quantitative_features, -1),
+    ("categorical_features", categorical_features, -1),
+    ("array", array, -1),
+    ("array_concat", array_concat, -1),
+    ("extract_feature", extract_feature, 1),
+    ("extract_weight", extract_weight, 1),
+    ("feature_hashing", feature_hashing, -1),
+    ("add_bias", add_bias, 1),
+    ("rescale", rescale, 3),
+    ("zscore", zscore, 3),
+    ("sigmoid", sigmoid, 1),
+    ("amplify", amplify, -1),
+    ("space", space, 1),
+    ("split", split, 2),
+    ("concat", concat, -1),
+    ("concat_ws", concat_ws, -1),
+    ("least", least, -1),
+    ("greatest", greatest, -1),
+    ("ln", lambda value: None if value is None or value <= 0 else math.log(value), 1),
+    ("exp", lambda value: None if value is None else math.exp(value), 1),
+    ("pow", lambda value, p: None if value is None else math.pow(value, p), 2),
+    ("sqrt", lambda value: None if value is None or value < 0 else math.sqrt(value), 1),
+    ("floor", lambda value: None if value is None else math.floor(value), 1),
+]  # type: List[Tuple[str, Callable, int]]
+
+AGGREGATE_FUNCTIONS = [
+    ("stddev_pop", StddevPop, 1),
+    ("approx_percentile", Percentile, 2),
+    ("percentile_approx", Percentile, 2),
+    ("auc", Auc, 2),
+    ("logloss", LogLoss, 2),
+    ("mse", Mse, 2),
+    ("rmse", Rmse, 2),
+    ("mae", Mae, 2),
+    ("r2", R2, 2),
+    ("train_classifier", TrainClassifier, -1),
+    ("train_regressor", TrainRegressor, -1),
+]  # type: List[Tuple[str, type, int]]
+
+# Functions returning rows of a UDTF as a JSON array
+UDTF_FUNCTIONS = ["amplify", "train_classifier", "train_regressor"]
@@ -0,0 +1,552 @@
+import math
+import yaml
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+from .functions import NUM_FEATURES, _parse_options, mhash
+from ..model import LINEAR_MODEL_TRAINERS, LINEAR_MODEL_PREDICTORS
+from ..model import linear_model
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+# Configuration keys which change results but aren't reproduced by NumpyEngine
+UNSUPPORTED_KEYS = ["sources", "segment_column", "incremental", "feature_selection"]
+UNSUPPORTED_TRANSFORMERS = ["binner", "collapser", "target_encoder"]
+UNSUPPORTED_VECTORIZER_KEYS = ["feature_ids", "categorical_encoding", "emit_null", "force_value"]
+METRICS = ["auc", "pr_auc", "logloss", "mse", "rmse", "mae", "r2", "accuracy", "precision", "recall"]
+
+
+def load_columns(path: Union[str, Path]) -> Dict[str, "np.ndarray"]:
+    """Load columns from .npy files as memory-mapped arrays.
+
+    Parameters
+    ----------
+    path : :obj:`str` or :obj:`Path`
+        A directory with a "{column}.npy" file per column written by :func:`save_columns`,
+        or a .npy file of a structured array.
+
+    Returns
+    -------
+    :obj:`dict`
+        Column name and a read-only memory-mapped array.
+    """
+
+    _require_numpy()
+    path = Path(path)
+    if path.is_dir():
+        return OrderedDict((file.stem, np.load(file, mmap_mode="r")) for file in sorted(path.glob("*.npy")))
+
+    table = np.load(path, mmap_mode="r")
+    if table.dtype.names is None:
+        raise ValueError(f"{path} should be a structured array.")
+    return OrderedDict((name, table[name]) for name in table.dtype.names)
+
+
+def save_columns(path: Union[str, Path], columns: Dict[str, Any]) -> None:
+    """Save columns as "{column}.npy" files to be memory-mapped by :func:`load_columns`.
+
+    None is stored as NaN for numerical columns and an empty string for categorical columns,
+    since arrays of Python objects can't be memory-mapped.
+
+    Parameters
+    ----------
+    path : :obj:`str` or :obj:`Path`
+        Output directory.
+    columns : :obj:`dict`
+        Column name and a sequence of values.
+    """
+
+    _require_numpy()
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    for name, values in columns.items():
+        values = list(values)
+        if all(value is None or isinstance(value, (int, float)) for value in values):
+            array = np.array([np.nan if value is None else value for value in values], dtype=float)
+        else:
+            array = np.array(["" if value is None else str(value) for value in values])
+        np.save(path / f"{name}.npy", array)
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise ImportError("NumpyEngine requires numpy. Install it with `pip install molehill[numpy]`.")
+
+
+def _is_missing(values: "np.ndarray") -> "np.ndarray":
+    if values.dtype.kind in "fc":
+        return np.isnan(values)
+    if values.dtype.kind in "US":
+        return values == ""
+    return np.zeros(len(values), dtype=bool)
+
+
+def _stats(values: "np.ndarray") -> Dict[str, float]:
+    """Statistics of :func:`molehill.stats.compute_stats` ignoring NaN."""
+    values = values[~np.isnan(values)]
+    if len(values) == 0:
+        return {stat: math.nan for stat in ["mean", "std", "min", "25", "median", "75", "max"]}
+    return {
+        "mean": float(values.mean()), "std": float(values.std()), "min": float(values.min()),
+        "25": float(np.percentile(values, 25)), "median": float(np.median(values)),
+        "75": float(np.percentile(values, 75)), "max": float(values.max())
+    }
+
+
+def compute_metric(metric: str, target: "np.ndarray", predicted: "np.ndarray") -> float:
+    """Compute a metric of :func:`molehill.evaluation.evaluate` exactly.
+
+    auc and pr_auc rank all predictions instead of using a histogram. accuracy, precision and recall
+    compare the predicted column with the target as the SQL does.
+    """
+
+    target = target.astype(float)
+    predicted = predicted.astype(float)
+    if metric in ["auc", "pr_auc"]:
+        # Sort distinct predictions in descending order, which is a histogram with infinite bins
+        values, inverse = np.unique(-predicted, return_inverse=True)
+        pos = np.bincount(inverse, weights=(target == 1).astype(float), minlength=len(values))
+        neg = np.bincount(inverse, weights=(target != 1).astype(float), minlength=len(values))
+        cum_pos, cum_neg = np.cumsum(pos), np.cumsum(neg)
+        if metric == "auc":
+            return float((neg * (cum_pos - 0.5 * pos)).sum() / (pos.sum() * neg.sum()))
+        return float((pos * cum_pos / (cum_pos + cum_neg)).sum() / pos.sum())
+    if metric == "logloss":
+        probability = np.clip(predicted, 1e-15, 1.0 - 1e-15)
+        return float(-(target * np.log(probability) + (1 - target) * np.log(1 - probability)).mean())
+    if metric in ["mse", "rmse"]:
+        mse = float(((predicted - target) ** 2).mean())
+        return math.sqrt(mse) if metric == "rmse" else mse
+    if metric == "mae":
+        return float(np.abs(predicted - target).mean())
+    if metric == "r2":
+        return float(1 - ((predicted - target) ** 2).sum() / ((target - target.mean()) ** 2).sum())
+
+    # NaN instead of NULL of SQL if there is no predicted or actual positive
+    true_positive = float(((predicted == target) & (target == 1)).sum())
+    denominators = {"accuracy": len(target), "precision": (predicted == 1).sum(), "recall": (target == 1).sum()}
+    if metric in denominators:
+        return true_positive / float(denominators[metric]) if denominators[metric] else math.nan
+    raise ValueError(f"Unsupported metric for NumpyEngine: {metric}")
+
+
+class FeatureMatrix:
+    """Feature vectors built by :func:`molehill.preprocessing.vectorize` in compressed sparse row layout.
+
+    Parameters
+    ----------
+    names : :obj:`list` of :obj:`str`
+        Feature names like "age" or "sex#male", or hashed feature ids, which are referred by indices.
+    indptr : :obj:`np.ndarray`
+        Features of the i-th row are ``indices[indptr[i]:indptr[i + 1]]``.
+    indices : :obj:`np.ndarray`
+        Indices of names of present features. A numerical feature can be present with 0.
+    values : :obj:`np.ndarray`
+        Values of present features.
+    """
+
+    def __init__(self, names: List[str], indptr: "np.ndarray", indices: "np.ndarray", values: "np.ndarray") -> None:
+        self.names = names
+        self.indptr = indptr
+        self.indices = indices
+        self.values = values
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    def row_ids(self) -> "np.ndarray":
+        """Row of each present feature."""
+        return np.repeat(np.arange(len(self)), np.diff(self.indptr))
+
+    def slice(self, start: int, stop: int) -> "FeatureMatrix":
+        """Rows from start to stop without copying."""
+        stop = min(stop, len(self))
+        begin, end = self.indptr[start], self.indptr[stop]
+        return FeatureMatrix(self.names, self.indptr[start:stop + 1] - begin,
+                             self.indices[begin:end], self.values[begin:end])
+
+    def take(self, rows: "np.ndarray") -> "FeatureMatrix":
+        lengths = np.diff(self.indptr)[rows]
+        indptr = np.concatenate([[0], np.cumsum(lengths)])
+        positions = np.repeat(self.indptr[rows] - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return FeatureMatrix(self.names, indptr, self.indices[positions], self.values[positions])
+
+    def dot(self, weights: "np.ndarray") -> "np.ndarray":
+        """Scores of rows with weights indexed as names."""
+        return np.bincount(self.row_ids(), weights=weights[self.indices] * self.values, minlength=len(self))
+
+    def transform(self, bias: bool = False, hashing: bool = False, num_features: int = NUM_FEATURES) -> "FeatureMatrix":
+        """Apply feature_hashing and add_bias of trainers and predictors."""
+        features = self
+        if hashing:
+            features = features.rename([str(mhash(name, num_features)) for name in features.names])
+        if bias:
+            lengths = np.diff(features.indptr) + 1
+            indptr = np.concatenate([[0], np.cumsum(lengths)])
+            is_bias = np.zeros(indptr[-1], dtype=bool)
+            is_bias[indptr[1:] - 1] = True
+            indices = np.full(indptr[-1], len(features.names))
+            indices[~is_bias] = features.indices
+            values = np.ones(indptr[-1])
+            values[~is_bias] = features.values
+            features = FeatureMatrix(features.names + ["0"], indptr, indices, values)
+        return features
+
+    def rename(self, names: List[str]) -> "FeatureMatrix":
+        """Rename features, and sum values of features with the same name in a row, e.g. hash collisions."""
+        unique_names, index = np.unique(np.array(names, dtype=str), return_inverse=True)
+        num_names = max(len(unique_names), 1)
+        keys, inverse = np.unique(self.row_ids() * num_names + index[self.indices], return_inverse=True)
+        values = np.bincount(inverse, weights=self.values, minlength=len(keys))
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(keys // num_names, minlength=len(self)))])
+        return FeatureMatrix([str(name) for name in unique_names], indptr, keys % num_names, values)
+
+    @staticmethod
+    def from_coo(names: List[str], num_rows: int, rows: "np.ndarray", indices: "np.ndarray",
+                 values: "np.ndarray") -> "FeatureMatrix":
+        """Build from features of rows. Features of a row keep their order."""
+        order = np.argsort(rows, kind="stable")
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(rows, minlength=num_rows))])
+        return FeatureMatrix(names, indptr, indices[order], values[order])
+
+    @staticmethod
+    def concatenate(names: List[str], matrices: List["FeatureMatrix"]) -> "FeatureMatrix":
+        offsets = np.cumsum([0] + [matrix.indptr[-1] for matrix in matrices[:-1]])
+        indptr = np.concatenate([[0]] + [matrix.indptr[1:] + offset for matrix, offset in zip(matrices, offsets)])
+        return FeatureMatrix(names, indptr, np.concatenate([np.zeros(0, dtype=int)] + [m.indices for m in matrices]),
+                             np.concatenate([np.zeros(0)] + [m.values for m in matrices]))
+
+
+def train_linear(
+        features: FeatureMatrix,
+        target: "np.ndarray",
+        option: Optional[str] = None,
+        classification: bool = True) -> Dict[str, float]:
+    """Train a linear model with AdaGrad like :class:`molehill.local.functions.TrainClassifier`.
+
+    Supported options are -loss, -iters, -eta0, -lambda, -reg and -mini_batch. Gradients of examples
+    in a mini-batch are averaged and applied at once. With the default mini-batch size 1,
+    weights are the same as the SQLite emulation.
+
+    Returns
+    -------
+    :obj:`dict`
+        Feature name and weight of features appearing in examples.
+    """
+
+    options = _parse_options(option)
+    loss = options.get("loss", "logloss" if classification else "squared")
+    iters = int(options.get("iters", 10))
+    eta0 = float(options.get("eta0", 0.1))
+    l2 = 0.0 if options.get("reg") == "no" else float(options.get("lambda", 0.0))
+    batch_size = int(options.get("mini_batch", 1))
+
+    y = target.astype(float)
+    weights = np.zeros(len(features.names))
+    squared_gradients = np.zeros(len(features.names))
+    for _ in range(iters):
+        for start in range(0, len(features), batch_size):
+            batch = features.slice(start, start + batch_size)
+            gradient = _loss_gradient(loss, batch.dot(weights), y[start:start + batch_size])
+            # Only weights of features present in the mini-batch are updated
+            present, inverse = np.unique(batch.indices, return_inverse=True)
+            g = np.bincount(inverse, weights=gradient[batch.row_ids()] * batch.values, minlength=len(present))
+            g = (g + l2 * weights[present] * np.bincount(inverse, minlength=len(present))) / len(batch)
+            squared_gradients[present] += g * g
+            weights[present] -= eta0 * g / np.sqrt(squared_gradients[present] + 1e-6)
+
+    seen = np.bincount(features.indices, minlength=len(features.names)) > 0
+    return OrderedDict((name, float(weight)) for name, weight, s in zip(features.names, weights, seen) if s)
+
+
+def _loss_gradient(loss: str, score: "np.ndarray", label: "np.ndarray") -> "np.ndarray":
+    if loss in ["logloss", "log", "logistic"]:
+        return 1.0 / (1.0 + np.exp(-score)) - label
+    if loss == "hinge":
+        y = np.where(label > 0, 1.0, -1.0)
+        return np.where(y * score < 1.0, -y, 0.0)
+    if loss in ["squared", "squaredloss"]:
+        return score - label
+    raise ValueError(f"Unsupported loss for NumpyEngine: {loss}")
+
+
+class NumpyEngine:
+    """Run a pipeline of a molehill config on NumPy arrays as a reference of a TD run.
+
+    It reproduces shuffle and split, Imputer and Normalizer strategies, sparse vectorization,
+    train_classifier/train_regressor with :func:`train_linear`, prediction and metrics
+    without SQL, so results can be compared with tables built by a workflow of :meth:`Pipeline.dump_pipeline`.
+    Random numbers differ from Hive, so rows in train/test split differ from a TD run.
+
+    Source columns aren't copied as a whole. Rows are shuffled as indices, stats are computed a column at a time,
+    and features are read in batches of rows into a sparse :class:`FeatureMatrix`.
+    Tables keep row ids, which are indices of source rows, and predictions.
+
+    Parameters
+    ----------
+    config : :obj:`str` or :obj:`dict`
+        Config file path or configuration dictionary for :meth:`Pipeline.dump_pipeline`.
+    seed : int
+        Random seed for shuffle and split. Default: 32
+    batch_size : int
+        The number of rows read from source columns at once for vectorization. Default: 65536
+
+    Examples
+    --------
+    >>> from molehill.local import NumpyEngine, load_columns
+    >>> engine = NumpyEngine("titanic_pipeline.yml")
+    >>> metrics = engine.run(load_columns("titanic_columns"))
+    >>> model = engine.models["model_lr"]
+    """
+
+    def __init__(self, config: Union[str, Dict[str, Any]], seed: int = 32, batch_size: int = 65536) -> None:
+        _require_numpy()
+        if not isinstance(config, dict):
+            with open(config, "r") as f:
+                config = yaml.load(f, Loader=yaml.Loader)
+        self.config = config
+        self.seed = seed
+        self.batch_size = batch_size
+        self._check_config()
+        # Tables named as a TD run, e.g. "titanic_train", "model_lr" and "prediction_lr"
+        self.tables = OrderedDict()  # type: OrderedDict[str, Dict[str, np.ndarray]]
+        self.models = OrderedDict()  # type: OrderedDict[str, Dict[str, float]]
+        # Stats of each column per transformer, e.g. self.stats["normalizer"]["age"]["max"]
+        self.stats = OrderedDict()  # type: OrderedDict[str, Dict[str, Dict[str, float]]]
+        self._transformers = OrderedDict()  # type: OrderedDict[str, List[Tuple[Any, Dict[str, Any], Dict[str, float]]]]
+
+    def _check_config(self) -> None:
+        unsupported = [key for key in UNSUPPORTED_KEYS if self.config.get(key)]
+        for column_type in ["numerical_columns", "categorical_columns"]:
+            for cols in self.config.get(column_type, []):
+                unsupported.extend(key for key in UNSUPPORTED_TRANSFORMERS if cols.get("transformer", {}).get(key))
+        vectorizer_conf = self.config.get("vectorizer", {})
+        unsupported.extend(key for key in UNSUPPORTED_VECTORIZER_KEYS if vectorizer_conf.get(key))
+        unsupported.extend(conf["name"] for conf in self.config.get("trainer", [])
+                           if conf["name"] not in LINEAR_MODEL_TRAINERS)
+        unsupported.extend(conf["name"] for conf in self.config.get("predictor", [])
+                           if conf["name"] not in LINEAR_MODEL_PREDICTORS)
+        unsupported.extend(metric for metric in self.config["evaluator"]["metrics"] if metric.lower() not in METRICS)
+        if unsupported:
+            raise ValueError(f"NumpyEngine doesn't support: {', '.join(unsupported)}")
+
+    def run(self, columns: Dict[str, Any]) -> Dict[str, Dict[str, float]]:
+        """Run the pipeline on columns of a source table.
+
+        Parameters
+        ----------
+        columns : :obj:`dict`
+            Column name and an array, e.g. memory-mapped arrays of :func:`load_columns`.
+            Missing values should be NaN for numerical columns and empty strings for categorical columns.
+
+        Returns
+        -------
+        :obj:`dict`
+            Metrics per output table of predictors.
+        """
+
+        config = self.config
+        source, id_column, target_column = config["source"], config["id_column"], config["target_column"]
+        rng = np.random.default_rng(self.seed)
+
+        # Indices of source rows are shuffled instead of the columns, which can be memory-mapped
+        num_rows = len(columns[target_column])
+        order = rng.permutation(num_rows)
+        target = np.asarray(columns[target_column][order], dtype=float)
+        train_order, test_order = self._split(target, rng.random(num_rows))
+        train_rows, test_rows = order[train_order], order[test_order]
+        train_target, test_target = target[train_order], target[test_order]
+        self.tables[f"{source}_shuffled"] = OrderedDict([(id_column, order)])
+        self.tables[f"{source}_train"] = OrderedDict([(id_column, train_rows)])
+        self.tables[f"{source}_test"] = OrderedDict([(id_column, test_rows)])
+
+        self._fit_transformers(columns, train_rows, test_rows)
+        train_features, test_features = self._vectorize(columns, [train_rows, test_rows])
+
+        vectorizer_conf = config.get("vectorizer", {})
+        for conf in config.get("trainer", []):
+            self._train(conf, train_features, train_target, rng)
+
+        results = OrderedDict()  # type: OrderedDict[str, Dict[str, float]]
+        test_table = vectorizer_conf.get("test_table", "test")
+        for i, conf in enumerate(config.get("predictor", [])):
+            default_table = "prediction" if len(config["predictor"]) == 1 else f"prediction_{i}"
+            output_table = conf.get("output_table", default_table)
+            predicted_column, predicted = self._predict(conf, test_features, train_target)
+            self.tables[output_table] = OrderedDict([(id_column, test_rows), (predicted_column, predicted)])
+            if conf.get("target_table", test_table) != test_table:
+                raise ValueError("NumpyEngine predicts only the test table.")
+            results[output_table] = OrderedDict(
+                (metric, compute_metric(metric.lower(), test_target, predicted))
+                for metric in config["evaluator"]["metrics"])
+
+        return results
+
+    def _split(self, target: "np.ndarray", rnd: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+        """Split rows like :func:`molehill.preprocessing.train_test_split`."""
+        rate = float(self.config["train_sample_rate"])
+        if self.config.get("stratify"):
+            is_train = np.zeros(len(target), dtype=bool)
+            for label in np.unique(target):
+                rows = np.flatnonzero(target == label)
+                rank = np.empty(len(rows))
+                rank[np.argsort(rnd[rows], kind="stable")] = np.arange(1, len(rows) + 1)
+                is_train[rows] = rank <= len(rows) * rate
+        else:
+            is_train = rnd <= rate
+        return np.flatnonzero(is_train), np.flatnonzero(~is_train)
+
+    def _fit_transformers(
+            self,
+            columns: Dict[str, Any],
+            train_rows: "np.ndarray",
+            test_rows: "np.ndarray") -> None:
+        """Compute stats of transformers of each column with rows of their phase."""
+        phases = {"train": train_rows, "test": test_rows, None: np.concatenate([train_rows, test_rows])}
+        self._transformers.clear()
+        # Stats of all imputers are computed before imputation, and normalizers refer stats of imputed columns
+        for transformer, func in [("imputer", self._impute), ("normalizer", self._normalize)]:
+            self.stats[transformer] = OrderedDict()
+            for column_type in ["numerical_columns", "categorical_columns"]:
+                for cols in self.config.get(column_type, []):
+                    opt = cols.get("transformer", {}).get(transformer)
+                    if not opt:
+                        continue
+                    for column in cols["columns"]:
+                        stats = {}  # type: Dict[str, float]
+                        if column_type == "numerical_columns":
+                            stats = _stats(self._read_column(columns, column, phases[opt.get("phase")], True))
+                            self.stats[transformer][column] = stats
+                        self._transformers.setdefault(column, []).append((func, opt, stats))
+
+    def _read_column(
+            self,
+            columns: Dict[str, Any],
+            column: str,
+            rows: "np.ndarray",
+            numerical: bool) -> "np.ndarray":
+        """Read rows of a column and apply fitted transformers."""
+        values = np.asarray(columns[column][rows])
+        if numerical:
+            values = values.astype(float)
+        for func, opt, stats in self._transformers.get(column, []):
+            values = func(values, opt, stats, not numerical)
+        return values
+
+    @staticmethod
+    def _impute(values: "np.ndarray", opt: Dict[str, Any], stats: Dict[str, float], categorical: bool) -> Any:
+        strategy = opt["strategy"]
+        if strategy == "constant":
+            if opt.get("fill_value") is None:
+                raise ValueError("fill_value should not be None.")
+            fill_value = opt["fill_value"]
+        elif strategy in ["mean", "median"] and not categorical:
+            fill_value = stats[strategy]
+        else:
+            raise ValueError("strategy should be mean, median or constant")
+
+        if categorical:
+            # Categorical columns are cast as string before imputation
+            values = np.array(["" if missing else str(value) for value, missing in zip(values, _is_missing(values))])
+            return np.where(values == "", str(fill_value), values)
+        return np.where(np.isnan(values), float(fill_value), values)
+
+    @staticmethod
+    def _normalize(values: "np.ndarray", opt: Dict[str, Any], stats: Dict[str, float], categorical: bool) -> Any:
+        strategy = opt["strategy"]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            if strategy == "log1p":
+                return np.where(values > -1, np.log1p(np.where(values > -1, values, 0.0)), np.nan)
+            if strategy == "minmax":
+                if stats["max"] == stats["min"]:
+                    return np.where(np.isnan(values), np.nan, 0.5)
+                return (values - stats["min"]) / (stats["max"] - stats["min"])
+            if strategy == "standardize":
+                if stats["std"] == 0:
+                    return np.where(np.isnan(values), np.nan, 0.0)
+                return (values - stats["mean"]) / stats["std"]
+        raise ValueError(f"Unknown strategy: {strategy}")
+
+    def _vectorize(self, columns: Dict[str, Any], row_sets: List["np.ndarray"]) -> List[FeatureMatrix]:
+        """Build features of sets of rows like :func:`molehill.preprocessing.vectorize`.
+
+        Features are named "column" and "column#value", and only values appearing in rows become features.
+        """
+        conf = self.config.get("vectorizer", {})
+        numerical_columns = [c for cols in self.config.get("numerical_columns", []) for c in cols["columns"]]
+        categorical_columns = [c for cols in self.config.get("categorical_columns", []) for c in cols["columns"]]
+
+        vocabulary = OrderedDict((column, i) for i, column in enumerate(numerical_columns))
+        batches = []  # type: List[List[FeatureMatrix]]
+        for rows in row_sets:
+            batches.append([])
+            for start in range(0, len(rows), self.batch_size):
+                batch = rows[start:start + self.batch_size]
+                row_ids, indices, values = [], [], []
+                for column in numerical_columns:
+                    value = self._read_column(columns, column, batch, True)
+                    present = np.flatnonzero(~np.isnan(value))
+                    row_ids.append(present)
+                    indices.append(np.full(len(present), vocabulary[column]))
+                    values.append(value[present])
+                for column in categorical_columns:
+                    value = self._read_column(columns, column, batch, False)
+                    present = np.flatnonzero(~_is_missing(value))
+                    levels, codes = np.unique(value[present].astype(str), return_inverse=True)
+                    index = np.array([vocabulary.setdefault(f"{column}#{level}", len(vocabulary)) for level in levels],
+                                     dtype=int)
+                    row_ids.append(present)
+                    indices.append(index[codes.reshape(-1)])
+                    values.append(np.ones(len(present)))
+                batches[-1].append(FeatureMatrix.from_coo(
+                    [], len(batch), np.concatenate([np.zeros(0, dtype=int)] + row_ids),
+                    np.concatenate([np.zeros(0, dtype=int)] + indices), np.concatenate([np.zeros(0)] + values)))
+
+        matrices = [FeatureMatrix.concatenate(list(vocabulary), batch) for batch in batches]
+        if conf.get("hashing"):
+            num_features = int(conf.get("feature_cardinality") or NUM_FEATURES)
+            matrices = [features.transform(hashing=True, num_features=num_features) for features in matrices]
+        return [features.transform(bias=bool(conf.get("bias"))) for features in matrices]
+
+    def _train(self, conf: Dict[str, Any], features: FeatureMatrix, target: "np.ndarray", rng: Any) -> None:
+        rows = np.arange(len(target))
+        oversample_n_times = conf.get("oversample_n_times", self.config.get("oversample_n_times"))
+        oversample_pos_n_times = conf.get("oversample_pos_n_times", self.config.get("oversample_pos_n_times"))
+        if oversample_n_times:
+            # amplify and CLUSTER BY rand(43)
+            rows = rng.permutation(np.tile(rows, int(oversample_n_times)))
+        elif oversample_pos_n_times:
+            positive = np.flatnonzero(target == 1)
+            rows = np.concatenate([np.flatnonzero(target == 0), np.tile(positive, int(oversample_pos_n_times))])
+
+        features = features.transform(bias=bool(conf.get("bias")), hashing=bool(conf.get("hashing")))
+        self.models[conf.get("model_table", "model")] = train_linear(
+            features.take(rows), target[rows], conf.get("option"), conf["name"] == "train_classifier")
+
+    def _predict(
+            self,
+            conf: Dict[str, Any],
+            features: FeatureMatrix,
+            train_target: "np.ndarray") -> Tuple[str, "np.ndarray"]:
+        opt = {k: v for k, v in conf.items() if k not in ["name", "model_table", "output_table", "target_table"]}
+        oversample_pos_n_times = self.config.get("oversample_pos_n_times")
+        if oversample_pos_n_times and opt.get("oversample_pos_n_times") is None:
+            opt["oversample_pos_n_times"] = oversample_pos_n_times
+        # The predictor builds its query only to validate options and name the predicted column
+        _, predicted_column = getattr(linear_model, conf["name"])(**opt)
+
+        model = self.models[conf.get("model_table", "model")]
+        features = features.transform(bias=bool(opt.get("bias")), hashing=bool(opt.get("hashing")))
+        score = features.dot(np.array([model.get(name, 0.0) for name in features.names]))
+        if conf["name"] == "predict_classifier" and opt.get("sigmoid", True):
+            score = 1.0 / (1.0 + np.exp(-score))
+            if opt.get("oversample_pos_n_times"):
+                # Same as downsampling_rate computed from label counts of the train table
+                negative, positive = (train_target == 0).sum(), (train_target == 1).sum()
+                rate = (negative / (negative + positive * float(opt["oversample_pos_n_times"]))) / (
+                    negative / (negative + positive))
+                score = score / (score + (1.0 - score) / rate)
+        return predicted_column, score
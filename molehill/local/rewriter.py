@@ -0,0 +1,151 @@
+import re
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from .functions import UDTF_FUNCTIONS
+
+_PARAMETER = re.compile(r"\$\{([^}]+)\}")
+_LATERAL_VIEW = re.compile(
+    r"LATERAL VIEW (pos)?explode\((.+)\) (\w+) as (\w+)(?:, (\w+))?[ \t]*$", re.IGNORECASE | re.MULTILINE)
+_UDTF = re.compile(r"select\s+({})\(".format("|".join(UDTF_FUNCTIONS)), re.IGNORECASE)
+
+
+def _lookup(params: Dict[str, Any], key: str) -> Any:
+    if key in params:
+        return params[key]
+
+    value = params  # type: Any
+    for part in key.split("."):
+        if not isinstance(value, dict) or part not in value:
+            raise KeyError(f"Unknown parameter: {key}")
+        value = value[part]
+    return value
+
+
+def substitute(query: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Substitute digdag parameters like ${source} or ${td.last_results.age_mean}.
+
+    Parameters
+    ----------
+    query : :obj:`str`
+        Query with digdag parameters.
+    params : :obj:`dict`, optional
+        Parameters. Dotted keys are looked up as flat keys first and then as nested dictionaries.
+
+    Returns
+    -------
+    :obj:`str`
+        Substituted query.
+    """
+
+    return _PARAMETER.sub(lambda m: str(_lookup(params or {}, m.group(1).strip())), query)
+
+
+def _outside_strings(query: str, func: Callable[[str], str]) -> str:
+    """Apply func to parts of a query out of single quoted string literals."""
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    return "".join(part if i % 2 == 1 else func(part) for i, part in enumerate(parts))
+
+
+def _find_close(query: str, start: int) -> int:
+    """Find the end of a block, which is an unmatched close parenthesis or the end of a query."""
+    depth = 0
+    for i in range(start, len(query)):
+        if query[i] == "(":
+            depth += 1
+        elif query[i] == ")":
+            if depth == 0:
+                return i
+            depth -= 1
+    return len(query)
+
+
+def _rewrite_udtf(query: str) -> str:
+    """Rewrite "select udtf(args) as (a, b) from ..." into a query exploding rows returned as a JSON array."""
+
+    m = _UDTF.search(query)
+    while m:
+        call_end = _find_close(query, m.end())
+        aliases = re.match(r"\)\s+as\s+\(([\w,\s]+)\)", query[call_end:])
+        if aliases is None:
+            raise ValueError(f"Output columns of UDTF {m.group(1)} are required.")
+
+        rest_start = call_end + aliases.end()
+        block_end = _find_close(query, rest_start)
+        columns = [column.strip() for column in aliases.group(1).split(",")]
+        inner = query[m.start():call_end + 1] + " as udtf_rows" + query[rest_start:block_end].rstrip()
+        select_clauses = ", ".join(f"json_extract(udtf_row.value, '$[{i}]') as {column}"
+                                   for i, column in enumerate(columns))
+        rewritten = f"select {select_clauses}\nfrom ({inner}) udtf\njoin json_each(udtf.udtf_rows) udtf_row\n"
+        query = query[:m.start()] + rewritten + query[block_end:]
+        m = _UDTF.search(query, m.start() + len(rewritten))
+
+    return query
+
+
+def _rewrite_lateral_view(query: str) -> str:
+    """Rewrite LATERAL VIEW explode/posexplode into a join with json_each."""
+
+    m = _LATERAL_VIEW.search(query)
+    while m:
+        positional, expression, alias, first, second = m.groups()
+        replacements = [(first, "value")]  # type: List[Tuple[str, str]]
+        if positional:
+            replacements = [(first, "key"), (second, "value")]
+
+        # Columns of a lateral view are referred only in the select block of the lateral view
+        block_start = query.lower().rfind("select", 0, m.start())
+        block = query[block_start:m.start()]
+        for column, json_column in replacements:
+            # Bare select clauses keep their column names
+            block = re.sub(rf"^(\s*,?\s*)(?:{alias}\.)?{column}[ \t]*$",
+                           rf"\g<1>{alias}.{json_column} as {column}", block, flags=re.MULTILINE)
+            block = re.sub(rf"\b{alias}\.{column}\b", f"{alias}.{json_column}", block)
+            block = re.sub(rf"(?<![\w.])(?<!as ){column}\b", f"{alias}.{json_column}", block)
+
+        join = f"join json_each({expression}) {alias}"
+        query = query[:block_start] + block + join + query[m.end():]
+        m = _LATERAL_VIEW.search(query, block_start + len(block) + len(join))
+
+    return query
+
+
+def _rewrite_expressions(query: str) -> str:
+    query = re.sub(r"\bif\(", "iif(", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bas string\)", "as text)", query, flags=re.IGNORECASE)
+    query = re.sub(r"\bcluster by\b", "order by", query, flags=re.IGNORECASE)
+    query = re.sub(r"^\s*distribute by .*$", "", query, flags=re.IGNORECASE | re.MULTILINE)
+    # Division of Hive always returns double
+    query = re.sub(r"(?<=\s)/(?=\s)", "* 1.0 /", query)
+    return query
+
+
+def rewrite_query(query: str, params: Optional[Dict[str, Any]] = None) -> str:
+    """Rewrite a Hive/Presto query built by molehill into a SQLite query.
+
+    Arrays are represented as JSON text, so LATERAL VIEW explode is rewritten into a join with json_each,
+    and UDTFs like train_classifier and amplify, which are emulated by functions returning rows as a JSON array,
+    are rewritten into subqueries. GROUPING SETS and map are not supported.
+
+    Parameters
+    ----------
+    query : :obj:`str`
+        Query built by molehill.
+    params : :obj:`dict`, optional
+        Digdag parameters to be substituted.
+
+    Returns
+    -------
+    :obj:`str`
+        Query for SQLite without a trailing semicolon.
+    """
+
+    query = substitute(query, params).strip()
+    if query.endswith(";"):
+        query = query[:-1].rstrip()
+
+    # Double quoted strings of Hive are string literals unless they are column aliases
+    query = re.sub(r'(?<!as )(?<!\.)"([^"\n]*)"', r"'\1'", query)
+
+    query = _outside_strings(query, _rewrite_expressions)
+    query = _rewrite_udtf(query)
+    query = _rewrite_lateral_view(query)
+    return query
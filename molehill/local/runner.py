@@ -0,0 +1,293 @@
+#!/usr/bin/env python
+
+import argparse
+import itertools
+import time
+import yaml
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from .engine import LocalEngine
+from .rewriter import substitute
+
+# executor(query, config, params) runs a td> task, or a td_ddl> task with query=None, and returns rows
+Executor = Callable[[Optional[str], Dict[str, Any], Dict[str, Any]], List[Dict[str, Any]]]
+
+_OPERATORS = ("td>", "td_ddl>", "td_for_each>", "for_each>", "if>", "echo>")
+
+
+class TaskRun:
+    """Wall time of a task run. Times are seconds from the start of a workflow.
+
+    Parameters
+    ----------
+    name : :obj:`str`
+        Full task name like "+titanic+preparation+shuffle".
+    parallel : bool
+        Whether children ran in parallel.
+    """
+
+    def __init__(self, name: str, parallel: bool = False) -> None:
+        self.name = name
+        self.parallel = parallel
+        self.children = []  # type: List[TaskRun]
+        self.ready = 0.0
+        self.start = 0.0
+        self.end = 0.0
+
+    @property
+    def elapsed(self) -> float:
+        return self.end - self.start
+
+    @property
+    def waited(self) -> float:
+        """Time between being ready to run and starting on a worker. Summed over tasks for a group."""
+        if self.children:
+            return sum(child.waited for child in self.children)
+        return self.start - self.ready
+
+    def leaves(self) -> List["TaskRun"]:
+        if not self.children:
+            return [self]
+        return [leaf for child in self.children for leaf in child.leaves()]
+
+    def critical_path(self) -> List["TaskRun"]:
+        """Tasks determining the end of this task, which are the last finished child of each parallel group."""
+        if not self.children:
+            return [self]
+        if self.parallel:
+            return max(self.children, key=lambda child: child.end).critical_path()
+        return [task for child in self.children for task in child.critical_path()]
+
+
+def _is_true(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in ("true", "1")
+    return bool(value)
+
+
+def _merge(base: Dict[str, Any], other: Dict[str, Any]) -> Dict[str, Any]:
+    """Merge nested dictionaries without modifying arguments."""
+    merged = dict(base)
+    for key, value in other.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _resolve(value: Any, params: Dict[str, Any]) -> Any:
+    if isinstance(value, str):
+        return substitute(value, params)
+    if isinstance(value, list):
+        return [_resolve(v, params) for v in value]
+    if isinstance(value, dict):
+        return {k: _resolve(v, params) for k, v in value.items()}
+    return value
+
+
+class WorkflowRunner:
+    """Run a digdag workflow dumped by :meth:`Pipeline.dump_pipeline` locally.
+
+    Tasks run in order, and children of a group with ``_parallel`` run concurrently,
+    bounded by ``_parallel: {limit: N}`` and the number of workers of the executor.
+    ``${...}`` in task configurations and queries is substituted with exported parameters
+    and ``td.last_results`` stored by preceding tasks with ``store_last_results``.
+    Supported operators are td>, td_ddl>, td_for_each>, for_each>, if> and echo>.
+
+    Parameters
+    ----------
+    workflow_path : :obj:`str` or :obj:`Path`
+        Path to a .dig file. Query paths are resolved from its directory.
+    executor : callable, optional
+        A function called with (query, config, params) to run a td> task and return rows.
+        query is None for a td_ddl> task. Default: :meth:`LocalEngine.run_task` of an in-memory database.
+    max_workers : int
+        The number of threads running td> tasks. It's capped by ``max_workers`` of the engine of
+        :meth:`LocalEngine.run_task`, so that tasks of an in-memory database, which run one by one,
+        wait in the pool and the time is reported as waiting. Default: 4
+    output : callable
+        A function to show echo> messages and a report. Default: print
+    """
+
+    def __init__(
+            self,
+            workflow_path: Union[str, Path],
+            executor: Optional[Executor] = None,
+            max_workers: int = 4,
+            output: Callable[[str], Any] = print) -> None:
+        self.workflow_path = Path(workflow_path)
+        with self.workflow_path.open() as f:
+            self.workflow = yaml.safe_load(f)
+        self.executor = executor or LocalEngine().run_task
+        _engine_workers = getattr(getattr(self.executor, "__self__", None), "max_workers", None)
+        self.max_workers = min(max_workers, _engine_workers) if _engine_workers else max_workers
+        self.output = output
+        self.root = None  # type: Optional[TaskRun]
+        self._pool = None  # type: Optional[ThreadPoolExecutor]
+        self._origin = 0.0
+
+    def run(self, params: Optional[Dict[str, Any]] = None) -> TaskRun:
+        """Run the workflow and show a report.
+
+        Parameters
+        ----------
+        params : :obj:`dict`, optional
+            Parameters overriding exported ones, e.g. {"source_name": "titanic"}.
+            session_time, session_date and last_session_time are set to the current time by default.
+
+        Returns
+        -------
+        :obj:`TaskRun`
+            Wall time of the workflow including children.
+        """
+
+        now = time.localtime()
+        session = {
+            "session_time": time.strftime("%Y-%m-%dT%H:%M:%S%z", now),
+            "session_date": time.strftime("%Y-%m-%d", now),
+            "last_session_time": time.strftime("%Y-%m-%dT%H:%M:%S%z", now),
+        }
+        self._origin = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            self._pool = pool
+            self.root, _ = self._run_task(f"+{self.workflow_path.stem}", self.workflow, session, {}, params or {})
+
+        self.output(self.report())
+        return self.root
+
+    def report(self) -> str:
+        """Format the critical path and waiting time of each stage of the last run."""
+        if self.root is None:
+            raise ValueError("Workflow hasn't run yet.")
+
+        path = self.root.critical_path()
+        width = max(len(task.name) for task in self.root.leaves() + self.root.children)
+        running, waiting = sum(task.elapsed for task in path), sum(task.waited for task in path)
+        lines = [f"Critical path: {running:.3f}s running and {waiting:.3f}s waiting of {self.root.elapsed:.3f}s"]
+        lines.extend(f"  {task.name:<{width}}  {task.elapsed:8.3f}s  waited {task.waited:.3f}s" for task in path)
+        lines.append("Waiting time by stage:")
+        lines.extend(f"  {stage.name:<{width}}  {stage.waited:8.3f}s" for stage in self.root.children)
+        return "\n".join(lines)
+
+    def _now(self) -> float:
+        return time.perf_counter() - self._origin
+
+    def _run_task(
+            self,
+            name: str,
+            config: Dict[str, Any],
+            env: Dict[str, Any],
+            store: Dict[str, Any],
+            overrides: Dict[str, Any]) -> Tuple[TaskRun, Dict[str, Any]]:
+        """Run a task and return its wall time and the store updated by it."""
+
+        # Stored parameters aren't inherited via env since td.last_results is replaced as a whole
+        env, params = dict(env), _merge(env, store)
+        for key, value in config.get("_export", {}).items():
+            resolved = _resolve(value, params)
+            env, params = _merge(env, {key: resolved}), _merge(params, {key: resolved})
+        for key, value in config.items():
+            if not key.startswith(("+", "_")) and key not in _OPERATORS:
+                env[key] = params[key] = _resolve(value, params)
+        env, params = _merge(env, overrides), _merge(params, overrides)
+
+        operator = next((key for key in _OPERATORS if key in config), None)
+        if operator in ("td>", "td_ddl>", "echo>"):
+            return self._run_operator(name, operator, config, params, store)
+
+        parallel = config.get("_parallel", False)
+        if operator == "if>":
+            branch = "_do" if _is_true(_resolve(config["if>"], params)) else "_else_do"
+            children = [(f"{name}^sub", config[branch], {})] if branch in config else []
+            parallel = False
+        elif operator == "for_each>":
+            variables = _resolve(config["for_each>"], params)
+            children = [(f"{name}^sub+for-{i}", config["_do"], dict(zip(variables.keys(), values)))
+                        for i, values in enumerate(itertools.product(*variables.values()))]
+        elif operator == "td_for_each>":
+            query = substitute(self._read_query(config["td_for_each>"]), params)
+            rows = self.executor(query, {}, params)
+            children = [(f"{name}^sub+for-{i}", config["_do"], {"td": {"each": row}}) for i, row in enumerate(rows)]
+        else:
+            children = [(name + key, value, {}) for key, value in config.items() if key.startswith("+")]
+
+        group = TaskRun(name, parallel=bool(parallel) and len(children) > 1)
+        group.ready = group.start = self._now()
+        if group.parallel:
+            limit = parallel.get("limit", len(children)) if isinstance(parallel, dict) else len(children)
+            with ThreadPoolExecutor(max_workers=limit) as coordinator:
+                futures = [coordinator.submit(self._run_task, child_name, child, _merge(env, child_params),
+                                              store, overrides)
+                           for child_name, child, child_params in children]
+                results = [future.result() for future in futures]
+            for child_run, child_store in results:
+                group.children.append(child_run)
+                store = _merge(store, child_store)
+        else:
+            for child_name, child, child_params in children:
+                child_run, store = self._run_task(child_name, child, _merge(env, child_params), store, overrides)
+                group.children.append(child_run)
+        group.end = self._now()
+        return group, store
+
+    def _run_operator(
+            self,
+            name: str,
+            operator: str,
+            config: Dict[str, Any],
+            params: Dict[str, Any],
+            store: Dict[str, Any]) -> Tuple[TaskRun, Dict[str, Any]]:
+        task = TaskRun(name)
+        task_config = {key: params[key] for key in config if key in params}
+        if operator == "echo>":
+            task.ready = task.start = self._now()
+            self.output(str(_resolve(config["echo>"], params)))
+            task.end = self._now()
+            return task, store
+
+        if operator == "td>":
+            query = substitute(self._read_query(config["td>"]), params)  # type: Optional[str]
+        else:
+            query = None
+
+        def run() -> List[Dict[str, Any]]:
+            task.start = self._now()
+            try:
+                return self.executor(query, task_config, params)
+            finally:
+                task.end = self._now()
+
+        task.ready = self._now()
+        rows = self._pool.submit(run).result()
+        if _is_true(config.get("store_last_results", False)):
+            store = _merge(store, {"td": {"last_results": None}})
+            store["td"]["last_results"] = rows[0] if rows else {}
+        return task, store
+
+    def _read_query(self, path: str) -> str:
+        with (self.workflow_path.parent / path).open() as f:
+            return f.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a workflow dumped by generate_workflow locally")
+    parser.add_argument('dig', metavar='file', type=str,
+                        help='dig file path to run')
+    parser.add_argument('--database', type=str, default=':memory:',
+                        help='SQLite database path storing tables')
+    parser.add_argument('--max-workers', type=int, default=4,
+                        help='the number of threads running td> tasks')
+    parser.add_argument('-p', '--param', action='append', default=[], metavar='KEY=VALUE',
+                        help='parameter overriding exported ones')
+
+    args = parser.parse_args()
+
+    params = dict(param.split("=", 1) for param in args.param)
+    runner = WorkflowRunner(args.dig, LocalEngine(args.database).run_task, max_workers=args.max_workers)
+    runner.run(params)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,3 +3,4 @@ from .linear_model import predict_classifier, predict_regressor
 from .tree_model import train_randomforest_classifier, train_randomforest_regressor
 from .tree_model import predict_randomforest_classifier, predict_randomforest_regressor
 from .tree_model import _extract_attrs, TREE_MODEL_TRAINERS, TREE_MODEL_PREDICTORS
+from .linear_model import LINEAR_MODEL_TRAINERS, LINEAR_MODEL_PREDICTORS
@@ -13,7 +13,11 @@ def base_model(function: str,
                hashing: bool = False,
                with_clause: bool = False,
                oversample_pos_n_times: Optional[Union[int, str]] = None,
-               oversample_n_times: Optional[Union[int, str]] = None) -> str:
+               oversample_n_times: Optional[Union[int, str]] = None,
+               feature_ids: bool = False,
+               previous_model_table: Optional[str] = None,
+               decay: float = 0.5,
+               segment_column: Optional[str] = None) -> str:
     """Build model query
 
     Parameters
@@ -39,6 +43,18 @@ def base_model(function: str,
         Scale for oversampling positive class. This option and oversample_n_times are exclusive.
     oversample_n_times : int or :obj:`str`, optional
         Scale for oversampling train data. This option and oversample_pos_n_times are exclusive.
+    feature_ids : bool
+        Whether features are integer feature ids built with a feature dictionary.
+        If True, feature column of the model is stored as int. Default: False
+    previous_model_table : :obj:`str`, optional
+        A model table trained before. If set, weights of the new model are blended with
+        weights of the previous model by a weighted average per feature.
+    decay : float
+        Weight of the previous model relative to the new model for blending. Default: 0.5
+    segment_column : :obj:`str`, optional
+        A column name to train a model per segment in one job. Features are prefixed with "{segment}^"
+        and rows are distributed by segment. The model table has the segment column in addition to
+        feature and weight. Segment values shouldn't include "^".
 
     Returns
     --------
@@ -57,6 +73,16 @@ def base_model(function: str,
         _source_table = "train_oversampled"
         _without_semicolon = True
 
+    if feature_ids or previous_model_table:
+        _without_semicolon = True
+
+    if segment_column:
+        if feature_ids or previous_model_table or oversample_pos_n_times or oversample_n_times:
+            raise ValueError("segment_column can't be used with feature_ids, previous_model_table or oversampling.")
+
+        return _segmented_model(function, storage_format, target, source_table, option, bias, hashing,
+                                with_clause, segment_column)
+
     _features = "features"
     _features = f"feature_hashing({_features})" if hashing else _features
     _features = f"add_bias({_features})" if bias else _features
@@ -72,8 +98,20 @@ def base_model(function: str,
 
     _query = build_query([select_clause], _source_table, without_semicolon=_without_semicolon)  # type: str
 
+    _feature = "cast(feature as int) as feature" if feature_ids else "feature"
+
     if not oversample_pos_n_times and not oversample_n_times:
-        return _query
+        if previous_model_table:
+            return _blend_models(
+                OrderedDict({"model": _query}), previous_model_table, decay, _feature, with_clause)
+
+        if not feature_ids:
+            return _query
+
+        return build_query(
+            [_feature, "weight"],
+            "model",
+            without_semicolon=with_clause, with_clauses=OrderedDict({"model": _query}))
 
     if oversample_pos_n_times:
         _with_clause = build_query(
@@ -109,8 +147,82 @@ def base_model(function: str,
 
         _with_clauses["model_oversampled"] = _query
 
+    if previous_model_table:
+        _with_clauses["model"] = build_query(
+            ["feature", "avg(weight) as weight"],
+            "model_oversampled",
+            condition="group by\n  feature",
+            without_semicolon=True)
+
+        return _blend_models(_with_clauses, previous_model_table, decay, _feature, with_clause)
+
     return build_query(
-        ["feature", "avg(weight) as weight"],
+        [_feature, "avg(weight) as weight"],
         "model_oversampled",
         condition="group by\n  feature",
         without_semicolon=with_clause, with_clauses=_with_clauses)
+
+
+def _blend_models(
+        with_clauses: OrderedDict,
+        previous_model_table: str,
+        decay: float,
+        feature: str,
+        with_clause: bool) -> str:
+    """Blend "model" with clause and a previous model table by a weighted average of weights per feature."""
+
+    with_clauses["blended"] = "\nunion all\n".join([
+        build_query([feature, "weight", "1.0 as model_weight"], "model", without_semicolon=True),
+        build_query([feature, "weight", f"{decay} as model_weight"], previous_model_table, without_semicolon=True)
+    ])
+
+    return build_query(
+        ["feature", "sum(weight * model_weight) / sum(model_weight) as weight"],
+        "blended",
+        condition="group by\n  feature",
+        without_semicolon=with_clause, with_clauses=with_clauses)
+
+
+def _segmented_model(
+        function: str,
+        storage_format: Optional[str],
+        target: str,
+        source_table: str,
+        option: Optional[str],
+        bias: bool,
+        hashing: bool,
+        with_clause: bool,
+        segment_column: str) -> str:
+    """Build a query to train a model per segment with features prefixed by the segment."""
+
+    _features = "features"
+    _features = f"feature_hashing({_features})" if hashing else _features
+    _features = f"add_bias({_features})" if bias else _features
+
+    # Prefix every feature with "{segment}^" so that weights of each segment are learned independently
+    _segment = f"cast({segment_column} as string)"
+    _prefixed = f"split(concat({_segment}, '^', concat_ws(concat('\\001', {_segment}, '^'), {_features})), '\\001')"
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["train_segmented"] = build_query(
+        [f"{_prefixed} as features", target],
+        source_table,
+        condition=f"DISTRIBUTE BY {segment_column}",
+        without_semicolon=True)
+
+    select_clause = textwrap.dedent("""\
+    {function}(
+      features
+      , {target}
+    """.format_map({"function": function, "target": target}))
+    select_clause += f"  , '{option}'\n" if option else ""
+    _as = f" as ({storage_format})" if storage_format else ""
+    select_clause += f"){_as}"
+    _with_clauses["model_segmented"] = build_query([select_clause], "train_segmented", without_semicolon=True)
+
+    return build_query(
+        [f"substr(feature, 1, instr(feature, '^') - 1) as {segment_column}",
+         "substr(feature, instr(feature, '^') + 1) as feature",
+         "weight"],
+        "model_segmented",
+        without_semicolon=with_clause, with_clauses=_with_clauses)
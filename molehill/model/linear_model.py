@@ -1,9 +1,13 @@
 from collections import OrderedDict
-from typing import Optional, Tuple, Union
+from typing import List, Optional, Tuple, Union
 from .base import base_model
 from ..utils import build_query
 
 
+LINEAR_MODEL_TRAINERS = ['train_classifier', 'train_regressor']
+LINEAR_MODEL_PREDICTORS = ['predict_classifier', 'predict_regressor']
+
+
 def train_classifier(
         source_table: str = "${source}",
         target: str = "target",
@@ -11,7 +15,11 @@ def train_classifier(
         bias: bool = False,
         hashing: bool = False,
         oversample_pos_n_times: Optional[Union[int, str]] = None,
-        oversample_n_times: Optional[Union[int, str]] = None) -> str:
+        oversample_n_times: Optional[Union[int, str]] = None,
+        feature_ids: bool = False,
+        previous_model_table: Optional[str] = None,
+        decay: float = 0.5,
+        segment_column: Optional[str] = None) -> str:
     """Build train_classifier query
 
     Parameters
@@ -31,6 +39,14 @@ def train_classifier(
         Scale for oversampling positive class.
     oversample_n_times : int or :obj:`str`, optional
         Scale for oversampling train data. This option and oversample_pos_n_times are exclusive.
+    feature_ids : bool
+        Whether features are integer feature ids built with a feature dictionary. Default: False
+    previous_model_table : :obj:`str`, optional
+        A model table trained before. If set, the new model is blended with the previous model.
+    decay : float
+        Weight of the previous model relative to the new model for blending. Default: 0.5
+    segment_column : :obj:`str`, optional
+        A column name to train a model per segment. The model table has the segment column.
 
     Returns
     --------
@@ -46,7 +62,11 @@ def train_classifier(
                       bias=bias,
                       hashing=hashing,
                       oversample_pos_n_times=oversample_pos_n_times,
-                      oversample_n_times=oversample_n_times)
+                      oversample_n_times=oversample_n_times,
+                      feature_ids=feature_ids,
+                      previous_model_table=previous_model_table,
+                      decay=decay,
+                      segment_column=segment_column)
 
 
 def train_regressor(
@@ -56,7 +76,11 @@ def train_regressor(
         bias: bool = False,
         hashing: bool = False,
         oversample_pos_n_times: Optional[Union[int, str]] = None,
-        oversample_n_times: Optional[Union[int, str]] = None) -> str:
+        oversample_n_times: Optional[Union[int, str]] = None,
+        feature_ids: bool = False,
+        previous_model_table: Optional[str] = None,
+        decay: float = 0.5,
+        segment_column: Optional[str] = None) -> str:
     """Build train_classifier query
 
     Parameters
@@ -76,6 +100,14 @@ def train_regressor(
         Scale for oversampling positive class.
     oversample_n_times : int or :obj:`str`, optional
         Scale for oversampling train data. This option and oversample_pos_n_times are exclusive.
+    feature_ids : bool
+        Whether features are integer feature ids built with a feature dictionary. Default: False
+    previous_model_table : :obj:`str`, optional
+        A model table trained before. If set, the new model is blended with the previous model.
+    decay : float
+        Weight of the previous model relative to the new model for blending. Default: 0.5
+    segment_column : :obj:`str`, optional
+        A column name to train a model per segment. The model table has the segment column.
 
     Returns
     --------
@@ -91,7 +123,11 @@ def train_regressor(
                       bias=bias,
                       hashing=hashing,
                       oversample_pos_n_times=oversample_pos_n_times,
-                      oversample_n_times=oversample_n_times)
+                      oversample_n_times=oversample_n_times,
+                      feature_ids=feature_ids,
+                      previous_model_table=previous_model_table,
+                      decay=decay,
+                      segment_column=segment_column)
 
 
 def _build_prediction_query(
@@ -102,42 +138,58 @@ def _build_prediction_query(
         bias: bool = False,
         hashing: bool = False,
         sigmoid: bool = False,
-        pos_oversampling: bool = False) -> str:
+        pos_oversampling: bool = False,
+        feature_ids: bool = False,
+        segment_column: Optional[str] = None,
+        passthrough_columns: Optional[List[str]] = None) -> str:
+
+    _passthrough = passthrough_columns or []
+    if predicted_column in _passthrough:
+        raise ValueError(f"Predicted column {predicted_column} conflicts with passthrough_columns.")
 
     _features = "features"
     _features = f"feature_hashing({_features})" if hashing else _features
     _features = f"add_bias({_features})" if bias else _features
+    _feature = "cast(extract_feature(fv) as int) as feature" if feature_ids else "extract_feature(fv) as feature"
 
     if sigmoid:
         _total_weight = f"sigmoid(sum(m1.weight * t1.value)) as {predicted_column}"
     else:
         _total_weight = f"sum(m1.weight * t1.value) as {predicted_column}"
 
+    _segment = [segment_column] if segment_column else []
+    _join_condition = "t1.feature = m1.feature"
+    if segment_column:
+        # Segment is stored as string in a segmented model table
+        _join_condition += f" and cast(t1.{segment_column} as string) = m1.{segment_column}"
+
     _with_clauses = OrderedDict({
         "features_exploded": build_query(
-            [id_column, "extract_feature(fv) as feature", "extract_weight(fv) as value"],
+            [id_column] + _segment + [c for c in _passthrough if c not in _segment]
+            + [_feature, "extract_weight(fv) as value"],
             f"{target_table} t1\nLATERAL VIEW explode({_features}) t2 as fv",
             without_semicolon=True
         )
     })
+    _group_by = ", ".join(f"t1.{column}" for column in [id_column] + _passthrough)
     if pos_oversampling:
         _with_clauses['score'] = build_query(
-            [f"t1.{id_column}", _total_weight],
-            f"features_exploded t1\nleft outer join {model_table} m1 on (t1.feature = m1.feature)",
-            condition=f"group by \n  t1.{id_column}",
+            [f"t1.{id_column}"] + [f"t1.{column}" for column in _passthrough] + [_total_weight],
+            f"features_exploded t1\nleft outer join {model_table} m1 on ({_join_condition})",
+            condition=f"group by \n  {_group_by}",
             without_semicolon=True)
 
         return build_query(
-            [f"t.{id_column}",
-             (f"t.{predicted_column} / (t.{predicted_column} + (1.0 - t.{predicted_column}) /"
-              f" ${{td.last_results.downsampling_rate}}) as {predicted_column}")],
+            [f"t.{id_column}"] + [f"t.{column}" for column in _passthrough]
+            + [(f"t.{predicted_column} / (t.{predicted_column} + (1.0 - t.{predicted_column}) /"
+                f" ${{td.last_results.downsampling_rate}}) as {predicted_column}")],
             "score t",
             with_clauses=_with_clauses)
     else:
         return build_query(
-            [f"t1.{id_column}", _total_weight],
-            f"features_exploded t1\nleft outer join {model_table} m1\n  on (t1.feature = m1.feature)",
-            condition=f"group by\n  t1.{id_column}",
+            [f"t1.{id_column}"] + [f"t1.{column}" for column in _passthrough] + [_total_weight],
+            f"features_exploded t1\nleft outer join {model_table} m1\n  on ({_join_condition})",
+            condition=f"group by\n  {_group_by}",
             with_clauses=_with_clauses)
 
 
@@ -148,7 +200,10 @@ def predict_classifier(
         sigmoid: bool = True,
         bias: bool = False,
         hashing: bool = False,
-        oversample_pos_n_times: Optional[Union[int, str]] = None, **kwargs) -> Tuple[str, str]:
+        oversample_pos_n_times: Optional[Union[int, str]] = None,
+        feature_ids: bool = False,
+        segment_column: Optional[str] = None,
+        passthrough_columns: Optional[List[str]] = None, **kwargs) -> Tuple[str, str]:
     """Build a prediction query for train_classifier
 
     Parameters
@@ -169,6 +224,13 @@ def predict_classifier(
         Execute feature hashing. Default: False
     oversample_pos_n_times : int or :obj:`str`, optional
         Scale for oversampling positive class.
+    feature_ids : bool
+        Whether features are integer feature ids built with a feature dictionary. Default: False
+    segment_column : :obj:`str`, optional
+        A column name of segments. Features are joined with a model table trained per segment.
+    passthrough_columns : :obj:`list` of :obj:`str`, optional
+        Column names of a target table to be kept in a prediction table, e.g. target column
+        to evaluate predictions without joining a test table.
 
     Returns
     --------
@@ -182,7 +244,8 @@ def predict_classifier(
 
     return _build_prediction_query(
         predicted_column, target_table, id_column, model_table,
-        bias=bias, hashing=hashing, sigmoid=sigmoid, pos_oversampling=bool(oversample_pos_n_times)
+        bias=bias, hashing=hashing, sigmoid=sigmoid, pos_oversampling=bool(oversample_pos_n_times),
+        feature_ids=feature_ids, segment_column=segment_column, passthrough_columns=passthrough_columns
     ), predicted_column
 
 
@@ -193,7 +256,10 @@ def predict_regressor(
         predicted_column: str = "target",
         bias: bool = False,
         hashing: bool = False,
-        oversample_pos_n_times: Optional[Union[int, str]] = None, **kwargs) -> Tuple[str, str]:
+        oversample_pos_n_times: Optional[Union[int, str]] = None,
+        feature_ids: bool = False,
+        segment_column: Optional[str] = None,
+        passthrough_columns: Optional[List[str]] = None, **kwargs) -> Tuple[str, str]:
     """Build a prediction query for train_regressor
 
     Parameters
@@ -212,6 +278,13 @@ def predict_regressor(
         Execute feature hashing. Default: False
     oversample_pos_n_times : int or :obj:`str`, optional
         Scale for oversampling positive class.
+    feature_ids : bool
+        Whether features are integer feature ids built with a feature dictionary. Default: False
+    segment_column : :obj:`str`, optional
+        A column name of segments. Features are joined with a model table trained per segment.
+    passthrough_columns : :obj:`list` of :obj:`str`, optional
+        Column names of a target table to be kept in a prediction table, e.g. target column
+        to evaluate predictions without joining a test table.
 
     Returns
     --------
@@ -223,5 +296,6 @@ def predict_regressor(
 
     return _build_prediction_query(
         predicted_column, target_table, id_column, model_table,
-        bias=bias, hashing=hashing, sigmoid=False, pos_oversampling=bool(oversample_pos_n_times)
+        bias=bias, hashing=hashing, sigmoid=False, pos_oversampling=bool(oversample_pos_n_times),
+        feature_ids=feature_ids, segment_column=segment_column, passthrough_columns=passthrough_columns
     ), predicted_column
@@ -182,7 +182,12 @@ def _build_prediction_query(
         id_column: str,
         model_table: str,
         classification: bool = False,
-        hashing: bool = False) -> str:
+        hashing: bool = False,
+        passthrough_columns: Optional[List[str]] = None) -> str:
+
+    _passthrough = passthrough_columns or []
+    if set(_passthrough) & {"label", "probability"}:
+        raise ValueError("passthrough_columns can't contain label or probability.")
 
     _features = "t.features"
     _features = f"feature_hashing({_features})" if hashing else _features
@@ -193,17 +198,17 @@ def _build_prediction_query(
         condition="DISTRIBUTE BY rand(1)", without_semicolon=True)
     _classification = ', "-classification"' if classification else ''
     _with_clauses['t1'] = build_query(
-        [f"t.{id_column}",
-         "p.model_weight",
+        [f"t.{id_column}"] + [f"t.{column}" for column in _passthrough] +
+        ["p.model_weight",
          f"tree_predict(p.model_id, p.model, {_features}{_classification}) as predicted"],
         "p",
         condition=f"left outer join {target_table} t", without_semicolon=True)
     _with_clauses['ensembled'] = build_query(
-        [id_column, "rf_ensemble(predicted.value, predicted.posteriori, model_weight) as predicted"],
+        [id_column] + _passthrough + ["rf_ensemble(predicted.value, predicted.posteriori, model_weight) as predicted"],
         "t1",
-        condition=f"group by\n  {id_column}", without_semicolon=True)
+        condition="group by\n  {}".format(", ".join([id_column] + _passthrough)), without_semicolon=True)
     query = build_query(
-        [id_column, "predicted.label", "predicted.probabilities[1] as probability"],
+        [id_column] + _passthrough + ["predicted.label", "predicted.probabilities[1] as probability"],
         "ensembled", with_clauses=_with_clauses)
     return query
 
@@ -212,7 +217,8 @@ def predict_randomforest_classifier(
         target_table: str = "${target_table}",
         id_column: str = "rowid",
         model_table: str = "${model_table}",
-        hashing: bool = False) -> Tuple[str, str]:
+        hashing: bool = False,
+        passthrough_columns: Optional[List[str]] = None) -> Tuple[str, str]:
     """Build prediction query for randomforest classifier.
 
     Parameters
@@ -225,6 +231,9 @@ def predict_randomforest_classifier(
         Model table name.
     hashing : bool
         Execute feature hashing. Default: False
+    passthrough_columns : :obj:`list` of :obj:`str`, optional
+        Column names of a target table to be kept in a prediction table, e.g. target column
+        to evaluate predictions without joining a test table.
 
     Returns
     -------
@@ -235,14 +244,16 @@ def predict_randomforest_classifier(
     """
 
     return _build_prediction_query(target_table, id_column, model_table,
-                                   classification=True, hashing=hashing), "probability"
+                                   classification=True, hashing=hashing,
+                                   passthrough_columns=passthrough_columns), "probability"
 
 
 def predict_randomforest_regressor(
         target_table: str = "${target_table}",
         id_column: str = "rowid",
         model_table: str = "${model_table}",
-        hashing: bool = False) -> Tuple[str, str]:
+        hashing: bool = False,
+        passthrough_columns: Optional[List[str]] = None) -> Tuple[str, str]:
     """Build prediction query for randomforest_regressor.
 
     Parameters
@@ -255,6 +266,9 @@ def predict_randomforest_regressor(
         Model table name.
     hashing : bool
         Execute feature hashing. Default: False
+    passthrough_columns : :obj:`list` of :obj:`str`, optional
+        Column names of a target table to be kept in a prediction table, e.g. target column
+        to evaluate predictions without joining a test table.
 
     Returns
     -------
@@ -265,4 +279,4 @@ def predict_randomforest_regressor(
     """
 
     return _build_prediction_query(target_table, id_column, model_table,
-                                   hashing=hashing), "target"
+                                   hashing=hashing, passthrough_columns=passthrough_columns), "target"
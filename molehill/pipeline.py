@@ -1,17 +1,27 @@
 import sys
+import textwrap
 import shutil
 import yaml
 from collections import OrderedDict
 from typing import Optional, List, Tuple, Any, Dict, Union
 from pathlib import Path
 from .preprocessing import shuffle, train_test_split
-from .preprocessing import Imputer, Normalizer
-from .preprocessing import vectorize, cardinality
+from .preprocessing import Imputer, Normalizer, Binner
+from .preprocessing import RareLevelCollapser, level_frequency
+from .preprocessing import TargetEncoder
+from .preprocessing import feature_scores, select_features
+from .preprocessing import vectorize, build_feature_dictionary, merge_vectors, cardinality
+from .preprocessing import profile, load_profile, choose_encoding
 from .preprocessing import downsampling_rate
-from .evaluation import evaluate
+from .evaluation import evaluate, leaderboard, evaluate_slices, evaluate_thresholds, best_threshold
 from .stats import compute_stats, combine_train_test_stats
-from .utils import build_query
+from .stats import compute_stats_long, combine_train_test_stats_long, pivot_stats
+from .stats import partition_summaries, merge_partition_summaries
+from .utils import build_query, chunk_columns
+from .planner import Plan, plan_pipeline, load_table_profile, query_stage, STAGE_ENGINES
+from .dialect import check_dialect
 from .model import TREE_MODEL_TRAINERS, TREE_MODEL_PREDICTORS
+from .model import LINEAR_MODEL_TRAINERS, LINEAR_MODEL_PREDICTORS
 
 
 def _represent_odict(dumper, instance):
@@ -27,10 +37,15 @@ yaml.add_constructor('tag:yaml.org,2002:map', construct_odict)
 
 od = OrderedDict
 
+# Estimated weight of a query task per engine to bound parallelism, since Hive jobs are heavier than Presto
+ENGINE_WEIGHTS = {"presto": 1, "hive": 2}
+
 
 class Pipeline:
     def __init__(self):
         self.comp_stats_task = None
+        self.stats_chunk_paths = []  # type: List[Path]
+        self.chunk_size = None  # type: Optional[int]
         self.combine_stats_path = None
         self.workflow_path = None
         self.query_dir = None
@@ -40,11 +55,31 @@ class Pipeline:
         self.imputed_columns = []
         self.imputation_clauses = []
         self.imputation_clauses_whole = []
+        self.collapsed_columns = []
+        self.target_encoded_columns = []
+        self.target_encoder_opt = None  # type: Optional[Dict[str, Any]]
         self.normalized_columns = []
         self.normalization_clauses = []
         self.normalization_clauses_whole = []
+        self.percentiles = []  # type: List[float]
+        self.stats_mode = "last_results"
+        self.incremental_stats = None  # type: Optional[Dict[str, Any]]
+        self.incremental = None  # type: Optional[Dict[str, Any]]
+        self.segment_column = None  # type: Optional[str]
+        self.table_suffix = ""
+        # Whether predictions carry target column so that evaluation doesn't join a test table
+        self.carry_target = False
+        self.thresholds = None  # type: Optional[Dict[str, Any]]
+        self.bootstrap = None  # type: Optional[int]
+        self.slice_columns = []  # type: List[str]
+        self.plan = None  # type: Optional[Plan]
+        # Engines of stages which can emit either Hive or Presto expressions
+        self.stage_engines = {"shuffle": "hive", "imputation": "presto", "normalization": "hive"}
+        self.required_stats = {}  # type: Dict[str, List[Tuple[str, str, str]]]
         self.id_column = None
         self.target_column = None
+        self.feature_ids = False
+        self.column_encodings = None  # type: Optional[OrderedDict]
 
     @staticmethod
     def save_query(file_path: Union[str, Path], query: str) -> None:
@@ -65,6 +100,27 @@ class Pipeline:
         -------
         None
         """
+        # Queries are split into column chunks for very wide tables
+        chunk_conf = config.get("chunking", {})
+        num_columns = sum(len(cols["columns"]) for column_type in ["numerical_columns", "categorical_columns"]
+                          for cols in config.get(column_type, []))
+        if num_columns > chunk_conf.get("threshold", 1000):
+            self.chunk_size = chunk_conf.get("chunk_size", 500)
+
+        self.segment_column = config.get("segment_column")
+
+        # Chunked and per-segment stats can't be merged into td.last_results, so they are stored in tables
+        self.stats_mode = config.get("stats", {}).get(
+            "mode", "table" if self.chunk_size or self.segment_column else "last_results")
+        if self.stats_mode not in ["last_results", "table"]:
+            raise ValueError(f"Unknown stats mode: {self.stats_mode}")
+        if (self.chunk_size or self.segment_column) and self.stats_mode != "table":
+            raise ValueError("Stats mode should be table for chunked queries or segment_column.")
+        self.incremental_stats = config.get("stats", {}).get("incremental")
+        if (self.chunk_size or self.segment_column) and self.incremental_stats is not None:
+            raise ValueError("Incremental stats can't be used with chunked queries or segment_column.")
+        stats_alias = "st" if self.stats_mode == "table" else None
+
         for column_type in ["numerical_columns", "categorical_columns"]:
             for cols in config.get(column_type, []):
                 _columns = cols["columns"]
@@ -75,35 +131,94 @@ class Pipeline:
                     self.categorical_columns.extend(cols["columns"])
 
                 if cols.get("transformer"):
+                    collapser = None
+                    if column_type == "categorical_columns" and cols['transformer'].get('collapser'):
+                        if self.stage_engines["imputation"] != "presto":
+                            raise ValueError("collapser requires presto for imputation.")
+                        self.collapsed_columns.extend(_columns)
+                        _opt = cols['transformer']['collapser']
+                        collapser = RareLevelCollapser(f"{config['source']}_level_frequency",
+                                                       _opt.get('min_frequency'),
+                                                       _opt.get('max_levels'),
+                                                       _opt.get('other_token', "__other__"))
+
                     if cols['transformer'].get('imputer'):
                         self.imputed_columns.extend(_columns)
                         _opt = cols['transformer']['imputer']
+                        column_source = collapser.expression() if collapser else None
                         imp = Imputer(_opt['strategy'],
                                       _opt.get('phase'),
                                       _opt.get('fill_value'),
-                                      column_type == "categorical_columns")
-                        self.imputation_clauses.extend([imp.transform(_columns)])
+                                      column_type == "categorical_columns",
+                                      stats_alias,
+                                      self.stage_engines["imputation"])
+                        self.imputation_clauses.extend([imp.transform(_columns, column_source)])
+                        self._add_required_stats("impute", imp.required_stats(_columns))
                         imp_whole = Imputer(_opt['strategy'],
                                             None,
                                             _opt.get('fill_value'),
-                                            column_type == "categorical_columns")
-                        self.imputation_clauses_whole.extend([imp_whole.transform(_columns)])
+                                            column_type == "categorical_columns",
+                                            stats_alias,
+                                            self.stage_engines["imputation"])
+                        self.imputation_clauses_whole.extend([imp_whole.transform(_columns, column_source)])
+                        self._add_required_stats("impute_whole", imp_whole.required_stats(_columns))
+
+                    elif collapser:
+                        # Collapsing rare levels is executed in the imputation stage
+                        self.imputed_columns.extend(_columns)
+                        self.imputation_clauses.extend([collapser.transform(_columns)])
+                        self.imputation_clauses_whole.extend([collapser.transform(_columns)])
+
+                    if column_type == "categorical_columns" and cols['transformer'].get('target_encoder'):
+                        _opt = dict(cols['transformer']['target_encoder'])
+                        if self.target_encoder_opt is not None and self.target_encoder_opt != _opt:
+                            raise ValueError("All target_encoder options should be the same.")
+                        self.target_encoder_opt = _opt
+                        self.target_encoded_columns.extend(_columns)
 
                     if cols['transformer'].get('normalizer'):
                         self.normalized_columns.extend(_columns)
                         _opt = cols['transformer']['normalizer']
-                        norm = Normalizer(_opt['strategy'], _opt.get('phase'))
+                        norm = Normalizer(
+                            _opt['strategy'], _opt.get('phase'), stats_alias, self.stage_engines["normalization"])
                         self.normalization_clauses.extend([norm.transform(_columns)])
-                        norm_whole = Normalizer(_opt['strategy'], None)
+                        self._add_required_stats("normalize", norm.required_stats(_columns))
+                        norm_whole = Normalizer(
+                            _opt['strategy'], None, stats_alias, self.stage_engines["normalization"])
                         self.normalization_clauses_whole.extend([norm_whole.transform(_columns)])
+                        self._add_required_stats("normalize_whole", norm_whole.required_stats(_columns))
+
+                    if column_type == "numerical_columns" and cols['transformer'].get('binner'):
+                        if cols['transformer'].get('normalizer'):
+                            raise ValueError("normalizer and binner are exclusive.")
+
+                        # Binning is executed in the normalization stage
+                        self.normalized_columns.extend(_columns)
+                        _opt = cols['transformer']['binner']
+                        binner = Binner(_opt.get('n_bins', 10), _opt.get('phase'), stats_alias)
+                        self.normalization_clauses.extend([binner.transform(_columns)])
+                        self._add_required_stats("normalize", binner.required_stats(_columns))
+                        binner_whole = Binner(_opt.get('n_bins', 10), None, stats_alias)
+                        self.normalization_clauses_whole.extend([binner_whole.transform(_columns)])
+                        self._add_required_stats("normalize_whole", binner_whole.required_stats(_columns))
+                        self.percentiles = sorted(set(self.percentiles + binner.percentiles()))
+
+    def _add_required_stats(self, query_basename: str, required_stats: List[Tuple[str, str, str]]) -> None:
+        self.required_stats.setdefault(query_basename, []).extend(required_stats)
 
     def _build_shuffle_and_split_task(
             self,
             stratify: Optional[bool] = None) -> OrderedDict:
         preparation = od()  # type: OrderedDict[str, Any]
 
+        split_key = None
+        if self.incremental is not None:
+            # Rows are split by a hash so that new rows of train data never include rows previously split into test
+            split_key = self.incremental.get("key_columns", [self.target_column] + self.columns)
+
         shuffle_query = shuffle(
-            self.columns, target_column=self.target_column, id_column=self.id_column, stratify=stratify)
+            self.columns, target_column=self.target_column, id_column=self.id_column, stratify=stratify,
+            dialect=self.stage_engines["shuffle"], split_key=split_key)
         shuffle_path = self.query_dir / "shuffle.sql"
         self.save_query(shuffle_path, shuffle_query)
 
@@ -111,6 +226,8 @@ class Pipeline:
             "td>": str(shuffle_path),
             "create_table": "${source}_shuffled"
         })
+        if self.stage_engines["shuffle"] != "hive":
+            preparation["+shuffle"]["engine"] = self.stage_engines["shuffle"]
 
         train_query, test_query = train_test_split(stratify=stratify)
         split_train_path = self.query_dir / "split_train.sql"
@@ -143,7 +260,9 @@ class Pipeline:
             target_columns: List[str],
             target_clauses: List[str],
             target_clauses_whole: List[str],
-            hive: Optional[bool] = None) -> Tuple[OrderedDict, str, str]:
+            hive: Optional[bool] = None,
+            additional_stats_tasks: Optional[OrderedDict] = None,
+            incremental_source: Optional[str] = None) -> Tuple[OrderedDict, str, str]:
 
         query_path = str(self.query_dir / f"{query_basename}.sql")
         query_path_whole = str(self.query_dir / f"{query_basename}_whole.sql")
@@ -156,10 +275,10 @@ class Pipeline:
         _target_clauses_whole = target_clauses_whole.copy()
         _target_clauses_whole.extend(complement_columns)
 
-        transform_query = build_query(
-            [self.id_column, self.target_column] + _target_clauses, "${source}")
-        transform_query_whole = build_query(
-            [self.id_column, self.target_column] + _target_clauses_whole, "${source}")
+        transform_query = self._build_transform_query(
+            _target_clauses, self.required_stats.get(query_basename), f"{source}_combined_stats")
+        transform_query_whole = self._build_transform_query(
+            _target_clauses_whole, self.required_stats.get(f"{query_basename}_whole"), f"{source}_combined_stats")
 
         self.save_query(query_path, transform_query)
         self.save_query(query_path_whole, transform_query_whole)
@@ -175,18 +294,33 @@ class Pipeline:
             "source": source_train,
             "create_table": vectorize_target_train
         })
+        whole_stats_opt = {"source": source_whole}
+        if self.stats_mode == "table" or incremental_source:
+            # Combined stats table reads whole stats with the stage source name
+            whole_stats_opt["create_table"] = f"{source}_stats"
+
+        compute_stats_tasks = od({
+            "_parallel": True,
+            "+whole": od(self.comp_stats_task, **whole_stats_opt),
+            "+train": od(self.comp_stats_task, **{"source": source_train}),
+            "+test": od(self.comp_stats_task, **{"source": source_test})
+        })
+        if self.stats_chunk_paths:
+            compute_stats_tasks = od({"_parallel": True})
+            for i, stats_chunk_path in enumerate(self.stats_chunk_paths):
+                _chunk_task = od(self.comp_stats_task, **{"td>": str(stats_chunk_path),
+                                                          "create_table": f"${{source}}_stats_chunk_{i}"})
+                compute_stats_tasks[f"+whole_{i}"] = od(_chunk_task, **{"source": source_whole,
+                                                                         "create_table": f"{source}_stats_chunk_{i}"})
+                compute_stats_tasks[f"+train_{i}"] = od(_chunk_task, **{"source": source_train})
+                compute_stats_tasks[f"+test_{i}"] = od(_chunk_task, **{"source": source_test})
+
+        if incremental_source:
+            compute_stats_tasks["+whole"] = self._build_incremental_stats_task(incremental_source, f"{source}_stats")
+
         exec_tasks = od({
-            "+compute_stats": od({
-                "_parallel": True,
-                "+whole": od(self.comp_stats_task, **{"source": source_whole}),
-                "+train": od(self.comp_stats_task, **{"source": source_train}),
-                "+test": od(self.comp_stats_task, **{"source": source_test})
-            }),
-            "+combine_train_test_stats": od({
-                "td>": str(self.combine_stats_path),
-                "engine": "presto",
-                "store_last_results": True
-            }),
+            "+compute_stats": od(compute_stats_tasks, **(additional_stats_tasks or {})),
+            "+combine_train_test_stats": self._build_combine_stats_task(source),
             "+execute": od({
                 "_parallel": True,
                 "+whole": od(_exec_train_task,
@@ -202,6 +336,141 @@ class Pipeline:
 
         return exec_tasks, vectorize_target_train, vectorize_target_test
 
+    def _build_table_exists_task(self, table: str, query_basename: str) -> OrderedDict:
+        """Build a task to store whether a table exists into td.last_results.table_exists."""
+        query_path = self.query_dir / f"{query_basename}.sql"
+        self.save_query(query_path, build_query(
+            ["count(1) > 0 as table_exists"], "information_schema.tables",
+            condition=f"where\n  table_schema = '${{td.database}}'\n  and table_name = '{table}'"))
+
+        return od({
+            "td>": str(query_path),
+            "engine": "presto",
+            "store_last_results": True
+        })
+
+    def _build_incremental_stats_task(self, source: str, stats_table: str) -> OrderedDict:
+        """Build tasks to store summaries of completed partitions and merge them into whole stats.
+
+        Parameters
+        ----------
+        source : :obj:`str`
+            Source table name with a partition key, e.g. time column.
+        stats_table : :obj:`str`
+            Table name of whole stats.
+
+        Returns
+        -------
+        :obj:`OrderedDict`
+            Tasks for whole stats.
+        """
+        partition = self.incremental_stats.get("partition", "td_time_string(time, 'd!')")
+        history_table = self.incremental_stats.get("history_table", f"{source}_stats_history")
+
+        # Only completed partitions are stored, and the rest are summarized at merge every time
+        _completed = f"where\n  {partition} < '${{session_date}}'"
+        init_path = self.query_dir / "stats_history_init.sql"
+        self.save_query(init_path, partition_summaries(
+            "${source}", self.numerical_columns, partition, condition=_completed))
+        append_path = self.query_dir / "stats_history_append.sql"
+        self.save_query(append_path, partition_summaries(
+            "${source}", self.numerical_columns, partition,
+            condition=_completed
+            + f"\n  and {partition} > coalesce((select max(partition_key) from {history_table}), '')"))
+        merge_path = self.query_dir / "merge_stats.sql"
+        self.save_query(merge_path, merge_partition_summaries(
+            history_table, "${source}", self.numerical_columns, partition, self.percentiles,
+            long_format=self.stats_mode == "table"))
+
+        _task = od({"engine": "presto", "source": source})
+        return od({
+            "+check_history": self._build_table_exists_task(history_table, "stats_history_exists"),
+            "+update_history": od({
+                "if>": "${td.last_results.table_exists}",
+                "_do": od({"td>": str(append_path), **_task, "insert_into": history_table}),
+                "_else_do": od({"td>": str(init_path), **_task, "create_table": history_table})
+            }),
+            "+merge": od({"td>": str(merge_path), **_task, "create_table": stats_table})
+        })
+
+    def _build_transform_query(
+            self,
+            clauses: List[str],
+            required_stats: Optional[List[Tuple[str, str, str]]],
+            stats_table: str) -> str:
+        if self.stats_mode != "table" or not required_stats:
+            return build_query([self.id_column, self.target_column] + clauses, "${source}")
+
+        # Required stats are pivoted into a row and cross joined instead of td.last_results
+        _with_clauses = od()  # type: OrderedDict[str, str]
+        _with_clauses["stats"] = pivot_stats(stats_table, required_stats, segmented=bool(self.segment_column))
+        _source = "${source}\ncross join stats st"
+        if self.segment_column:
+            _source = f"${{source}}\nleft join stats st\n  on ({self.segment_column} = st.stats_segment)"
+
+        return build_query(
+            [self.id_column, self.target_column] + clauses, _source, with_clauses=_with_clauses)
+
+    def _build_combine_stats_task(self, source: str) -> OrderedDict:
+        if self.stats_mode == "table":
+            return od({
+                "td>": str(self.combine_stats_path),
+                "engine": "presto",
+                "source": source,
+                "create_table": f"{source}_combined_stats"
+            })
+
+        return od({
+            "td>": str(self.combine_stats_path),
+            "engine": "presto",
+            "store_last_results": True
+        })
+
+    def _build_target_encoding_task(
+            self,
+            source: str,
+            source_train: str,
+            source_test: str,
+            source_whole: str,
+            output_prefix: str) -> Tuple[OrderedDict, str, str]:
+
+        encoding_table = f"{source}_target_encoding"
+        encoder = TargetEncoder(encoding_table, self.target_column, self.id_column, **self.target_encoder_opt)
+        other_columns = [_col for _col in self.columns if _col not in self.target_encoded_columns]
+
+        encoding_path = self.query_dir / "target_encoding.sql"
+        self.save_query(encoding_path, encoder.compute_encoding("${source}", self.target_encoded_columns))
+        query_path = self.query_dir / "target_encode.sql"
+        self.save_query(query_path, encoder.transform("${source}", self.target_encoded_columns, other_columns))
+        query_path_oof = self.query_dir / "target_encode_oof.sql"
+        self.save_query(query_path_oof, encoder.transform(
+            "${source}", self.target_encoded_columns, other_columns, out_of_fold=True))
+
+        _exec_task = od({
+            "td>": str(query_path),
+            "engine": "presto",
+            "source": source_test,
+            "create_table": f"{output_prefix}_test"
+        })
+        exec_tasks = od({
+            "+compute_encoding": od({
+                "td>": str(encoding_path),
+                "engine": "presto",
+                "source": source_train,
+                "create_table": encoding_table
+            }),
+            "+execute": od({
+                "_parallel": True,
+                "+whole": od(_exec_task, **{"source": source_whole, "create_table": output_prefix}),
+                "+train": od(_exec_task, **{"td>": str(query_path_oof),
+                                            "source": source_train,
+                                            "create_table": f"{output_prefix}_train"}),
+                "+test": _exec_task
+            })
+        })
+
+        return exec_tasks, f"{output_prefix}_train", f"{output_prefix}_test"
+
     def _build_cardinality_task(
             self,
             source: str):
@@ -217,6 +486,131 @@ class Pipeline:
                 "store_last_results": True
             })
 
+    def _build_profile_task(
+            self,
+            conf: Dict[str, Any],
+            source: str,
+            source_train: str) -> Optional[OrderedDict]:
+        """Choose categorical encodings from a stored profile, or build tasks to store the profile.
+
+        Parameters
+        ----------
+        conf : :obj:`Dict`
+            Configuration dictionary for categorical_encoding.
+        source : :obj:`str`
+            Source table name used as a prefix of the profile table.
+        source_train : :obj:`str`
+            Train table name to be profiled.
+
+        Returns
+        -------
+        :obj:`OrderedDict`, optional
+            Tasks to store the profile if a profile file doesn't exist yet.
+        """
+        profile_table = conf.get("profile_table", f"{source}_profile")
+        profile_file = conf.get("profile_file", f"{profile_table}.csv")
+
+        if Path(profile_file).exists():
+            threshold_opt = {k: v for k, v in conf.items() if k in [
+                "onehot_max_cardinality", "dictionary_max_cardinality", "max_hashing_buckets"]}
+            self.column_encodings = choose_encoding(
+                load_profile(profile_file), self.categorical_columns, **threshold_opt)
+            return None
+
+        profile_query = profile("${source}", self.categorical_columns + self.numerical_columns)
+        profile_path = self.query_dir / "profile.sql"
+        self.save_query(profile_path, profile_query)
+        download_path = self.query_dir / "download_profile.sql"
+        self.save_query(download_path, build_query(["*"], profile_table))
+
+        return od({
+            "+compute": od({
+                "td>": str(profile_path),
+                "engine": "presto",
+                "source": source_train,
+                "create_table": profile_table
+            }),
+            "+download": od({
+                "td>": str(download_path),
+                "engine": "presto",
+                "download_file": str(profile_file)
+            })
+        })
+
+    def _build_feature_selection_task(
+            self,
+            conf: Dict[str, Any],
+            source: str,
+            source_train: str,
+            stats_numerical_columns: List[str],
+            stats_categorical_columns: List[str],
+            reuse_stats: bool = False) -> Tuple[OrderedDict, str]:
+        """Build tasks to flag features to be kept for vectorization.
+
+        Parameters
+        ----------
+        conf : :obj:`Dict`
+            Configuration dictionary for feature_selection.
+        source : :obj:`str`
+            Source table name used as a prefix of tables.
+        source_train : :obj:`str`
+            Train table name to be vectorized. Scores are computed against this table.
+        stats_numerical_columns : :obj:`list` of :obj:`str`
+            Numerical column names of the stats table.
+        stats_categorical_columns : :obj:`list` of :obj:`str`
+            Categorical column names of the stats table.
+        reuse_stats : bool
+            Reuse train stats computed in the imputation stage instead of computing them.
+
+        Returns
+        -------
+        :obj:`tuple` of :obj:`OrderedDict` and :obj:`str`
+            Tasks and the name of feature selection table.
+        """
+        stats_table = f"{source}_train_stats" if reuse_stats else f"{source}_selection_stats"
+        score_table = f"{source}_feature_scores"
+        selection_table = f"{source}_selected_features"
+        min_scores = conf.get("scores", {})
+
+        tasks = od()  # type: OrderedDict[str, Any]
+        if not reuse_stats:
+            stats_query = compute_stats(
+                "${source}", stats_numerical_columns, with_count=True, categorical_columns=stats_categorical_columns)
+            stats_path = self.query_dir / "selection_stats.sql"
+            self.save_query(stats_path, stats_query)
+            tasks["+compute_stats"] = od({
+                "td>": str(stats_path),
+                "engine": "presto",
+                "source": f"{source}_train",
+                "create_table": stats_table
+            })
+
+        if min_scores:
+            score_query = feature_scores(
+                "${source}", self.target_column, self.numerical_columns, list(min_scores.keys()))
+            score_path = self.query_dir / "feature_scores.sql"
+            self.save_query(score_path, score_query)
+            tasks["+compute_scores"] = od({
+                "td>": str(score_path),
+                "source": source_train,
+                "create_table": score_table
+            })
+
+        selection_query = select_features(
+            stats_table, stats_numerical_columns, stats_categorical_columns,
+            max_null_rate=conf.get("max_null_rate", 1.0), min_std=conf.get("min_std", 0.0),
+            score_table=score_table if min_scores else None, scored_columns=self.numerical_columns,
+            min_scores=min_scores)
+        selection_path = self.query_dir / "select_features.sql"
+        self.save_query(selection_path, selection_query)
+        tasks["+select"] = od({
+            "td>": str(selection_path),
+            "engine": "presto",
+            "create_table": selection_table
+        })
+
+        return tasks, selection_table
+
     def _build_vectorize_task(
             self,
             conf: Dict[str, Any],
@@ -225,18 +619,48 @@ class Pipeline:
             source_test: str,
             require_dense: bool = False) -> Tuple[OrderedDict, str, str]:
 
-        train_table = conf.pop("train_table", "train")
-        test_table = conf.pop("test_table", "test")
-        whole_table = conf.pop("whole_table", "whole")
+        train_table = conf.pop("train_table", "train") + self.table_suffix
+        test_table = conf.pop("test_table", "test") + self.table_suffix
+        whole_table = conf.pop("whole_table", "whole") + self.table_suffix
         dense_opt = conf.pop("dense", {})
         dense_mode = dense_opt.get("mode", "auto")
+        self.feature_ids = conf.pop("feature_ids", None)
+        feature_dictionary_table = conf.pop("feature_dictionary_table", "feature_dictionary") + self.table_suffix
 
         vect_default_opt = {"categorical_columns": self.categorical_columns,
                             "numerical_columns": self.numerical_columns,
                             "id_column": self.id_column}
-        vectorize_query = vectorize("${source}", self.target_column, **dict(vect_default_opt, **conf))
+        vect_sparse_opt = dict(vect_default_opt, **conf)
+
+        if self.column_encodings:
+            hashed_columns = od((column, num_buckets) for column, (encoding, num_buckets)
+                                in self.column_encodings.items() if encoding == "hashing")
+            if hashed_columns:
+                vect_sparse_opt["hashed_columns"] = hashed_columns
+            if self.feature_ids is None:
+                self.feature_ids = any(encoding == "dictionary" for encoding, _ in self.column_encodings.values())
+
+        if self.feature_ids:
+            vect_sparse_opt["feature_dictionary"] = feature_dictionary_table
+        passthrough_columns = []
+        if self.segment_column:
+            if self.feature_ids:
+                raise ValueError("segment_column can't be used with feature_ids.")
+            passthrough_columns.append(self.segment_column)
+        if self.incremental is not None:
+            if self.feature_ids or self.chunk_size:
+                raise ValueError("Incremental training can't be used with feature_ids or chunked vectorization.")
+            passthrough_columns.append(self.incremental.get("time_column", "time"))
+        if self.slice_columns:
+            if self.feature_ids or self.chunk_size:
+                raise ValueError("Evaluation slices can't be used with feature_ids or chunked vectorization.")
+            passthrough_columns.extend(column for column in self.slice_columns if column not in passthrough_columns)
+        if passthrough_columns:
+            vect_sparse_opt["passthrough_columns"] = passthrough_columns
+        vectorize_query = vectorize("${source}", self.target_column, **vect_sparse_opt)
         vectorize_path = self.query_dir / "vectorize.sql"
-        self.save_query(vectorize_path, vectorize_query)
+        if not self.chunk_size:
+            self.save_query(vectorize_path, vectorize_query)
 
         vectorize_task = od({
             "_parallel": True,
@@ -261,41 +685,179 @@ class Pipeline:
             feature_cardinality = dense_opt.get("feature_cardinality", "auto")
             hashing_tree = dense_opt.get("hashing", True)
 
-            if feature_cardinality == 'auto':
+            if feature_cardinality == 'auto' and self.column_encodings:
+                # +compute_cardinality is skipped with a profile, whose bucket sizes are cardinality * 10
+                feature_cardinality = max(num_buckets for _, num_buckets in self.column_encodings.values())
+            elif feature_cardinality == 'auto':
                 feature_cardinality = "${td.last_results.max_categorical_cardinality} * 10"
 
-            additional_opt = {'dense': True}  # type: Dict[str, Union[str, bool]]
-            if feature_cardinality:
-                additional_opt['feature_cardinality'] = "${feature_cardinality}"
-            if hashing_tree:
-                additional_opt['hashing'] = True
-
+            additional_opt = {'dense': True}  # type: Dict[str, Any]
+            dense_params = {}  # type: Dict[str, Any]
+            if self.column_encodings and hashing_tree:
+                # Each categorical column is hashed with its own bucket size
+                additional_opt['hashed_columns'] = od(
+                    (column, num_buckets) for column, (_, num_buckets) in self.column_encodings.items())
+            else:
+                if feature_cardinality:
+                    additional_opt['feature_cardinality'] = "${feature_cardinality}"
+                    dense_params['feature_cardinality'] = feature_cardinality
+                if hashing_tree:
+                    additional_opt['hashing'] = True
+
+            if passthrough_columns:
+                # Tree predictors pass slice columns through from the dense test table for carry_target
+                additional_opt['passthrough_columns'] = passthrough_columns
             _vect_default_opt = dict(vect_default_opt, **additional_opt)
             vectorize_dense_query = vectorize("${source}", self.target_column, **dict(_vect_default_opt, **conf))
             vectorize_dense_path = self.query_dir / "vectorize_dense.sql"
-            self.save_query(vectorize_dense_path, vectorize_dense_query)
+            if not self.chunk_size:
+                self.save_query(vectorize_dense_path, vectorize_dense_query)
 
             vectorize_task["+whole_dense"] = od({
                 "td>": str(vectorize_dense_path),
                 "source": source,
-                "create_table": whole_table + '_dense',
-                "feature_cardinality": feature_cardinality
-            })
+                "create_table": whole_table + '_dense'
+            }, **dense_params)
             vectorize_task["+train_dense"] = od({
                 "td>": str(vectorize_dense_path),
                 "source": source_train,
-                "create_table": train_table + '_dense',
-                "feature_cardinality": feature_cardinality
-            })
+                "create_table": train_table + '_dense'
+            }, **dense_params)
             vectorize_task["+test_dense"] = od({
                 "td>": str(vectorize_dense_path),
                 "source": source_test,
-                "create_table": test_table + '_dense',
-                "feature_cardinality": feature_cardinality
+                "create_table": test_table + '_dense'
+            }, **dense_params)
+
+        if self.incremental is not None:
+            vectorize_task["+train"] = self._build_incremental_vectorize_task(
+                vect_sparse_opt, vectorize_path, source_train, train_table)
+
+        if self.chunk_size:
+            if self.feature_ids:
+                raise ValueError("feature_ids can't be used with chunked vectorization.")
+
+            vect_opts = {str(vectorize_path): vect_sparse_opt}
+            if "+train_dense" in vectorize_task:
+                vect_opts[str(vectorize_dense_path)] = dict(_vect_default_opt, **conf)
+            vectorize_task = self._build_chunked_vectorize_task(vectorize_task, vect_opts)
+
+        if self.feature_ids:
+            dictionary_opt = {k: v for k, v in conf.items() if k in ["emit_null", "force_value"]}
+            if "hashed_columns" in vect_sparse_opt:
+                # Features of hashed columns are looked up by hashed values, e.g. "embarked#12"
+                dictionary_opt["hashed_columns"] = vect_sparse_opt["hashed_columns"]
+            dictionary_query = build_feature_dictionary(
+                "${source}", self.categorical_columns, self.numerical_columns, **dictionary_opt)
+            dictionary_path = self.query_dir / "feature_dictionary.sql"
+            self.save_query(dictionary_path, dictionary_query)
+
+            vectorize_task = od({
+                "+feature_dictionary": od({
+                    "td>": str(dictionary_path),
+                    "source": source_train,
+                    "create_table": feature_dictionary_table
+                }),
+                "+vectorize": vectorize_task
             })
 
         return vectorize_task, train_table, test_table
 
+    def _build_incremental_vectorize_task(
+            self,
+            vect_opt: Dict[str, Any],
+            vectorize_path: Path,
+            source_train: str,
+            train_table: str) -> OrderedDict:
+        """Build tasks to vectorize only new rows of train data and append them to the train table.
+
+        Vectorized new rows are stored into "{train_table}_delta" table for incremental training.
+        All train data is vectorized if the train table doesn't exist yet.
+        """
+        time_column = self.incremental.get("time_column", "time")
+        delta_table = f"{train_table}_delta"
+
+        _watermark = build_query([f"max({time_column}) as watermark"], train_table, without_semicolon=True)
+        delta_query = vectorize(
+            f"${{source}}\ncross join (\n{textwrap.indent(_watermark, '  ')}\n) w", self.target_column,
+            **dict(vect_opt, condition=f"where\n  {time_column} > w.watermark"))
+        delta_path = self.query_dir / "vectorize_delta.sql"
+        self.save_query(delta_path, delta_query)
+        append_path = self.query_dir / "append_delta.sql"
+        self.save_query(append_path, build_query(["*"], delta_table))
+
+        return od({
+            "+check_table": self._build_table_exists_task(train_table, "train_table_exists"),
+            "+delta": od({
+                "if>": "${td.last_results.table_exists}",
+                "_do": od({"td>": str(delta_path), "source": source_train, "create_table": delta_table}),
+                "_else_do": od({"td>": str(vectorize_path), "source": source_train, "create_table": delta_table})
+            }),
+            "+append": od({
+                "td>": str(append_path),
+                "insert_into": train_table
+            })
+        })
+
+    def _build_chunked_vectorize_task(
+            self,
+            vectorize_task: OrderedDict,
+            vect_opts: Dict[str, Dict[str, Any]]) -> OrderedDict:
+        """Replace vectorization tasks with tasks vectorizing per column chunk and merging them.
+
+        Parameters
+        ----------
+        vectorize_task : :obj:`OrderedDict`
+            Vectorization tasks to be chunked.
+        vect_opts : :obj:`Dict`
+            Key is a query path of vectorization and value is its options for :func:`vectorize`.
+
+        Returns
+        -------
+        :obj:`OrderedDict`
+            Tasks with "+chunks" and "+merge".
+        """
+        chunk_tasks = od({"_parallel": True})  # type: OrderedDict[str, Any]
+        merge_tasks = od({"_parallel": True})  # type: OrderedDict[str, Any]
+
+        for query_path, vect_opt in vect_opts.items():
+            basename = Path(query_path).stem
+            numerical_columns = vect_opt["numerical_columns"]
+            chunks = chunk_columns(numerical_columns + vect_opt["categorical_columns"], self.chunk_size)
+
+            # Bias is added once after merging chunks
+            bias = vect_opt.get("bias", False) and not vect_opt.get("dense", False)
+            chunk_paths = []
+            for i, chunk in enumerate(chunks):
+                chunk_opt = dict(vect_opt,
+                                 numerical_columns=[_col for _col in chunk if _col in numerical_columns],
+                                 categorical_columns=[_col for _col in chunk if _col not in numerical_columns],
+                                 bias=False)
+                chunk_path = self.query_dir / f"{basename}_chunk_{i}.sql"
+                self.save_query(chunk_path, vectorize("${source}", self.target_column, **chunk_opt))
+                chunk_paths.append(chunk_path)
+
+            merge_path = self.query_dir / f"{basename}_merge.sql"
+            self.save_query(merge_path, merge_vectors(
+                "${table}", len(chunks), self.target_column, self.id_column,
+                features=vect_opt.get("features", "features"), bias=bias,
+                passthrough_columns=vect_opt.get("passthrough_columns")))
+
+            for name, task in vectorize_task.items():
+                if name.startswith("_") or task["td>"] != query_path:
+                    continue
+
+                for i, chunk_path in enumerate(chunk_paths):
+                    chunk_tasks[f"{name}_{i}"] = od(task, **{"td>": str(chunk_path),
+                                                            "create_table": f"{task['create_table']}_chunk_{i}"})
+                merge_tasks[name] = od({
+                    "td>": str(merge_path),
+                    "table": task["create_table"],
+                    "create_table": task["create_table"]
+                })
+
+        return od({"+chunks": chunk_tasks, "+merge": merge_tasks})
+
     def _build_train_task(
             self,
             config: Dict[str, Any],
@@ -305,6 +867,11 @@ class Pipeline:
         func_name = config.pop('name')
         train_func = getattr(mod, func_name)
 
+        if self.segment_column:
+            if func_name not in LINEAR_MODEL_TRAINERS:
+                raise ValueError(f"segment_column supports only {LINEAR_MODEL_TRAINERS}")
+            config['segment_column'] = self.segment_column
+
         sparse = config.get('sparse', False)
         if (func_name in TREE_MODEL_TRAINERS) and not sparse:
             config['categorical_columns'] = self.categorical_columns
@@ -313,7 +880,7 @@ class Pipeline:
             if not config.get('sparse', None):
                 train_table += "_dense"
 
-        model_table = config.pop('model_table', "model")
+        model_table = config.pop('model_table', "model") + self.table_suffix
         train_query = train_func(**dict(config, **{"target": self.target_column}))
         _query_path = self.query_dir / f"{func_name}.sql"
         self.save_query(_query_path, train_query)
@@ -324,6 +891,54 @@ class Pipeline:
             "create_table": model_table,
         })
 
+    def _build_incremental_train_task(
+            self,
+            config: Dict[str, Any],
+            mod: object,
+            train_table: str) -> OrderedDict:
+        """Build tasks to train a linear model on new rows and blend it with the previous model.
+
+        The model is trained on all train data at the first run.
+        """
+        func_name = config['name']
+        if func_name not in LINEAR_MODEL_TRAINERS:
+            raise ValueError(f"Incremental training supports only {LINEAR_MODEL_TRAINERS}")
+        if self.segment_column:
+            raise ValueError("Incremental training can't be used with segment_column.")
+
+        model_table = config.get('model_table', "model") + self.table_suffix
+        incremental_table = f"{model_table}_incremental"
+        train_func = getattr(mod, func_name)
+        incremental_query = train_func(**dict(
+            {k: v for k, v in config.items() if k not in ['name', 'model_table']},
+            **{"target": self.target_column,
+               "previous_model_table": model_table,
+               "decay": self.incremental.get("decay", 0.5)}))
+        incremental_path = self.query_dir / f"{func_name}_incremental.sql"
+        self.save_query(incremental_path, incremental_query)
+
+        initial_task = self._build_train_task(config, mod, train_table)
+
+        return od({
+            "+check_model": self._build_table_exists_task(model_table, f"{func_name}_model_exists"),
+            "+train": od({
+                "if>": "${td.last_results.table_exists}",
+                "_do": od({
+                    "+blend": od({
+                        "td>": str(incremental_path),
+                        "source": train_table,
+                        "create_table": incremental_table
+                    }),
+                    # Replace the previous model after blending since it's read while training
+                    "+replace": od({
+                        "td_ddl>": None,
+                        "rename_tables": [od({"from": incremental_table, "to": model_table})]
+                    })
+                }),
+                "_else_do": initial_task
+            })
+        })
+
     def _build_downsampling_task(
             self,
             source: str,
@@ -353,39 +968,354 @@ class Pipeline:
         func_name = config.pop('name')
         pred_func = getattr(mod, func_name)
 
+        if self.segment_column:
+            if func_name not in LINEAR_MODEL_PREDICTORS:
+                raise ValueError(f"segment_column supports only {LINEAR_MODEL_PREDICTORS}")
+            config['segment_column'] = self.segment_column
+
+        sparse_test_table = test_table
         sparse = config.get('sparse', False)
         if (func_name in TREE_MODEL_PREDICTORS) and not sparse:
             test_table += "_dense"
 
         default_table = "prediction" if multiple_predictors else f"prediction_{pred_idx}"
-        predict_table = config.pop("output_table", default_table)
-        test_table = config.pop("target_table", test_table)
-        model_table = config.pop("model_table", "model")
+        predict_table = config.pop("output_table", default_table) + self.table_suffix
+        if "target_table" in config:
+            test_table = config.pop("target_table") + self.table_suffix
+        model_table = config.pop("model_table", "model") + self.table_suffix
+
+        if self.carry_target:
+            _segment = [self.segment_column] if self.segment_column else []
+            config['passthrough_columns'] = [self.target_column] + _segment + [
+                column for column in self.slice_columns if column not in _segment]
 
         predict_query, predicted_col = pred_func(**dict(config, **{"id_column": self.id_column}))
+        if self.carry_target and predicted_col == self.target_column:
+            raise ValueError(f"Predicted column {predicted_col} conflicts with target column for carry_target.")
         _query_path = self.query_dir / f"{func_name}.sql"
         self.save_query(_query_path, predict_query)
 
+        evaluate_task = od({
+            "td>": str(self.query_dir / "evaluate.sql"),
+            "actual": test_table,
+            "predicted_table": predict_table,
+            "predicted_column": predicted_col,
+            "store_last_results": True
+        })
+        if self.carry_target:
+            evaluate_task.pop("actual")
+
         acc_template = "{metric}: ${{td.last_results.{metric}}}"
-        acc_str = "\t".join(acc_template.format_map({"metric": metric}) for metric in metrics)
+        interval_template = acc_template + " [${{td.last_results.{metric}_lower}}, ${{td.last_results.{metric}_upper}}]"
+        acc_str = "\t".join((interval_template if self.bootstrap else acc_template).format_map({"metric": metric})
+                            for metric in metrics)
 
-        return od({
+        tasks = od({
             "+exec_predict": od({
                 "td>": str(_query_path),
                 "target_table": test_table,
                 "create_table": predict_table,
                 "model_table": model_table
             }),
-            "+evaluate": od({
-                "td>": str(self.query_dir / "evaluate.sql"),
-                "actual": test_table,
-                "predicted_table": predict_table,
-                "predicted_column": predicted_col,
-                "store_last_results": True
-            }),
+            "+evaluate": evaluate_task,
             "+show_accuracy": {"echo>": acc_str}
         })
 
+        if self.slice_columns:
+            # Slice columns are passed through only to sparse vectors
+            tasks["+evaluate_slices"] = od(evaluate_task, **{
+                "td>": str(self.query_dir / "evaluate_slices.sql"),
+                "create_table": f"{predict_table}_slices"})
+            tasks["+evaluate_slices"].pop("store_last_results")
+            if not self.carry_target:
+                tasks["+evaluate_slices"]["actual"] = sparse_test_table
+
+        # Threshold sweep is only for predicted probabilities
+        if self.thresholds is not None and predicted_col == "probability":
+            threshold_table = f"{predict_table}_thresholds"
+            tasks["+thresholds"] = od(evaluate_task, **{
+                "td>": str(self.query_dir / "thresholds.sql"), "create_table": threshold_table})
+            tasks["+thresholds"].pop("store_last_results")
+            tasks["+best_threshold"] = od({
+                "td>": str(self.query_dir / "best_threshold.sql"),
+                "threshold_table": threshold_table,
+                "store_last_results": True
+            })
+            tasks["+show_threshold"] = {"echo>": "\t".join(
+                acc_template.format_map({"metric": metric}) for metric in ["threshold", "precision", "recall", "f1"])}
+
+        return tasks
+
+    def _build_leaderboard_task(
+            self,
+            conf: Dict[str, Any],
+            pred_tasks: OrderedDict,
+            test_table: str) -> OrderedDict:
+        """Replace evaluation tasks of each predictor with a task to evaluate all predictions at once.
+
+        Prediction tables are named by their table names in the leaderboard table.
+        """
+        predictions = []
+        for name, task in pred_tasks.items():
+            if not name.startswith("+seq_"):
+                continue
+
+            evaluate_task = task.pop("+evaluate")
+            task.pop("+show_accuracy")
+            predictions.append(
+                (evaluate_task["predicted_table"], evaluate_task["predicted_table"], evaluate_task["predicted_column"]))
+
+        leaderboard_query = leaderboard(conf['metrics'],
+                                        target_column=self.target_column,
+                                        predictions=predictions,
+                                        target_table=None if self.carry_target else test_table,
+                                        id_column=self.id_column,
+                                        auc_bins=conf.get('auc_bins'))
+        _query_path = self.query_dir / "leaderboard.sql"
+        self.save_query(_query_path, leaderboard_query)
+
+        return od({
+            "td>": str(_query_path),
+            "create_table": conf['leaderboard_table'] + self.table_suffix
+        })
+
+    @staticmethod
+    def _build_plan(config: Dict[str, Any], conf: Dict[str, Any]) -> Plan:
+        """Choose a plan from a table profile and set chunking and hashing options of config in place.
+
+        Options set in config explicitly are kept.
+        """
+        categorical_columns = [column for cols in config.get("categorical_columns", []) for column in cols["columns"]]
+        num_columns = sum(len(cols["columns"]) for column_type in ["numerical_columns", "categorical_columns"]
+                          for cols in config.get(column_type, []))
+        plan_opt = {k: v for k, v in conf.items() if k in ["chunk_threshold", "max_chunk_columns", "max_features"]}
+        # Engines set explicitly are kept, and collapsing rare levels requires Presto
+        stage_engines = od((stage, [config["stage_engines"][stage]] if stage in config.get("stage_engines", {})
+                            else engines) for stage, engines in STAGE_ENGINES.items())
+        if any(cols.get("transformer", {}).get("collapser") for cols in config.get("categorical_columns", [])):
+            stage_engines["imputation"] = ["presto"]
+
+        plan = plan_pipeline(
+            load_table_profile(conf["profile_file"]), categorical_columns, num_columns,
+            train_sample_rate=config["train_sample_rate"], stage_engines=stage_engines, **plan_opt)
+
+        if plan.chunk_size and "chunking" not in config:
+            config["chunking"] = {"threshold": conf.get("chunk_threshold", 1000), "chunk_size": plan.chunk_size}
+
+        # Feature ids are compact already, so hashing is only for string features
+        if plan.hashing and not config.get("vectorizer", {}).get("feature_ids"):
+            for task_conf in config.get("trainer", []) + config.get("predictor", []):
+                if task_conf["name"] in LINEAR_MODEL_TRAINERS + LINEAR_MODEL_PREDICTORS:
+                    task_conf.setdefault("hashing", True)
+
+        return plan
+
+    def _apply_plan(self, tasks: OrderedDict, default_engine: str, annotated: Optional[set] = None) -> None:
+        """Set engines of the plan to query tasks in place, and record the plan in each query as a comment."""
+        annotated = set() if annotated is None else annotated
+
+        for key, value in tasks.items():
+            if not isinstance(value, dict):
+                continue
+            if "td>" not in value:
+                self._apply_plan(value, default_engine, annotated)
+                continue
+
+            query_path = Path(value["td>"])
+            stage = query_stage(query_path.name)
+            if stage is None:
+                continue
+
+            engine = self.plan.engines[stage]
+            if engine != value.get("engine", default_engine):
+                value["engine"] = engine
+
+            if query_path not in annotated and query_path.exists():
+                annotated.add(query_path)
+                lines = query_path.read_text(encoding='utf-8').split("\n")
+                # Keep the client header at the first line
+                _pos = 1 if lines[0].startswith("-- client") else 0
+                lines.insert(_pos, self.plan.comment(stage))
+                self.save_query(query_path, "\n".join(lines))
+
+    def _limit_parallelism(
+            self,
+            tasks: OrderedDict,
+            conf: Dict[str, Any],
+            default_engine: str,
+            name: str = "") -> int:
+        """Replace ``_parallel: true`` with limited parallelism in place.
+
+        Parameters
+        ----------
+        tasks : :obj:`OrderedDict`
+            Workflow or tasks.
+        conf : :obj:`Dict`
+            Configuration dictionary with "max_concurrency" and "stages", which maps a task name
+            without "+" to its limit, e.g. {"vectorization": 2}.
+        default_engine : :obj:`str`
+            Engine of tasks without engine option.
+        name : :obj:`str`
+            Task name of the tasks.
+
+        Returns
+        -------
+        int
+            Estimated weight of the heaviest query in the tasks.
+        """
+        if "td>" in tasks:
+            return ENGINE_WEIGHTS.get(tasks.get("engine", default_engine), 1)
+
+        weight = 1
+        for key, value in tasks.items():
+            if isinstance(value, dict):
+                weight = max(weight, self._limit_parallelism(value, conf, default_engine, key.lstrip("+")))
+
+        if tasks.get("_parallel") is True:
+            limit = conf.get("stages", {}).get(name)
+            if limit is None and conf.get("max_concurrency"):
+                # Light tasks, e.g. Presto stats, run wider than heavy Hive tasks
+                limit = max(1, conf["max_concurrency"] // weight)
+            num_tasks = sum(1 for key in tasks if key.startswith("+"))
+            if limit is not None and limit < num_tasks:
+                tasks["_parallel"] = od({"limit": limit})
+
+        return weight
+
+    def _build_for_each_source_workflow(
+            self,
+            workflow: OrderedDict,
+            conf: Union[List[str], Dict[str, Any]]) -> OrderedDict:
+        """Wrap tasks of a workflow to run them for each source table.
+
+        Parameters
+        ----------
+        workflow : :obj:`OrderedDict`
+            Workflow built with "${source_name}" as a source table name.
+        conf : :obj:`list` of :obj:`str` or :obj:`Dict`
+            A list of source table names, or configuration dictionary with "tables" or "query",
+            which returns source table names as "source" column, and "max_concurrency".
+
+        Returns
+        -------
+        :obj:`OrderedDict`
+            Workflow running for_each> or td_for_each> over sources.
+        """
+        if isinstance(conf, list):
+            conf = {"tables": conf}
+        if ("tables" in conf) == ("query" in conf):
+            raise ValueError("Either sources.tables or sources.query is required.")
+
+        for_each_task = od()  # type: OrderedDict[str, Any]
+        export = od({"source": "${source_name}"})
+        if "tables" in conf:
+            for_each_task["for_each>"] = od({"source_name": list(conf["tables"])})
+        else:
+            sources_path = self.query_dir / "sources.sql"
+            self.save_query(sources_path, conf["query"].rstrip().rstrip(";") + "\n;\n")
+            for_each_task["td_for_each>"] = str(sources_path)
+            for_each_task["engine"] = "presto"
+            export = od({"source_name": "${td.each.source}", "source": "${td.each.source}"})
+
+        # Sources run sequentially unless max_concurrency is set to bound the cluster load
+        if conf.get("max_concurrency"):
+            for_each_task["_parallel"] = od({"limit": conf["max_concurrency"]})
+        for_each_task["_do"] = od({"_export": export}, **od((k, v) for k, v in workflow.items() if k != "_export"))
+
+        return od({"_export": workflow["_export"], "+for_each_source": for_each_task})
+
+    def _build_scoring_workflow(
+            self,
+            workflow: OrderedDict,
+            conf: Dict[str, Any]) -> OrderedDict:
+        """Build a workflow to score new rows from tasks of the train workflow.
+
+        Stats, encodings, dictionaries and models stored by the train workflow are reused
+        and only transformation, vectorization and prediction tasks for test data are executed.
+
+        Parameters
+        ----------
+        workflow : :obj:`OrderedDict`
+            Train workflow.
+        conf : :obj:`Dict`
+            Configuration dictionary for scoring.
+
+        Returns
+        -------
+        :obj:`OrderedDict`
+            Scoring workflow.
+        """
+        if "source" not in conf:
+            raise ValueError("scoring.source is required for score mode.")
+        if self.chunk_size:
+            raise ValueError("Score mode can't be used with chunked vectorization.")
+        if "+profile" in workflow:
+            raise ValueError("Score mode requires a stored profile file for categorical_encoding.")
+
+        scoring_source = conf["source"]
+        time_column = conf.get("time_column", "time")
+
+        # Target column is kept as NULL so that transformation and vectorization queries can be reused
+        _id = f"{conf['id_column']} as {self.id_column}" if conf.get("id_column") else f"rowid() as {self.id_column}"
+        select_query = build_query(
+            [_id, f"cast(null as int) as {self.target_column}"] + self.columns,
+            scoring_source,
+            condition=f"where\n  td_time_range({time_column}, '${{last_session_time}}', '${{session_time}}')")
+        select_path = self.query_dir / "score_select.sql"
+        self.save_query(select_path, select_query)
+
+        current_table = f"{scoring_source}_selected"
+        preparation = od({"+select": od({"td>": str(select_path), "create_table": current_table})})
+
+        for stage, suffix in [("+imputation", "imputed"), ("+normalization", "norm"), ("+target_encoding", "encoded")]:
+            if stage not in workflow["+preparation"]:
+                continue
+
+            stage_tasks = workflow["+preparation"][stage]
+            scoring_tasks = od()  # type: OrderedDict[str, Any]
+            combine_task = stage_tasks.get("+combine_train_test_stats", {})
+            if combine_task.get("store_last_results"):
+                scoring_tasks["+restore_stats"] = combine_task
+
+            output_table = f"{scoring_source}_{suffix}"
+            scoring_tasks["+execute"] = od(stage_tasks["+execute"]["+test"],
+                                           **{"source": current_table, "create_table": output_table})
+            preparation[stage] = scoring_tasks
+            current_table = output_table
+
+        scoring_workflow = od()  # type: OrderedDict[str, Any]
+        if "schedule" in conf:
+            scoring_workflow["timezone"] = conf.get("timezone", "UTC")
+            scoring_workflow["schedule"] = conf["schedule"]
+        scoring_workflow["_export"] = workflow["_export"]
+        scoring_workflow["+preparation"] = preparation
+        if "+compute_cardinality" in workflow:
+            scoring_workflow["+compute_cardinality"] = workflow["+compute_cardinality"]
+
+        vectorization = workflow["+vectorization"].get("+vectorize", workflow["+vectorization"])
+        vectorized_table = f"{scoring_source}_vectorized"
+        scoring_vectorization = od({"_parallel": True})  # type: OrderedDict[str, Any]
+        for name, suffix in [("+whole", ""), ("+whole_dense", "_dense")]:
+            if name in vectorization:
+                scoring_vectorization[name] = od(vectorization[name], **{
+                    "source": current_table, "create_table": vectorized_table + suffix})
+        scoring_workflow["+vectorization"] = scoring_vectorization
+
+        predict = od()  # type: OrderedDict[str, Any]
+        for name, task in workflow["+main"]["+predict"].items():
+            if name.startswith("+seq_"):
+                exec_predict = od(task["+exec_predict"])
+                target_suffix = "_dense" if exec_predict["target_table"].endswith("_dense") else ""
+                exec_predict["target_table"] = vectorized_table + target_suffix
+                # Predictions of new rows are appended every run
+                exec_predict["insert_into"] = f"{scoring_source}_{exec_predict.pop('create_table')}"
+                predict[name] = od({"+exec_predict": exec_predict})
+            else:
+                predict[name] = task
+        scoring_workflow["+predict"] = predict
+
+        return scoring_workflow
+
     @staticmethod
     def _require_dense_vector(config: OrderedDict) -> bool:
         trainers = config.get('trainer', None)
@@ -399,7 +1329,8 @@ class Pipeline:
             self,
             config_file: str,
             dest_file: str = None,
-            overwrite: bool = False) -> None:
+            overwrite: bool = False,
+            mode: str = "train") -> None:
         """Dump an ML pipeline, Hivemall SQLs and digdag workflows, from config yaml.
 
         Parameters
@@ -410,18 +1341,47 @@ class Pipeline:
             Destination of digdag workflow. Query directory should be written in a config file.
         overwrite : bool
             Flag whether overwrite output files or not. This option will remove query directory.
+        mode : :obj:`str`
+            "train" or "score". "score" dumps a workflow to score new rows of "scoring.source" table
+            with stats, tables and models stored by the train workflow. Default: "train"
 
         Returns
         -------
         None
 
         """
+        if mode not in ["train", "score"]:
+            raise ValueError(f"Unknown mode: {mode}")
+
         with open(config_file, "r") as f:
-            config = yaml.load(f)
+            config = yaml.load(f, Loader=yaml.Loader)
+
+        sources_conf = config.get("sources")
+        if sources_conf is not None:
+            if mode == "score":
+                raise ValueError("sources can't be used with score mode.")
+            if config.get("vectorizer", {}).get("categorical_encoding"):
+                raise ValueError("sources can't be used with categorical_encoding since a profile is per source.")
+
+            # Table names are resolved by digdag for each source, and other tables are suffixed by the source.
+            # "${source}" is overridden by a source parameter of each task, so the loop variable is referred.
+            config["source"] = "${source_name}"
+            self.table_suffix = "_${source_name}"
 
         source = config['source']
         dbname = config['dbname']
 
+        for stage, engine in config.get("stage_engines", {}).items():
+            if stage not in self.stage_engines:
+                raise ValueError(f"Engine of {stage} can't be changed.")
+            check_dialect(engine)
+            self.stage_engines[stage] = engine
+
+        if config.get("planner"):
+            self.plan = self._build_plan(config, config["planner"])
+            # Queries of these stages are built in the dialect of the chosen engines
+            self.stage_engines = {stage: self.plan.engines[stage] for stage in self.stage_engines}
+
         self.id_column = config['id_column']
         self.target_column = config['target_column']
         train_sample_rate = config["train_sample_rate"]
@@ -431,11 +1391,25 @@ class Pipeline:
         # Extract column related information.
         self._set_columns(config)
 
+        if self.segment_column and self.segment_column not in self.columns:
+            # Segment column is passed through to compute stats and train models per segment
+            self.columns.append(self.segment_column)
+
+        self.incremental = config.get("incremental")
+        if self.incremental is not None and self.incremental.get("time_column", "time") not in self.columns:
+            # Time column is passed through to find new rows of train data
+            self.columns.append(self.incremental.get("time_column", "time"))
+
+        self.slice_columns = config.get("evaluator", {}).get("slices", [])
+        # Slice columns are passed through to evaluate predictions per slice
+        self.columns.extend(column for column in self.slice_columns if column not in self.columns)
+
         workflow = od()  # type: OrderedDict[str, Any]
         export = od()  # type: OrderedDict[str, Any]
         # Since digdag "!include" seems to be a custom YAML tag, and can't find a way to dump with PyYAML...
         # export["!include"] = "config/params.yml"
-        export["source"] = source
+        if sources_conf is None:
+            export["source"] = source
         export["train_sample_rate"] = train_sample_rate
 
         if oversample_n_times:
@@ -456,6 +1430,11 @@ class Pipeline:
 
         do_imputation = len(self.imputation_clauses) > 0
         do_normalization = len(self.normalization_clauses) > 0
+        selection_conf = config.get("feature_selection")
+
+        # Columns before target encoding, which are the columns of stats tables
+        stats_numerical_columns = list(self.numerical_columns)
+        stats_categorical_columns = list(self.categorical_columns)
 
         require_dense_vector = self._require_dense_vector(config)
 
@@ -464,11 +1443,31 @@ class Pipeline:
         vectorize_target_whole = f"{source}_shuffled"
 
         if do_imputation or do_normalization:
-            stats_query = compute_stats("${source}", self.numerical_columns)
-            combined_stats = combine_train_test_stats("${source}", self.numerical_columns)
+            if self.chunk_size:
+                stats_chunks = chunk_columns(self.numerical_columns, self.chunk_size)
+                for i, stats_chunk in enumerate(stats_chunks):
+                    stats_chunk_path = self.query_dir / f"stats_chunk_{i}.sql"
+                    self.save_query(stats_chunk_path, compute_stats_long(
+                        "${source}", stats_chunk, self.percentiles, segment_column=self.segment_column))
+                    self.stats_chunk_paths.append(stats_chunk_path)
+                stats_query = None
+                combined_stats = combine_train_test_stats_long(
+                    "${source}", len(stats_chunks), segmented=bool(self.segment_column))
+            elif self.stats_mode == "table":
+                stats_query = compute_stats_long(
+                    "${source}", self.numerical_columns, self.percentiles, segment_column=self.segment_column)
+                combined_stats = combine_train_test_stats_long("${source}", segmented=bool(self.segment_column))
+            else:
+                stats_opt = {}  # type: Dict[str, Any]
+                if selection_conf and do_imputation:
+                    # Train stats of the imputation stage are reused for feature selection
+                    stats_opt = {"with_count": True, "categorical_columns": self.categorical_columns}
+                stats_query = compute_stats("${source}", self.numerical_columns, self.percentiles, **stats_opt)
+                combined_stats = combine_train_test_stats("${source}", self.numerical_columns, self.percentiles)
             stats_path = self.query_dir / "stats.sql"
             self.combine_stats_path = self.query_dir / "combine_stats.sql"
-            self.save_query(stats_path, stats_query)
+            if stats_query:
+                self.save_query(stats_path, stats_query)
             self.save_query(self.combine_stats_path, combined_stats)
 
             self.comp_stats_task = od({
@@ -478,12 +1477,25 @@ class Pipeline:
                 "create_table": "${source}_stats"})
 
         if do_imputation:
+            additional_stats_tasks = od()  # type: OrderedDict[str, Any]
+            if self.collapsed_columns:
+                frequency_path = self.query_dir / "level_frequency.sql"
+                self.save_query(frequency_path, level_frequency("${source}", self.collapsed_columns))
+                additional_stats_tasks["+level_frequency"] = od({
+                    "td>": str(frequency_path),
+                    "engine": "presto",
+                    "source": vectorize_target_train,
+                    "create_table": f"{source}_level_frequency"
+                })
+
             output_prefix = f"{source}_imputed"
             preparation["+imputation"], vectorize_target_train, vectorize_target_test = self._build_task_with_stats(
                 query_basename="impute", source=source, source_whole=vectorize_target_whole,
                 output_prefix=output_prefix,
                 target_columns=self.imputed_columns, target_clauses=self.imputation_clauses,
-                target_clauses_whole=self.imputation_clauses_whole)
+                target_clauses_whole=self.imputation_clauses_whole,
+                additional_stats_tasks=additional_stats_tasks, hive=self.stage_engines["imputation"] == "hive",
+                incremental_source=source if self.incremental_stats is not None else None)
             vectorize_target_whole = output_prefix
 
         if do_normalization:
@@ -492,16 +1504,43 @@ class Pipeline:
                 query_basename="normalize", source=f"{source}_imputed", source_whole=vectorize_target_whole,
                 output_prefix=output_prefix,
                 target_columns=self.normalized_columns, target_clauses=self.normalization_clauses,
-                target_clauses_whole=self.normalization_clauses_whole, hive=True)
+                target_clauses_whole=self.normalization_clauses_whole,
+                hive=self.stage_engines["normalization"] == "hive",
+                incremental_source=source if self.incremental_stats is not None and not do_imputation else None)
             vectorize_target_whole = output_prefix
 
+        if self.target_encoded_columns:
+            output_prefix = f"{source}_encoded"
+            preparation["+target_encoding"], vectorize_target_train, vectorize_target_test = \
+                self._build_target_encoding_task(
+                    source, source_train=vectorize_target_train, source_test=vectorize_target_test,
+                    source_whole=vectorize_target_whole, output_prefix=output_prefix)
+            vectorize_target_whole = output_prefix
+
+            # Target encoded columns are vectorized as numerical columns
+            self.categorical_columns = [
+                _col for _col in self.categorical_columns if _col not in self.target_encoded_columns]
+            self.numerical_columns = self.numerical_columns + self.target_encoded_columns
+
         workflow["+preparation"] = preparation
 
-        if require_dense_vector:
+        vectorizer_conf = config.get("vectorizer", {})
+        if selection_conf:
+            workflow["+feature_selection"], vectorizer_conf["selection_table"] = self._build_feature_selection_task(
+                selection_conf, source, vectorize_target_train, stats_numerical_columns, stats_categorical_columns,
+                reuse_stats=do_imputation and self.stats_mode != "table")
+
+        encoding_conf = vectorizer_conf.pop("categorical_encoding", None)
+        if encoding_conf:
+            profile_task = self._build_profile_task(encoding_conf, source, vectorize_target_train)
+            if profile_task:
+                workflow["+profile"] = profile_task
+
+        if require_dense_vector and not self.column_encodings:
             workflow["+compute_cardinality"] = self._build_cardinality_task(vectorize_target_train)
 
         workflow["+vectorization"], train_table, test_table = self._build_vectorize_task(
-            config.get("vectorizer", {}), source=vectorize_target_whole,
+            vectorizer_conf, source=vectorize_target_whole,
             source_train=vectorize_target_train, source_test=vectorize_target_test,
             require_dense=require_dense_vector)
 
@@ -519,7 +1558,14 @@ class Pipeline:
             elif oversample_pos_n_times and trainer.get('oversample_pos_n_times') is None:
                 trainer['oversample_pos_n_times'] = "${oversample_pos_n_times}"
 
-            train_tasks[f"+train_{train_idx}"] = self._build_train_task(trainer, mod, train_table)
+            if self.feature_ids and trainer['name'] in LINEAR_MODEL_TRAINERS and trainer.get('feature_ids') is None:
+                trainer['feature_ids'] = True
+
+            if self.incremental is not None:
+                train_tasks[f"+train_{train_idx}"] = self._build_incremental_train_task(
+                    trainer, mod, f"{train_table}_delta")
+            else:
+                train_tasks[f"+train_{train_idx}"] = self._build_train_task(trainer, mod, train_table)
             train_idx += 1
 
         if train_idx > 1:
@@ -529,13 +1575,41 @@ class Pipeline:
 
         # Save evaluation query before prediction
         metrics = config['evaluator']['metrics']
+        self.carry_target = config['evaluator'].get('carry_target', False)
+        self.bootstrap = config['evaluator'].get('bootstrap')
         evaluate_query = evaluate(metrics,
                                   target_column=self.target_column,
-                                  target_table="${actual}",
+                                  target_table=None if self.carry_target else "${actual}",
                                   prediction_table="${predicted_table}",
-                                  predicted_column="${predicted_column}")
+                                  predicted_column="${predicted_column}",
+                                  auc_bins=config['evaluator'].get('auc_bins'),
+                                  bootstrap=self.bootstrap,
+                                  confidence=config['evaluator'].get('confidence', 0.95))
         self.save_query(self.query_dir / "evaluate.sql", evaluate_query)
 
+        if self.slice_columns:
+            slices_query = evaluate_slices(metrics,
+                                           target_column=self.target_column,
+                                           predicted_column="${predicted_column}",
+                                           slice_columns=self.slice_columns,
+                                           target_table=None if self.carry_target else "${actual}",
+                                           prediction_table="${predicted_table}",
+                                           id_column=self.id_column,
+                                           auc_bins=config['evaluator'].get('auc_bins'))
+            self.save_query(self.query_dir / "evaluate_slices.sql", slices_query)
+
+        self.thresholds = config['evaluator'].get('thresholds')
+        if self.thresholds is not None:
+            thresholds_query = evaluate_thresholds(
+                self.target_column,
+                target_table=None if self.carry_target else "${actual}",
+                prediction_table="${predicted_table}",
+                id_column=self.id_column,
+                bins=self.thresholds.get('bins', 100))
+            self.save_query(self.query_dir / "thresholds.sql", thresholds_query)
+            self.save_query(self.query_dir / "best_threshold.sql",
+                            best_threshold("${threshold_table}", self.thresholds.get('metric', 'f1')))
+
         pred_idx = 0
         pred_tasks = od()  # type: OrderedDict[str, Any]
 
@@ -549,6 +1623,10 @@ class Pipeline:
             if oversample_pos_n_times and predictor.get('oversample_pos_n_times') is None:
                 predictor['oversample_pos_n_times'] = "${oversample_pos_n_times}"
 
+            if self.feature_ids and predictor['name'] in LINEAR_MODEL_PREDICTORS \
+                    and predictor.get('feature_ids') is None:
+                predictor['feature_ids'] = True
+
             pred_tasks[f"+seq_{pred_idx}"] = self._build_predict_and_eval_task(
                 predictor, mod, pred_idx, test_table, metrics, len(predictors) == 1)
 
@@ -558,9 +1636,26 @@ class Pipeline:
             pred_tasks["_parallel"] = True
 
         main["+predict"] = pred_tasks
+
+        if config['evaluator'].get('leaderboard_table'):
+            main["+leaderboard"] = self._build_leaderboard_task(config['evaluator'], pred_tasks, test_table)
+
         workflow["+main"] = main
 
-        self.workflow_path = dest_file if dest_file else f"{source}.dig"
+        if self.plan:
+            self._apply_plan(workflow, export["td"]["engine"])
+
+        if config.get("parallelism"):
+            self._limit_parallelism(workflow, config["parallelism"], export["td"]["engine"])
+
+        if sources_conf is not None:
+            workflow = self._build_for_each_source_workflow(workflow, sources_conf)
+
+        if mode == "score":
+            workflow = self._build_scoring_workflow(workflow, config.get("scoring", {}))
+            self.workflow_path = dest_file if dest_file else f"{source}_score.dig"
+        else:
+            self.workflow_path = dest_file if dest_file else f"{source}.dig"
 
         if not overwrite and Path(self.workflow_path).exists():
             raise FileExistsError(f"{self.workflow_path} already exists")
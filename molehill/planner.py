@@ -0,0 +1,196 @@
+import csv
+import math
+import yaml
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+# Engines which can execute queries of each stage. Hivemall UDFs and Presto specific functions pin engines.
+STAGE_ENGINES = OrderedDict([
+    ("shuffle", ["presto", "hive"]),
+    ("split", ["presto", "hive"]),
+    ("stats", ["presto"]),
+    ("imputation", ["presto", "hive"]),
+    ("normalization", ["presto", "hive"]),
+    ("vectorization", ["hive"]),
+    ("train", ["hive"]),
+    ("predict", ["hive"]),
+    ("evaluation", ["hive"]),
+])
+
+# Query file name prefixes of each stage
+STAGE_QUERY_PREFIXES = [
+    ("shuffle", "shuffle"),
+    ("split_", "split"),
+    ("stats", "stats"),
+    ("combine_stats", "stats"),
+    ("merge_stats", "stats"),
+    ("impute", "imputation"),
+    ("normalize", "normalization"),
+    ("vectorize", "vectorization"),
+    ("train_", "train"),
+    ("predict_", "predict"),
+    ("evaluate", "evaluation"),
+    ("thresholds", "evaluation"),
+    ("best_threshold", "evaluation"),
+    ("leaderboard", "evaluation"),
+]
+
+# Query file name suffixes of queries which don't belong to any stage, e.g. "train_table_exists.sql"
+NON_STAGE_QUERY_SUFFIXES = ["_exists.sql"]
+
+# Rough cost model of engines. startup is seconds, throughput is bytes per second and
+# max_bytes is the largest input which can be processed in memory.
+ENGINE_COSTS = {
+    "presto": {"startup": 5.0, "throughput": 256 * 1024 ** 2, "max_bytes": 64 * 1024 ** 3},
+    "hive": {"startup": 60.0, "throughput": 64 * 1024 ** 2, "max_bytes": None},
+}
+
+
+class Plan:
+    """Execution plan of a pipeline chosen by :func:`plan_pipeline`.
+
+    Parameters
+    ----------
+    engines : :obj:`dict`
+        Key is a stage name and value is an engine name.
+    costs : :obj:`dict`
+        Key is a stage name and value is estimated seconds with the chosen engine.
+    hashing : bool
+        Whether features are hashed for linear models.
+    chunk_size : int, optional
+        The number of columns per chunked query. None means queries aren't chunked.
+    """
+
+    def __init__(
+            self,
+            engines: Dict[str, str],
+            costs: Dict[str, float],
+            hashing: bool = False,
+            chunk_size: Optional[int] = None) -> None:
+        self.engines = engines
+        self.costs = costs
+        self.hashing = hashing
+        self.chunk_size = chunk_size
+
+    def comment(self, stage: str) -> str:
+        """Build a comment line recording the plan of a stage."""
+        _chunk_size = self.chunk_size if self.chunk_size else "none"
+        return (f"-- plan: stage={stage} engine={self.engines[stage]} estimated_cost={self.costs[stage]:.1f}s"
+                f" hashing={str(self.hashing).lower()} chunk_size={_chunk_size}")
+
+
+def query_stage(query_name: str) -> Optional[str]:
+    """Find a stage name from a query file name, e.g. "normalization" for "normalize_whole.sql"."""
+    if query_name.endswith(tuple(NON_STAGE_QUERY_SUFFIXES)):
+        return None
+
+    for prefix, stage in STAGE_QUERY_PREFIXES:
+        if query_name.startswith(prefix):
+            return stage
+
+    return None
+
+
+def load_table_profile(file_path: Union[str, Path]) -> Dict[str, Any]:
+    """Load a table profile.
+
+    Parameters
+    ----------
+    file_path : :obj:`str` or :obj:`pathlib.Path`
+        A YAML file with num_rows, bytes and columns, which maps a column name to its cardinality,
+        or a CSV file downloaded from a profile table built by :func:`molehill.preprocessing.profile`.
+        Bytes are estimated as 8 bytes per value for a CSV file.
+
+    Returns
+    -------
+    :obj:`dict`
+        Table profile with num_rows, bytes and columns.
+    """
+
+    p = Path(file_path)
+    with p.open('r', encoding='utf-8') as f:
+        if p.suffix != ".csv":
+            return yaml.load(f, Loader=yaml.Loader)
+
+        columns = OrderedDict(
+            (row["column_name"], {"cardinality": int(row["cardinality"]), "num_rows": int(row["num_rows"])})
+            for row in csv.DictReader(f))
+
+    num_rows = max([column["num_rows"] for column in columns.values()] or [0])
+    return {"num_rows": num_rows, "bytes": num_rows * len(columns) * 8, "columns": columns}
+
+
+def estimate_cost(engine: str, num_bytes: float, engine_costs: Optional[Dict[str, Dict[str, Any]]] = None) -> float:
+    """Estimate seconds to scan bytes with an engine. It returns inf if the engine can't process the bytes."""
+    _cost = (engine_costs or ENGINE_COSTS)[engine]
+    if _cost.get("max_bytes") is not None and num_bytes > _cost["max_bytes"]:
+        return math.inf
+
+    return _cost["startup"] + num_bytes / _cost["throughput"]
+
+
+def plan_pipeline(
+        table_profile: Dict[str, Any],
+        categorical_columns: List[str],
+        num_columns: int,
+        train_sample_rate: float = 0.8,
+        stage_engines: Optional[Dict[str, List[str]]] = None,
+        engine_costs: Optional[Dict[str, Dict[str, Any]]] = None,
+        chunk_threshold: int = 1000,
+        max_chunk_columns: int = 500,
+        max_features: int = 2 ** 24) -> Plan:
+    """Choose engines, hashing and chunk size of a pipeline from a table profile.
+
+    Parameters
+    ----------
+    table_profile : :obj:`dict`
+        Table profile loaded by :func:`load_table_profile`.
+    categorical_columns : :obj:`list` of :obj:`str`
+        A list of categorical column names.
+    num_columns : int
+        The number of feature columns.
+    train_sample_rate : float
+        Ratio of train data, used to estimate bytes of train and test data. Default: 0.8
+    stage_engines : :obj:`dict`, optional
+        Engines available per stage. Default: :data:`STAGE_ENGINES`
+    engine_costs : :obj:`dict`, optional
+        Cost model of engines. Default: :data:`ENGINE_COSTS`
+    chunk_threshold : int
+        Queries are chunked if the number of columns exceeds this value. Default: 1000
+    max_chunk_columns : int
+        Max number of columns per chunk. Chunks are balanced under this value. Default: 500
+    max_features : int
+        Features are hashed if the estimated number of features exceeds this value. Default: 2 ** 24
+
+    Returns
+    -------
+    :obj:`Plan`
+        Chosen plan.
+    """
+
+    num_bytes = float(table_profile.get("bytes", 0))
+    _ratios = {"train": train_sample_rate, "predict": 1.0 - train_sample_rate, "evaluation": 1.0 - train_sample_rate}
+
+    engines = OrderedDict()  # type: OrderedDict[str, str]
+    costs = OrderedDict()  # type: OrderedDict[str, float]
+    for stage, candidates in (stage_engines or STAGE_ENGINES).items():
+        _bytes = num_bytes * _ratios.get(stage, 1.0)
+        cost, engine = min((estimate_cost(engine, _bytes, engine_costs), engine) for engine in candidates)
+        if cost == math.inf:
+            # No engine fits in memory, so the last engine, which is the most scalable one, is used anyway
+            engine = candidates[-1]
+            _throughput = (engine_costs or ENGINE_COSTS)[engine]["throughput"]
+            cost = estimate_cost(engine, 0, engine_costs) + _bytes / _throughput
+        engines[stage] = engine
+        costs[stage] = cost
+
+    column_profile = table_profile.get("columns", {})
+    num_features = sum(int(column_profile.get(column, {}).get("cardinality", 1)) for column in categorical_columns)
+    hashing = num_features > max_features
+
+    chunk_size = None
+    if num_columns > chunk_threshold:
+        chunk_size = math.ceil(num_columns / math.ceil(num_columns / max_chunk_columns))
+
+    return Plan(engines, costs, hashing=hashing, chunk_size=chunk_size)
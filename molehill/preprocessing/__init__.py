@@ -1,6 +1,10 @@
 from .impute import Imputer
 from .normalization import Normalizer
+from .binning import Binner
+from .collapse import RareLevelCollapser, level_frequency
+from .target_encoding import TargetEncoder
+from .feature_selection import feature_scores, select_features
 from .shuffle import shuffle, train_test_split
-from .vectorization import vectorize
+from .vectorization import vectorize, build_feature_dictionary, merge_vectors
 from .downsample_rate import downsampling_rate
-from .cardinality import cardinality
+from .cardinality import cardinality, profile, load_profile, choose_encoding
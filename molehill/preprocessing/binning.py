@@ -0,0 +1,48 @@
+from typing import List, Optional, Tuple
+from ..stats import percentile_name, stat_reference
+
+
+class Binner:
+    """Discretize numerical values into integer bin ids with quantile boundaries.
+
+    Boundaries are read from percentiles computed by :func:`molehill.stats.compute_stats`
+    with ``percentiles=binner.percentiles()``.
+
+    Examples
+    --------
+    >>> from molehill.utils import build_query
+    >>> from molehill.stats import compute_stats
+    >>> numeric_columns = ["age", "fare"]
+    >>> binner = Binner(4, "train")
+    >>>
+    >>> stats_query = compute_stats("titanic_train", numeric_columns, percentiles=binner.percentiles())
+    >>> transform_clause = binner.transform(numeric_columns)
+    >>> source = "titanic_train"
+    >>> build_query([transform_clause], source)
+    """
+
+    def __init__(self, n_bins: int = 10, phase: Optional[str] = "train", stats_alias: Optional[str] = None) -> None:
+        if n_bins < 2:
+            raise ValueError("n_bins should be greater than 1.")
+
+        self.n_bins = n_bins
+        self.phase = "_{}".format(phase) if phase else ""
+        self.phase_name = phase if phase else "whole"
+        self.stats_alias = stats_alias
+
+    def percentiles(self) -> List[float]:
+        return [round(i / self.n_bins, 6) for i in range(1, self.n_bins)]
+
+    def transform(self, columns: List[str]) -> str:
+        _template = "case\n  when {column} is null then null\n"
+        for i, percentile in enumerate(self.percentiles()):
+            _template += f"  when {{column}} < {stat_reference(percentile_name(percentile), self.stats_alias)} then {i}\n"
+        _template += f"  else {self.n_bins - 1}\nend as {{column}}"
+
+        return "\n, ".join(
+            _template.format_map({"column": column, "phase": self.phase}) for column in columns)
+
+    def required_stats(self, columns: List[str]) -> List[Tuple[str, str, str]]:
+        """List statistics referred by :meth:`transform` as (column, stat, phase) tuples."""
+        return [(column, percentile_name(percentile), self.phase_name)
+                for column in columns for percentile in self.percentiles()]
@@ -1,4 +1,9 @@
-from typing import List
+import csv
+import math
+import yaml
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple, Union
 from ..utils import build_query
 
 
@@ -10,3 +15,118 @@ def cardinality(
     select_clause = f"array_max(array[{', '.join(cols)}]) as max_categorical_cardinality"
 
     return build_query([select_clause], source)
+
+
+def profile(
+        source: str,
+        columns: List[str]) -> str:
+    """Build a query to profile approx distinct count and null rate per column in one pass.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name.
+    columns : :obj:`list` of :obj:`str`
+        A list of column names to be profiled.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns column_name, cardinality, null_rate and num_rows per column.
+    """
+
+    if len(columns) == 0:
+        raise ValueError("columns should not be empty.")
+
+    _aggregations = ["count(1) as num_rows"]
+    for column in columns:
+        _aggregations.append(f"approx_distinct({column}) as {column}_cardinality")
+        _aggregations.append(f"count_if({column} is null) as {column}_nulls")
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["aggregated"] = build_query(_aggregations, source, without_semicolon=True)
+
+    _names = ", ".join(f"'{column}'" for column in columns)
+    _cardinalities = ", ".join(f"{column}_cardinality" for column in columns)
+    _nulls = ", ".join(f"{column}_nulls" for column in columns)
+
+    return build_query(
+        ["t.column_name", "t.cardinality", "cast(t.nulls as double) / num_rows as null_rate", "num_rows"],
+        f"aggregated\ncross join unnest(\n  array[{_names}]\n  , array[{_cardinalities}]\n  , array[{_nulls}]\n)"
+        " as t(column_name, cardinality, nulls)",
+        with_clauses=_with_clauses)
+
+
+def load_profile(file_path: Union[str, Path]) -> Dict[str, Dict[str, Any]]:
+    """Load a profile file built from :func:`profile` results.
+
+    Parameters
+    ----------
+    file_path : :obj:`str` or :obj:`pathlib.Path`
+        A CSV file downloaded from a profile table, or a YAML file mapping a column name
+        to its cardinality and null_rate.
+
+    Returns
+    -------
+    :obj:`dict`
+        Key is a column name and value is a dictionary of profiled statistics.
+    """
+
+    p = Path(file_path)
+    with p.open('r', encoding='utf-8') as f:
+        if p.suffix == ".csv":
+            return OrderedDict(
+                (row["column_name"], {"cardinality": int(row["cardinality"]),
+                                      "null_rate": float(row["null_rate"]),
+                                      "num_rows": int(row["num_rows"])})
+                for row in csv.DictReader(f))
+
+        return yaml.load(f, Loader=yaml.Loader)
+
+
+def choose_encoding(
+        column_profile: Dict[str, Dict[str, Any]],
+        categorical_columns: List[str],
+        onehot_max_cardinality: int = 100,
+        dictionary_max_cardinality: int = 100000,
+        max_hashing_buckets: int = 2 ** 20) -> Dict[str, Tuple[str, int]]:
+    """Choose encoding per categorical column from its cardinality.
+
+    Parameters
+    ----------
+    column_profile : :obj:`dict`
+        Profiled statistics loaded by :func:`load_profile`.
+    categorical_columns : :obj:`list` of :obj:`str`
+        A list of categorical column names.
+    onehot_max_cardinality : int
+        Max cardinality to use "column#value" one-hot features as is. Default: 100
+    dictionary_max_cardinality : int
+        Max cardinality to encode features with a feature dictionary. Default: 100000
+    max_hashing_buckets : int
+        Upper bound of the number of buckets for a hashed column. Default: 2 ** 20
+
+    Returns
+    -------
+    :obj:`dict`
+        Key is a column name and value is a tuple of encoding, "onehot", "dictionary" or "hashing",
+        and the number of buckets used when the column is hashed.
+    """
+
+    encodings = OrderedDict()  # type: OrderedDict[str, Tuple[str, int]]
+    for column in categorical_columns:
+        if column not in column_profile:
+            raise ValueError(f"{column} is not found in profile.")
+
+        _cardinality = max(int(column_profile[column]["cardinality"]), 1)
+
+        if _cardinality <= dictionary_max_cardinality:
+            encoding = "onehot" if _cardinality <= onehot_max_cardinality else "dictionary"
+            # Keep collisions rare for dense vectors, same as max_categorical_cardinality * 10
+            num_buckets = _cardinality * 10
+        else:
+            encoding = "hashing"
+            num_buckets = min(2 ** math.ceil(math.log2(_cardinality)), max_hashing_buckets)
+
+        encodings[column] = (encoding, num_buckets)
+
+    return encodings
@@ -0,0 +1,101 @@
+import textwrap
+from collections import OrderedDict
+from typing import List, Optional
+from ..utils import build_query
+
+
+def level_frequency(source: str, categorical_columns: List[str]) -> str:
+    """Build a query to count level frequencies of categorical columns in one aggregated pass.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name. It should be train data.
+    categorical_columns : :obj:`list` of :obj:`str`
+        A list of categorical column names.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns column_name, level, frequency and level_rank, rank by frequency in a column.
+    """
+
+    _names = ", ".join(f"'{column}'" for column in categorical_columns)
+    _levels = ", ".join(f"cast({column} as varchar)" for column in categorical_columns)
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["levels"] = build_query(
+        ["t.column_name", "t.level", "count(1) as frequency"],
+        f"{source}\ncross join unnest(\n  array[{_names}]\n  , array[{_levels}]\n) as t(column_name, level)",
+        condition="where\n  t.level is not null\ngroup by\n  t.column_name, t.level",
+        without_semicolon=True)
+
+    return build_query(
+        ["column_name", "level", "frequency",
+         "row_number() over (partition by column_name order by frequency desc) as level_rank"],
+        "levels",
+        with_clauses=_with_clauses)
+
+
+class RareLevelCollapser:
+    """Collapse rare levels of categorical columns into a shared token.
+
+    Examples
+    --------
+    >>> from molehill.utils import build_query
+    >>> from molehill.preprocessing import level_frequency
+    >>>
+    >>> categorical_columns = ["embarked", "cabin"]
+    >>> # Save the result as titanic_level_frequency table
+    >>> frequency_query = level_frequency("titanic_train", categorical_columns)
+    >>>
+    >>> collapser = RareLevelCollapser("titanic_level_frequency", min_frequency=5, max_levels=100)
+    >>> transform_clause = collapser.transform(categorical_columns)
+    >>> build_query([transform_clause], "titanic_test")
+    """
+
+    def __init__(self,
+                 frequency_table: str,
+                 min_frequency: Optional[int] = None,
+                 max_levels: Optional[int] = None,
+                 other_token: str = "__other__") -> None:
+        if min_frequency is None and max_levels is None:
+            raise ValueError("Either min_frequency or max_levels should be set.")
+
+        self.frequency_table = frequency_table
+        self.min_frequency = min_frequency
+        self.max_levels = max_levels
+        self.other_token = other_token
+
+    def expression(self) -> str:
+        """Build a template of collapsing expression. NULL is kept as is for imputation.
+
+        Returns
+        -------
+        :obj:`str`
+            Expression template with "{column}" placeholder.
+        """
+        _conditions = ["column_name = '{column}'"]
+        if self.min_frequency is not None:
+            _conditions.append(f"frequency >= {self.min_frequency}")
+        if self.max_levels is not None:
+            _conditions.append(f"level_rank <= {self.max_levels}")
+
+        _levels = build_query(
+            ["level"], self.frequency_table,
+            condition="where\n  {}".format("\n  and ".join(_conditions)),
+            without_semicolon=True)
+
+        return textwrap.dedent("""\
+        case
+          when {{column}} is null then null
+          when cast({{column}} as varchar) in (
+        {levels}
+          ) then cast({{column}} as varchar)
+          else '{other_token}'
+        end""").format_map({"levels": textwrap.indent(_levels, "    "), "other_token": self.other_token})
+
+    def transform(self, columns: List[str]) -> str:
+        _template = self.expression() + " as {column}"
+
+        return "\n, ".join(_template.format_map({"column": column}) for column in columns)
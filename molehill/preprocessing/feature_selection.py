@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from ..utils import build_query
+
+SCORE_METHODS = ["snr", "chi2"]
+
+
+def feature_scores(source: str, target_column: str, numerical_columns: List[str], methods: List[str]) -> str:
+    """Build a query to score numerical features against a binary target with Hivemall.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name. It should be train data.
+    target_column : :obj:`str`
+        Target column name. It should be 0 or 1.
+    numerical_columns : :obj:`list` of :obj:`str`
+        A list of numerical column names.
+    methods : :obj:`list` of :obj:`str`
+        Scoring methods. Supported methods are "snr" and "chi2". chi2 expects non-negative features.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query for Hive which returns "{column}_{method}" scores in a row.
+    """
+
+    unknown_methods = set(methods) - set(SCORE_METHODS)
+    if unknown_methods:
+        raise ValueError(f"Unsupported scoring methods: {sorted(unknown_methods)}")
+
+    _features = ", ".join(f"coalesce({column}, 0.0)" for column in numerical_columns)
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["encoded"] = build_query(
+        [f"array({_features}) as features",
+         f"array(if({target_column} = 0, 1, 0), if({target_column} = 1, 1, 0)) as label"],
+        source,
+        without_semicolon=True)
+
+    _aggregations = []
+    if "snr" in methods:
+        _aggregations.append("snr(features, label) as snr")
+    if "chi2" in methods:
+        _aggregations.extend([
+            "transpose_and_dot(label, features) as observed",
+            "array_sum(features) as feature_count",
+            "array_avg(label) as class_prob"])
+    _with_clauses["aggregated"] = build_query(_aggregations, "encoded", without_semicolon=True)
+
+    _source = "aggregated a"
+    if "chi2" in methods:
+        _with_clauses["expected"] = build_query(
+            ["transpose_and_dot(class_prob, feature_count) as expected"], "aggregated", without_semicolon=True)
+        _with_clauses["chi2_result"] = build_query(
+            ["chi2(a.observed, e.expected) as v"], "aggregated a\ncross join expected e", without_semicolon=True)
+        _source += "\ncross join chi2_result c"
+
+    _select_clauses = []
+    for i, column in enumerate(numerical_columns):
+        if "snr" in methods:
+            _select_clauses.append(f"a.snr[{i}] as {column}_snr")
+        if "chi2" in methods:
+            _select_clauses.append(f"c.v.chi2[{i}] as {column}_chi2")
+
+    return build_query(_select_clauses, _source, with_clauses=_with_clauses)
+
+
+def select_features(
+        stats_table: str,
+        numerical_columns: List[str],
+        categorical_columns: List[str],
+        max_null_rate: float = 1.0,
+        min_std: float = 0.0,
+        score_table: Optional[str] = None,
+        scored_columns: Optional[List[str]] = None,
+        min_scores: Optional[Dict[str, float]] = None) -> str:
+    """Build a query to flag features to be kept for vectorization.
+
+    Constant columns and columns with high null rate are dropped with the output of
+    :func:`molehill.stats.compute_stats` computed with ``with_count=True``.
+
+    Parameters
+    ----------
+    stats_table : :obj:`str`
+        Table name of stats of train data.
+    numerical_columns : :obj:`list` of :obj:`str`
+        A list of numerical column names in the stats table.
+    categorical_columns : :obj:`list` of :obj:`str`
+        A list of categorical column names in the stats table.
+    max_null_rate : float
+        Maximum rate of null to keep a column.
+    min_std : float
+        Columns with standard deviation less than or equal to this value are dropped.
+    score_table : :obj:`str`, optional
+        Table name of the output of :func:`feature_scores`.
+    scored_columns : :obj:`list` of :obj:`str`, optional
+        A list of column names scored in the score table.
+    min_scores : :obj:`dict`, optional
+        Mapping from scoring method to minimum score to keep a scored column, e.g. {"snr": 0.01}.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns "{column}_selected" flags of 1 or 0 in a row.
+    """
+
+    if min_scores and score_table is None:
+        raise ValueError("score_table is required for min_scores.")
+
+    _min_count = f"s.num_rows * {1.0 - max_null_rate:g}"
+
+    _select_clauses = []
+    for column in numerical_columns + categorical_columns:
+        if column in numerical_columns:
+            _conditions = [f"s.{column}_std > {min_std}"]
+        else:
+            _conditions = [f"s.{column}_cardinality > 1"]
+        _conditions.append(f"s.{column}_count >= {_min_count}")
+
+        if column in (scored_columns or []):
+            for method, threshold in (min_scores or {}).items():
+                _conditions.append(f"sc.{column}_{method} >= {threshold}")
+
+        _select_clauses.append("if({}, 1, 0) as {}_selected".format(" and ".join(_conditions), column))
+
+    _source = f"{stats_table} s"
+    if score_table:
+        _source += f"\ncross join {score_table} sc"
+
+    return build_query(_select_clauses, _source)
@@ -1,5 +1,7 @@
 from builtins import ValueError
-from typing import List, Optional, Any
+from typing import List, Optional, Any, Tuple
+from ..stats import stat_reference
+from ..dialect import string_type
 
 
 class Imputer:
@@ -17,17 +19,26 @@ class Imputer:
     >>> categorical_clause = categorical_imputer.transform(categorical_columns)
     >>> source = "titanic_train"
     >>> build_query([numeric_clause, categorical_clause], source)
+    >>>
+    >>> # Refer a stats table built by molehill.stats.pivot_stats instead of td.last_results
+    >>> numeric_imputer = Imputer("median", "train", stats_alias="st")
+    >>> required_stats = numeric_imputer.required_stats(numeric_columns)
     """
 
     def __init__(self,
                  strategy: str = "mean",
                  phase: Optional[str] = "train",
                  fill_value: Optional[Any] = None,
-                 categorical: Optional[bool] = None) -> None:
+                 categorical: Optional[bool] = None,
+                 stats_alias: Optional[str] = None,
+                 dialect: str = "presto") -> None:
         self.strategy = strategy
         self.phase = "_{}".format(phase) if phase else ""
+        self.phase_name = phase if phase else "whole"
         self.fill_value = "'{}'".format(fill_value) if type(fill_value) == str else fill_value
         self.categorical = categorical
+        self.stats_alias = stats_alias
+        self.string_type = string_type(dialect)
 
     def _build_partial_query(self, template: str, statistics: str, _columns: List[str]) -> str:
         __query = "\n, ".join(
@@ -42,12 +53,24 @@ class Imputer:
         )
         return __query
 
-    def transform(self, columns: List[str]) -> str:
-        if self.strategy == "mean":
-            statistics = "${{td.last_results.{column}_mean{phase}}}"
+    def transform(self, columns: List[str], column_source: Optional[str] = None) -> str:
+        """Build imputation clauses.
+
+        Parameters
+        ----------
+        columns : :obj:`list` of :obj:`str`
+            A list of column names.
+        column_source : :obj:`str`, optional
+            Expression template with "{column}" placeholder to be imputed, e.g. an expression
+            built by :meth:`RareLevelCollapser.expression`. Default: column itself
 
-        elif self.strategy == "median":
-            statistics = "${{td.last_results.{column}_median{phase}}}"
+        Returns
+        -------
+        :obj:`str`
+            Partial select clauses.
+        """
+        if self.strategy in ["mean", "median"]:
+            statistics = stat_reference(self.strategy, self.stats_alias)
 
         elif self.strategy == "constant":
             if self.fill_value is None:
@@ -58,8 +81,29 @@ class Imputer:
         else:
             raise ValueError("strategy should be mean, median or constant")
 
-        _column_source = "cast({column} as varchar)" if self.categorical else "{column}"
+        if column_source:
+            _column_source = column_source
+        else:
+            _column_source = f"cast({{column}} as {self.string_type})" if self.categorical else "{column}"
         _template = "coalesce({column}, {statistics}) as {column_dest}".format_map({
             "column": _column_source, "column_dest": "{column}", "statistics": statistics})
 
         return self._build_partial_query(_template, statistics, columns)
+
+    def required_stats(self, columns: List[str]) -> List[Tuple[str, str, str]]:
+        """List statistics referred by :meth:`transform`.
+
+        Parameters
+        ----------
+        columns : :obj:`list` of :obj:`str`
+            A list of column names.
+
+        Returns
+        -------
+        :obj:`list` of :obj:`tuple`
+            A list of (column, stat, phase) tuples.
+        """
+        if self.strategy not in ["mean", "median"]:
+            return []
+
+        return [(column, self.strategy, self.phase_name) for column in columns]
@@ -1,6 +1,7 @@
-import textwrap
 from builtins import ValueError
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from ..stats import stat_reference
+from ..dialect import check_dialect
 
 
 class Normalizer:
@@ -20,11 +21,27 @@ class Normalizer:
     >>> # For invert transform
     >>> inv_transform_clause = numeric_normalizer.invert_transform(numeric_columns)
     >>> build_query([inv_transform_clause], source)
+    >>>
+    >>> # Arithmetic expressions instead of Hivemall UDFs to be executed by Presto
+    >>> presto_normalizer = Normalizer("minmax", "train", dialect="presto")
     """
 
-    def __init__(self, strategy: str = "log1p", phase: Optional[str] = "train") -> None:
+    STRATEGY_STATS = {"log1p": [], "minmax": ["min", "max"], "standardize": ["mean", "std"]}
+
+    def __init__(self,
+                 strategy: str = "log1p",
+                 phase: Optional[str] = "train",
+                 stats_alias: Optional[str] = None,
+                 dialect: str = "hive") -> None:
+        check_dialect(dialect)
         self.strategy = strategy
         self.phase = _phase = "_{}".format(phase) if phase else ""
+        self.phase_name = phase if phase else "whole"
+        self.stats_alias = stats_alias
+        self.dialect = dialect
+
+    def _stat(self, stat: str) -> str:
+        return stat_reference(stat, self.stats_alias)
 
     def _build_partial_query(self, template: str, _columns: List[str]) -> str:
         __query = "\n, ".join(
@@ -42,25 +59,23 @@ class Normalizer:
         if self.strategy == "log1p":
             _template = "ln({column} + 1) as {column}"
 
+        elif self.strategy == "minmax" and self.dialect == "presto":
+            # Same as Hivemall rescale, which returns 0.5 for a constant column
+            _min, _max = self._stat('min'), self._stat('max')
+            _template = (f"if(\n  {_max} = {_min}\n  , 0.5\n"
+                         f"  , (cast({{column}} as double) - {_min}) / ({_max} - {_min})\n) as {{column}}")
+
         elif self.strategy == "minmax":
-            _template = textwrap.dedent(
-                """\
-            rescale(
-              {column}
-              , ${{td.last_results.{column}_min{phase}}}
-              , ${{td.last_results.{column}_max{phase}}}
-            ) as {column}"""
-            )
+            _template = f"rescale(\n  {{column}}\n  , {self._stat('min')}\n  , {self._stat('max')}\n) as {{column}}"
+
+        elif self.strategy == "standardize" and self.dialect == "presto":
+            # Constant columns are mapped to 0.0 to avoid division by zero
+            _mean, _std = self._stat('mean'), self._stat('std')
+            _template = (f"if(\n  {_std} = 0\n  , 0.0\n"
+                         f"  , (cast({{column}} as double) - {_mean}) / {_std}\n) as {{column}}")
 
         elif self.strategy == "standardize":
-            _template = textwrap.dedent(
-                """\
-            zscore(
-              {column}
-              , ${{td.last_results.{column}_mean{phase}}}
-              , ${{td.last_results.{column}_std{phase}}}
-            ) as {column}"""
-            )
+            _template = f"zscore(\n  {{column}}\n  , {self._stat('mean')}\n  , {self._stat('std')}\n) as {{column}}"
 
         else:
             raise ValueError(f"Unknown strategy: {self.strategy}")
@@ -74,19 +89,31 @@ class Normalizer:
             _template = "exp({column}) - 1 as {column}"
 
         elif self.strategy == "minmax":
-            _template = textwrap.dedent(
-                """\
-            {column} * (${{td.last_results.{column}_max{phase}}} - ${{td.last_results.{column}_min{phase}}})
-              + ${{td.last_results.{column}_min{phase}}} as {column}"""
-            )
+            _min = self._stat("min")
+            _template = f"{{column}} * ({self._stat('max')} - {_min})\n  + {_min} as {{column}}"
 
         elif self.strategy == "standardize":
-            _template = textwrap.dedent(
-                """\
-            {column} * ${{td.last_results.{column}_std{phase}}} + ${{td.last_results.{column}_mean{phase}}} as {column}"""
-            )
+            _template = f"{{column}} * {self._stat('std')} + {self._stat('mean')} as {{column}}"
 
         else:
             raise ValueError(f"Unknown strategy: {self.strategy}")
 
         return self._build_partial_query(_template, columns)
+
+    def required_stats(self, columns: List[str]) -> List[Tuple[str, str, str]]:
+        """List statistics referred by :meth:`transform`.
+
+        Parameters
+        ----------
+        columns : :obj:`list` of :obj:`str`
+            A list of column names.
+
+        Returns
+        -------
+        :obj:`list` of :obj:`tuple`
+            A list of (column, stat, phase) tuples.
+        """
+        if self.strategy not in self.STRATEGY_STATS:
+            raise ValueError(f"Unknown strategy: {self.strategy}")
+
+        return [(column, stat, self.phase_name) for column in columns for stat in self.STRATEGY_STATS[self.strategy]]
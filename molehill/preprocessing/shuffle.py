@@ -1,5 +1,6 @@
 from typing import List, Union, Tuple, Optional
 from ..utils import build_query
+from ..dialect import check_dialect, random, stable_random
 
 
 def shuffle(columns: List[str],
@@ -8,8 +9,10 @@ def shuffle(columns: List[str],
             id_column: str = "rowid",
             stratify: Optional[bool] = None,
             rnd_seed: Optional[int] = 32,
-            cluster_seed: Optional[int] = 43) -> str:
-    """Build shuffle query for random sampling. Should be executed by Hive
+            cluster_seed: Optional[int] = 43,
+            dialect: str = "hive",
+            split_key: Optional[List[str]] = None) -> str:
+    """Build shuffle query for random sampling. Should be executed by Hive, or Presto with presto dialect
 
     Parameters
     -----------
@@ -28,6 +31,11 @@ def shuffle(columns: List[str],
         Random seed for random number for sampling.
     cluster_seed : int, optional
         Random seed for cluster by. Required for ordinal random shuffling.
+    dialect : :obj:`str`
+        "hive" or "presto". Presto doesn't use Hivemall rowid() and random seeds. Default: "hive"
+    split_key : :obj:`list` of :obj:`str`, optional
+        Columns identifying a row. If set, rnd is computed from a hash of them instead of a random number,
+        so that a row is split into the same side on every run. Rows aren't physically shuffled.
 
     Returns
     --------
@@ -35,17 +43,26 @@ def shuffle(columns: List[str],
         Shuffle query
     """
 
-    _columns = [f"rowid() as {id_column}", target_column] + columns
+    check_dialect(dialect)
+    if stratify and split_key:
+        raise ValueError("Stratified sampling can't be used with split_key.")
+
+    _id = f"cast(uuid() as varchar) as {id_column}" if dialect == "presto" else f"rowid() as {id_column}"
+    _columns = [_id, target_column] + columns
     cond = ""
 
     if stratify:
         _columns.extend([
             f"count(1) over (partition by {target_column}) as per_label_count",
-            f"rank() over (partition by {target_column} order by rand({rnd_seed})) as rank_in_label"
+            f"rank() over (partition by {target_column} order by {random(rnd_seed, dialect)}) as rank_in_label"
         ])
+    elif split_key:
+        _columns.extend([f"{stable_random(split_key, dialect)} as rnd"])
     else:
-        _columns.extend([f"rand({rnd_seed}) as rnd"])
-        cond = f"cluster by rand({cluster_seed})"
+        _columns.extend([f"{random(rnd_seed, dialect)} as rnd"])
+        # Rows are split by rnd, so physical shuffling is only for Hive
+        if dialect == "hive":
+            cond = f"cluster by rand({cluster_seed})"
 
     return build_query(_columns, source, cond)
 
@@ -0,0 +1,142 @@
+from collections import OrderedDict
+from typing import List
+from ..utils import build_query
+
+
+class TargetEncoder:
+    """Replace categorical columns with smoothed target means of their levels.
+
+    Encodings are computed on train data. Train data is encoded with out-of-fold values
+    to avoid target leakage, and test or whole data is encoded with values of all train data.
+
+    Examples
+    --------
+    >>> categorical_columns = ["embarked", "cabin"]
+    >>> encoder = TargetEncoder("titanic_target_encoding", "survived", smoothing=10, n_folds=5)
+    >>>
+    >>> # Save the result as titanic_target_encoding table
+    >>> encoding_query = encoder.compute_encoding("titanic_train", categorical_columns)
+    >>>
+    >>> train_query = encoder.transform("titanic_train", categorical_columns, ["age"], out_of_fold=True)
+    >>> test_query = encoder.transform("titanic_test", categorical_columns, ["age"])
+    """
+
+    PRIOR = "__prior__"
+
+    def __init__(self,
+                 encoding_table: str,
+                 target_column: str,
+                 id_column: str = "rowid",
+                 smoothing: float = 10.0,
+                 n_folds: int = 5) -> None:
+        if n_folds < 2:
+            raise ValueError("n_folds should be greater than 1.")
+
+        self.encoding_table = encoding_table
+        self.target_column = target_column
+        self.id_column = id_column
+        self.smoothing = smoothing
+        self.n_folds = n_folds
+
+    def _fold(self, alias: str) -> str:
+        return (f"mod(abs(from_big_endian_64(xxhash64(to_utf8(cast({alias}.{self.id_column} as varchar))))),"
+                f" {self.n_folds})")
+
+    def compute_encoding(self, source: str, columns: List[str]) -> str:
+        """Build a query to compute smoothed target means per level and fold. Should be executed by Presto.
+
+        Parameters
+        ----------
+        source : :obj:`str`
+            Source table name. It should be train data.
+        columns : :obj:`list` of :obj:`str`
+            A list of categorical column names.
+
+        Returns
+        -------
+        :obj:`str`
+            Built query which returns column_name, level, fold and encoding.
+            Fold -1 means an encoding computed with all train data.
+        """
+
+        _names = ", ".join(f"'{column}'" for column in columns)
+        _levels = ", ".join(f"cast(s.{column} as varchar)" for column in columns)
+        _smoothing = f"{self.smoothing} * p.prior"
+
+        _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+        _with_clauses["prior"] = build_query(
+            [f"avg(cast({self.target_column} as double)) as prior"], source, without_semicolon=True)
+        _with_clauses["exploded"] = build_query(
+            ["t.column_name", "t.level", f"{self._fold('s')} as fold",
+             f"cast(s.{self.target_column} as double) as target"],
+            f"{source} s\ncross join unnest(\n  array[{_names}]\n  , array[{_levels}]\n) as t(column_name, level)",
+            condition="where\n  t.level is not null",
+            without_semicolon=True)
+        _with_clauses["fold_stats"] = build_query(
+            ["column_name", "level", "fold", "sum(target) as target_sum", "count(1) as cnt"],
+            "exploded",
+            condition="group by\n  column_name, level, fold",
+            without_semicolon=True)
+        _with_clauses["level_stats"] = build_query(
+            ["column_name", "level", "fold", "target_sum", "cnt",
+             "sum(target_sum) over (partition by column_name, level) as total_sum",
+             "sum(cnt) over (partition by column_name, level) as total_cnt"],
+            "fold_stats",
+            without_semicolon=True)
+
+        _out_of_fold = build_query(
+            ["column_name", "level", "fold",
+             f"(total_sum - target_sum + {_smoothing}) / nullif(total_cnt - cnt + {self.smoothing}, 0) as encoding"],
+            "level_stats\ncross join prior p",
+            without_semicolon=True)
+        _whole = build_query(
+            ["column_name", "level", "-1 as fold",
+             f"(sum(target_sum) + {_smoothing}) / nullif(sum(cnt) + {self.smoothing}, 0) as encoding"],
+            "fold_stats\ncross join prior p",
+            condition="group by\n  column_name, level, p.prior",
+            without_semicolon=True)
+        _prior = build_query(
+            [f"'{self.PRIOR}' as column_name", "cast(null as varchar) as level", "-1 as fold", "prior as encoding"],
+            "prior",
+            without_semicolon=True)
+        _with_clauses["encodings"] = "\nunion all\n".join([_out_of_fold, _whole, _prior])
+
+        return build_query(["column_name", "level", "fold", "encoding"], "encodings", with_clauses=_with_clauses)
+
+    def transform(self,
+                  source: str,
+                  columns: List[str],
+                  other_columns: List[str],
+                  out_of_fold: bool = False) -> str:
+        """Build a query to replace categorical columns with target encodings. Should be executed by Presto.
+
+        Parameters
+        ----------
+        source : :obj:`str`
+            Source table name.
+        columns : :obj:`list` of :obj:`str`
+            A list of categorical column names to be encoded.
+        other_columns : :obj:`list` of :obj:`str`
+            A list of column names to be passed through.
+        out_of_fold : bool
+            Use out-of-fold encodings. It should be True only for train data. Default: False
+
+        Returns
+        -------
+        :obj:`str`
+            Built query.
+        """
+
+        _fold = self._fold("t") if out_of_fold else "-1"
+
+        _select_clauses = [f"t.{self.id_column}", f"t.{self.target_column}"]
+        _source = f"{source} t\ncross join (\n  select encoding from {self.encoding_table}" \
+                  f" where column_name = '{self.PRIOR}'\n) p"
+        for i, column in enumerate(columns):
+            _select_clauses.append(f"coalesce(e{i}.encoding, p.encoding) as {column}")
+            _source += (f"\nleft outer join {self.encoding_table} e{i}\n"
+                        f"  on (e{i}.column_name = '{column}' and e{i}.level = cast(t.{column} as varchar)"
+                        f" and e{i}.fold = {_fold})")
+        _select_clauses.extend(f"t.{column}" for column in other_columns)
+
+        return build_query(_select_clauses, _source)
@@ -1,5 +1,6 @@
+from collections import OrderedDict
 from textwrap import indent
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 from ..utils import build_query
 
 
@@ -18,7 +19,12 @@ def vectorize(
         emit_null: bool = False,
         force_value: bool = False,
         dense: bool = False,
-        feature_cardinality: Optional[Union[int, str]] = None) -> str:
+        feature_cardinality: Optional[Union[int, str]] = None,
+        feature_dictionary: Optional[str] = None,
+        hashed_columns: Optional[Dict[str, int]] = None,
+        selection_table: Optional[str] = None,
+        passthrough_columns: Optional[List[str]] = None,
+        condition: Optional[str] = None) -> str:
     """Build vectorization query before training or prediction.
 
     Parameters
@@ -48,6 +54,19 @@ def vectorize(
         Create dense feature vector. Default: False
     feature_cardinality : int or :obj:`str`, optional
         Max feature size for feature hashing.
+    feature_dictionary : :obj:`str`, optional
+        A table name built by :func:`build_feature_dictionary`. If set, features are encoded
+        into integer feature ids instead of "column#value" strings.
+    hashed_columns : :obj:`dict`, optional
+        Key is a categorical column name and value is the number of buckets to hash its values into.
+        Hashed values keep the column name, e.g. "column#bucket", so different columns never collide.
+    selection_table : :obj:`str`, optional
+        A table name built by :func:`molehill.preprocessing.select_features`.
+        Values of columns whose "{column}_selected" flag isn't 1 are replaced with NULL.
+    passthrough_columns : :obj:`list` of :obj:`str`, optional
+        A list of column names to be output as is, e.g. time column for incremental training.
+    condition : :obj:`str`, optional
+        Condition like where clause.
 
     Returns
     -------
@@ -58,20 +77,41 @@ def vectorize(
     if categorical_columns is None and numerical_columns is None:
         raise ValueError("Either one categorical or numerical column is required.")
 
+    if feature_dictionary and (dense or hashing):
+        raise ValueError("feature_dictionary can't be used with dense or hashing option.")
+
+    if feature_dictionary and passthrough_columns:
+        raise ValueError("feature_dictionary can't be used with passthrough_columns.")
+
     if not categorical_columns:
         categorical_columns = []
 
     if not numerical_columns:
         numerical_columns = []
 
+    selection_alias = None
+    if selection_table:
+        selection_alias = "fs"
+        source = f"{source}\ncross join {selection_table} {selection_alias}"
+
     if dense:
         feature_query = _build_feature_array_dense(
-            categorical_columns, numerical_columns, hashing=hashing, feature_cardinality=feature_cardinality)
+            categorical_columns, numerical_columns, hashing=hashing, feature_cardinality=feature_cardinality,
+            hashed_columns=hashed_columns, selection_alias=selection_alias)
         feature_query += f" as {features}"
 
+    elif feature_dictionary:
+        feature_query = _feature_column_query(
+            categorical_columns, numerical_columns, emit_null=emit_null, force_value=force_value,
+            hashed_columns=hashed_columns, selection_alias=selection_alias)
+
+        return _encode_feature_ids(
+            source, target_column, feature_query, feature_dictionary, id_column, features, bias, condition)
+
     else:
         feature_query = _feature_column_query(
-            categorical_columns, numerical_columns, emit_null=emit_null, force_value=force_value)
+            categorical_columns, numerical_columns, emit_null=emit_null, force_value=force_value,
+            hashed_columns=hashed_columns, selection_alias=selection_alias)
 
         if hashing:
             _cardinality = ''
@@ -87,18 +127,168 @@ def vectorize(
         feature_query += f" as {features}"
 
     query = build_query(
-        [id_column, feature_query, target_column],
-        source
+        [id_column, feature_query, target_column] + (passthrough_columns or []),
+        source,
+        condition
     )
 
     return query
 
 
+def merge_vectors(
+        source: str,
+        num_chunks: int,
+        target_column: str,
+        id_column: str = "rowid",
+        features: str = "features",
+        bias: bool = False,
+        passthrough_columns: Optional[List[str]] = None) -> str:
+    """Build a query to merge feature vectors vectorized per column chunk.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name. Chunk tables are expected as "{source}_chunk_{i}".
+    num_chunks : int
+        Number of column chunks.
+    target_column : :obj:`str`
+        Target column name for prediction.
+    id_column : :obj:`str`
+        Id column name. Default: "rowid"
+    features : :obj:`str`
+        Feature column name. Default: "features"
+    bias : bool
+        Add bias for feature. Chunks should be vectorized without bias. Default: False
+    passthrough_columns : :obj:`list` of :obj:`str`, optional
+        Columns passed through by chunks, e.g. a segment column. They are taken from the first chunk.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query to merge feature vectors with array_concat.
+    """
+
+    _features = [f"t{i}.{features}" for i in range(num_chunks)]
+    if num_chunks > 1:
+        feature_query = "array_concat(\n{}\n)".format(indent(",\n".join(_features), "  "))
+    else:
+        feature_query = _features[0]
+
+    if bias:
+        feature_query = "add_bias(\n{}\n)".format(indent(feature_query, "  "))
+
+    _source = f"{source}_chunk_0 t0"
+    for i in range(1, num_chunks):
+        _source += f"\njoin {source}_chunk_{i} t{i}\n  on (t0.{id_column} = t{i}.{id_column})"
+
+    return build_query(
+        [f"t0.{id_column}", f"{feature_query} as {features}", f"t0.{target_column}"]
+        + [f"t0.{column}" for column in passthrough_columns or []],
+        _source)
+
+
+def build_feature_dictionary(
+        source: str,
+        categorical_columns: Optional[List[str]] = None,
+        numerical_columns: Optional[List[str]] = None,
+        emit_null: bool = False,
+        force_value: bool = False,
+        hashed_columns: Optional[Dict[str, int]] = None) -> str:
+    """Build a query to create a dictionary mapping feature names to integer feature ids.
+
+    The dictionary should be built once on train data. It also works as a reverse map
+    from feature id to feature name for interpreting model tables.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name.
+    categorical_columns : :obj:`list` of :obj:`str`, optional
+        A list of categorical column names.
+    numerical_columns : :obj:`list` of :obj:`str`, optional
+        A list of numerical column names.
+    emit_null : bool
+        Ensure feature entity size equally with emitting Null or 0. Default: False
+    force_value : bool
+        Force to output value as 1 for categorical columns. Default: False
+    hashed_columns : :obj:`dict`, optional
+        Key is a categorical column name and value is the number of buckets to hash its values into.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query for a feature dictionary, which has feature and feature_id columns.
+    """
+
+    if categorical_columns is None and numerical_columns is None:
+        raise ValueError("Either one categorical or numerical column is required.")
+
+    feature_query = _feature_column_query(
+        categorical_columns or [], numerical_columns or [], emit_null=emit_null, force_value=force_value,
+        hashed_columns=hashed_columns)
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["feature_names"] = build_query(
+        ["extract_feature(fv) as feature"],
+        f"{source} t1\nLATERAL VIEW explode(\n{indent(feature_query, '  ')}\n) t2 as fv",
+        condition="group by\n  extract_feature(fv)",
+        without_semicolon=True)
+
+    # Feature id 0 is left for the bias term added by add_bias.
+    return build_query(
+        ["feature", "row_number() over (order by feature) as feature_id"],
+        "feature_names",
+        with_clauses=_with_clauses)
+
+
+def _encode_feature_ids(
+        source: str,
+        target_column: str,
+        feature_query: str,
+        feature_dictionary: str,
+        id_column: str,
+        features: str,
+        bias: bool,
+        condition: Optional[str] = None) -> str:
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["vectorized"] = build_query(
+        [id_column, f"{feature_query} as {features}", target_column],
+        source,
+        condition=condition,
+        without_semicolon=True)
+    _with_clauses["features_exploded"] = build_query(
+        [f"t1.{id_column}", f"t1.{target_column}", "extract_feature(fv) as feature", "extract_weight(fv) as value"],
+        f"vectorized t1\nLATERAL VIEW OUTER explode(t1.{features}) t2 as fv",
+        without_semicolon=True)
+
+    # collect_list skips NULL, so features not in the dictionary are dropped.
+    # A row without features is kept by OUTER explode as a NULL feature, and gets an empty vector.
+    feature_query = "collect_list(concat(cast(d.feature_id as string), ':', cast(t1.value as string)))"
+    if bias:
+        feature_query = "add_bias(\n{}\n)".format(indent(feature_query, "  "))
+
+    return build_query(
+        [f"t1.{id_column}", f"{feature_query} as {features}", f"t1.{target_column}"],
+        f"features_exploded t1\nleft outer join {feature_dictionary} d\n  on (t1.feature = d.feature)",
+        condition=f"group by\n  t1.{id_column}, t1.{target_column}",
+        with_clauses=_with_clauses)
+
+
+def _select_column(column: str, selection_alias: Optional[str]) -> str:
+    if not selection_alias:
+        return column
+
+    return f"if({selection_alias}.{column}_selected = 1, {column}, null)"
+
+
 def _build_feature_array(
         columns: List[str],
         ctype: str,
         emit_null: bool = False,
-        force_value: bool = False) -> str:
+        force_value: bool = False,
+        hashed_columns: Optional[Dict[str, int]] = None,
+        selection_alias: Optional[str] = None) -> str:
     """ Build feature array for vectorization.
 
     Parameters
@@ -111,6 +301,10 @@ def _build_feature_array(
         Ensure output null or 0 if a categorical column is null or 0 value. Default: False
     force_value : bool
         Force to output value as 1 for categorical columns. Default: False
+    hashed_columns : :obj:`dict`, optional
+        Key is a column name and value is the number of buckets to hash its values into.
+    selection_alias : :obj:`str`, optional
+        Alias of a feature selection table to mask unselected columns.
 
     Returns
     --------
@@ -118,12 +312,18 @@ def _build_feature_array(
         Partial query for feature vectorization.
     """
 
+    if not hashed_columns:
+        hashed_columns = {}
+
     _query = ""
     _query += 'array("'
     _query += '", "'.join(columns)
     _query += '")\n, '
 
-    _query += "\n, ".join(columns)
+    _values = [_select_column(column, selection_alias) for column in columns]
+    _query += "\n, ".join(
+        f"mhash({value}, {hashed_columns[column]})" if column in hashed_columns else value
+        for column, value in zip(columns, _values))
 
     _options = []
     if emit_null:
@@ -146,15 +346,24 @@ def _build_feature_array_dense(
         categorical_columns: List[str],
         numerical_columns: List[str],
         hashing: bool = False,
-        feature_cardinality: Optional[Union[int, str]] = None):
+        feature_cardinality: Optional[Union[int, str]] = None,
+        hashed_columns: Optional[Dict[str, int]] = None,
+        selection_alias: Optional[str] = None):
 
-    target_columns = numerical_columns.copy()
+    target_columns = [_select_column(column, selection_alias) for column in numerical_columns]
 
-    if hashing:
-        _feature_size = f", {feature_cardinality}" if feature_cardinality else ''
-        target_columns += [f"mhash({e}{_feature_size})" for e in categorical_columns]
-    else:
-        target_columns += categorical_columns
+    if not hashed_columns:
+        hashed_columns = {}
+
+    for e in categorical_columns:
+        _value = _select_column(e, selection_alias)
+        if e in hashed_columns:
+            target_columns.append(f"mhash({_value}, {hashed_columns[e]})")
+        elif hashing:
+            _feature_size = f", {feature_cardinality}" if feature_cardinality else ''
+            target_columns.append(f"mhash({_value}{_feature_size})")
+        else:
+            target_columns.append(_value)
 
     _query = f"array({', '.join(target_columns)})"
 
@@ -165,7 +374,9 @@ def _feature_column_query(
         categorical_columns: List[str],
         numerical_columns: List[str],
         emit_null: bool = False,
-        force_value: bool = False) -> str:
+        force_value: bool = False,
+        hashed_columns: Optional[Dict[str, int]] = None,
+        selection_alias: Optional[str] = None) -> str:
     """Build feature column query.
 
     Parameters
@@ -178,6 +389,10 @@ def _feature_column_query(
         Ensure output null or 0 if a categorical column is null or 0 value. Default: False
     force_value : bool
         Force to output value as 1 for categorical columns. Default: False
+    hashed_columns : :obj:`dict`, optional
+        Key is a categorical column name and value is the number of buckets to hash its values into.
+    selection_alias : :obj:`str`, optional
+        Alias of a feature selection table to mask unselected columns.
 
     Returns
     -------
@@ -196,14 +411,17 @@ def _feature_column_query(
         _query = "array_concat(\n"
 
     if exists_numerical:
-        feature_array = _build_feature_array(numerical_columns, "numerical", emit_null)
+        feature_array = _build_feature_array(
+            numerical_columns, "numerical", emit_null, selection_alias=selection_alias)
         _query += indent(feature_array, "  ") if both_column_type else feature_array
 
     if both_column_type:
         _query += ",\n"
 
     if exists_categorical:
-        feature_array = _build_feature_array(categorical_columns, "categorical", emit_null, force_value)
+        feature_array = _build_feature_array(
+            categorical_columns, "categorical", emit_null, force_value, hashed_columns=hashed_columns,
+            selection_alias=selection_alias)
         _query += indent(feature_array, "  ") if both_column_type else feature_array
 
     if both_column_type:
@@ -1,10 +1,45 @@
 import textwrap
 import itertools
-from typing import List
+from collections import OrderedDict
+from typing import List, Optional, Tuple
 from .utils import build_query
 
+STATS = ["mean", "std", "min", "25", "median", "75", "max"]
+PHASES = ["train", "test", "whole"]
 
-def compute_stats(source: str, numerical_columns: List[str]) -> str:
+
+def percentile_name(percentile: float) -> str:
+    """Name of a statistic for an extended percentile, e.g. "p10" for 0.1."""
+    return "p{}".format(f"{percentile * 100:g}".replace(".", "_"))
+
+
+def stat_reference(stat: str, stats_alias: Optional[str] = None) -> str:
+    """Build a template referring a statistic with "{column}" and "{phase}" placeholders.
+
+    Parameters
+    ----------
+    stat : :obj:`str`
+        Statistic name, e.g. "mean" or "median".
+    stats_alias : :obj:`str`, optional
+        Alias of a stats table built by :func:`pivot_stats`. Default: refer ``td.last_results``
+
+    Returns
+    -------
+    :obj:`str`
+        Template to be formatted with column and phase.
+    """
+    if stats_alias:
+        return f"{stats_alias}.{{column}}_{stat}{{phase}}"
+
+    return f"${{{{td.last_results.{{column}}_{stat}{{phase}}}}}}"
+
+
+def compute_stats(
+        source: str,
+        numerical_columns: List[str],
+        percentiles: Optional[List[float]] = None,
+        with_count: bool = False,
+        categorical_columns: Optional[List[str]] = None) -> str:
     numerical_template = textwrap.dedent(
         """\
     avg({column}) as {column}_mean
@@ -15,17 +50,29 @@ def compute_stats(source: str, numerical_columns: List[str]) -> str:
     , approx_percentile({column}, 0.75) as {column}_75
     , max({column}) as {column}_max"""
     )
+    for percentile in percentiles or []:
+        numerical_template += f"\n, approx_percentile({{column}}, {percentile}) as {{column}}_{percentile_name(percentile)}"
+
+    if with_count:
+        numerical_template += "\n, count({column}) as {column}_count"
+
+    _clauses = [numerical_template.format_map({"column": column}) for column in numerical_columns]
+
+    # Null rate and cardinality of categorical columns, used for feature selection
+    for column in categorical_columns or []:
+        _clauses.append(f"count({column}) as {column}_count\n, approx_distinct({column}) as {column}_cardinality")
+
+    if with_count:
+        _clauses.append("count(1) as num_rows")
 
     _query = ""
-    _query += "\n, ".join(
-        numerical_template.format_map({"column": column})
-        for column in numerical_columns
-    )
+    _query += "\n, ".join(_clauses)
 
     return build_query([_query], source)
 
 
-def combine_train_test_stats(source: str, numerical_columns: List[str]) -> str:
+def combine_train_test_stats(
+        source: str, numerical_columns: List[str], percentiles: Optional[List[float]] = None) -> str:
     numerical_template = textwrap.dedent(
         """\
     {phase}.{column}_mean as {column}_mean{suffix}
@@ -36,6 +83,9 @@ def combine_train_test_stats(source: str, numerical_columns: List[str]) -> str:
     , {phase}.{column}_75 as {column}_75{suffix}
     , {phase}.{column}_max as {column}_max{suffix}"""
     )
+    for percentile in percentiles or []:
+        _name = percentile_name(percentile)
+        numerical_template += f"\n, {{phase}}.{{column}}_{_name} as {{column}}_{_name}{{suffix}}"
 
     _query = ""
     _query += "\n, ".join(
@@ -46,3 +96,241 @@ def combine_train_test_stats(source: str, numerical_columns: List[str]) -> str:
 
     _source = f"{source}_train_stats as train, {source}_test_stats as test, {source}_stats as whole"
     return build_query([_query], _source)
+
+
+def compute_stats_long(
+        source: str,
+        numerical_columns: List[str],
+        percentiles: Optional[List[float]] = None,
+        segment_column: Optional[str] = None) -> str:
+    """Build a query to compute stats in long format, which has a row per column and statistic.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name.
+    numerical_columns : :obj:`list` of :obj:`str`
+        A list of numerical column names.
+    percentiles : :obj:`list` of float, optional
+        Additional percentiles to be computed.
+    segment_column : :obj:`str`, optional
+        If set, stats are computed per segment and stored with "segment" column.
+
+    Returns
+    -------
+    :obj:`str`
+        Built query for Presto which returns column_name, stat and value.
+    """
+    _extra_percentiles = [(percentile, percentile_name(percentile)) for percentile in percentiles or []]
+    _percentiles = [(0.25, "25"), (0.5, "median"), (0.75, "75")] + _extra_percentiles
+
+    _aggregations = ["t.column_name", "avg(t.value) as v_mean", "stddev_pop(t.value) as v_std", "min(t.value) as v_min"]
+    _aggregations += [f"approx_percentile(t.value, {percentile}) as v_{name}" for percentile, name in _percentiles]
+    _aggregations.append("max(t.value) as v_max")
+    _group_by = "group by\n  t.column_name"
+    if segment_column:
+        _aggregations.insert(0, f"{segment_column} as segment")
+        _group_by = f"group by\n  {segment_column}, t.column_name"
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["aggregated"] = build_query(
+        _aggregations,
+        _unnest_columns(source, numerical_columns),
+        condition=_group_by,
+        without_semicolon=True)
+
+    return _build_stats_output(
+        _with_clauses, numerical_columns, percentiles, long_format=True, segmented=bool(segment_column))
+
+
+def _unnest_columns(source: str, numerical_columns: List[str]) -> str:
+    _names = ", ".join(f"'{column}'" for column in numerical_columns)
+    _values = ", ".join(f"cast({column} as double)" for column in numerical_columns)
+
+    return f"{source}\ncross join unnest(\n  array[{_names}]\n  , array[{_values}]\n) as t(column_name, value)"
+
+
+def _build_stats_output(
+        with_clauses: OrderedDict,
+        numerical_columns: List[str],
+        percentiles: Optional[List[float]],
+        long_format: bool,
+        segmented: bool = False) -> str:
+    """Build the final select from "aggregated" with clause, which has column_name and "v_{stat}" columns."""
+    _stats = STATS + [percentile_name(percentile) for percentile in percentiles or []]
+
+    if long_format:
+        _stat_names = ", ".join(f"'{stat}'" for stat in _stats)
+        _stat_values = ", ".join(f"a.v_{stat}" for stat in _stats)
+
+        return build_query(
+            (["a.segment"] if segmented else []) + ["a.column_name", "s.stat", "s.value"],
+            f"aggregated a\ncross join unnest(\n  array[{_stat_names}]\n  , array[{_stat_values}]\n) as s(stat, value)",
+            with_clauses=with_clauses)
+
+    # Same columns as compute_stats
+    _clauses = [f"max(case when column_name = '{column}' then v_{stat} end) as {column}_{stat}"
+                for column in numerical_columns for stat in _stats]
+    if segmented:
+        return build_query(
+            ["segment"] + _clauses, "aggregated", condition="group by\n  segment", with_clauses=with_clauses)
+
+    return build_query(_clauses, "aggregated", with_clauses=with_clauses)
+
+
+def combine_train_test_stats_long(source: str, num_chunks: Optional[int] = None, segmented: bool = False) -> str:
+    """Build a query to combine long format stats of train, test and whole data into a table.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name. Stats tables are expected as "{source}_train_stats", "{source}_test_stats"
+        and "{source}_stats".
+    num_chunks : int, optional
+        Number of column chunks. If set, stats tables are expected with "_chunk_{i}" suffix.
+    segmented : bool
+        Whether stats tables have "segment" column. Default: False
+
+    Returns
+    -------
+    :obj:`str`
+        Built query which returns column_name, stat, phase and value.
+    """
+    _tables = {"train": f"{source}_train_stats", "test": f"{source}_test_stats", "whole": f"{source}_stats"}
+    _suffixes = [f"_chunk_{i}" for i in range(num_chunks)] if num_chunks else [""]
+    _segment = ["segment"] if segmented else []
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["combined"] = "\nunion all\n".join(
+        build_query(_segment + ["column_name", "stat", f"'{phase}' as phase", "value"], _tables[phase] + suffix,
+                    without_semicolon=True)
+        for phase, suffix in itertools.product(PHASES, _suffixes))
+
+    return build_query(_segment + ["column_name", "stat", "phase", "value"], "combined", with_clauses=_with_clauses)
+
+
+def pivot_stats(stats_table: str, required_stats: List[Tuple[str, str, str]], segmented: bool = False) -> str:
+    """Build a query to pivot required statistics of long format stats into a row.
+
+    Parameters
+    ----------
+    stats_table : :obj:`str`
+        A table name built by :func:`combine_train_test_stats_long`.
+    required_stats : :obj:`list` of :obj:`tuple`
+        A list of (column, stat, phase) tuples. phase is "train", "test" or "whole".
+    segmented : bool
+        Pivot stats into a row per segment. The segment is named as "stats_segment". Default: False
+
+    Returns
+    -------
+    :obj:`str`
+        Built query without semicolon, which is expected to be used as a with clause.
+        Each statistic is named as "{column}_{stat}{phase}" same as ``td.last_results``.
+    """
+    _template = "max(case when column_name = '{column}' and stat = '{stat}' and phase = '{phase}' then value end)"
+    _clauses = []
+    for column, stat, phase in OrderedDict.fromkeys(required_stats):
+        _suffix = f"_{phase}" if phase != "whole" else ""
+        _clauses.append(
+            _template.format_map({"column": column, "stat": stat, "phase": phase}) + f" as {column}_{stat}{_suffix}")
+
+    if segmented:
+        return build_query(
+            ["segment as stats_segment"] + _clauses, stats_table, condition="group by\n  segment",
+            without_semicolon=True)
+
+    return build_query(_clauses, stats_table, without_semicolon=True)
+
+
+def partition_summaries(
+        source: str,
+        numerical_columns: List[str],
+        partition: str,
+        condition: Optional[str] = None,
+        without_semicolon: bool = False) -> str:
+    """Build a query to compute mergeable stats summaries per partition and column.
+
+    Parameters
+    ----------
+    source : :obj:`str`
+        Source table name.
+    numerical_columns : :obj:`list` of :obj:`str`
+        A list of numerical column names.
+    partition : :obj:`str`
+        Expression of a partition key returning varchar, e.g. "td_time_string(time, 'd!')".
+    condition : :obj:`str`, optional
+        Condition to filter partitions, e.g. where clause.
+    without_semicolon : bool
+        Build the query as a part of another query. Default: False
+
+    Returns
+    -------
+    :obj:`str`
+        Built query for Presto. Quantiles are stored as serialized qdigest.
+    """
+    return build_query(
+        [f"{partition} as partition_key", "t.column_name", "count(t.value) as cnt", "sum(t.value) as sum_value",
+         "sum(t.value * t.value) as sum_squares", "min(t.value) as min_value", "max(t.value) as max_value",
+         "cast(qdigest_agg(t.value) as varbinary) as digest"],
+        _unnest_columns(source, numerical_columns),
+        condition="\n".join(filter(None, [condition, f"group by\n  {partition}, t.column_name"])),
+        without_semicolon=without_semicolon)
+
+
+def merge_partition_summaries(
+        history_table: str,
+        source: str,
+        numerical_columns: List[str],
+        partition: str,
+        percentiles: Optional[List[float]] = None,
+        long_format: bool = False) -> str:
+    """Build a query to merge stored partition summaries with summaries of partitions not stored yet.
+
+    Parameters
+    ----------
+    history_table : :obj:`str`
+        A table storing the output of :func:`partition_summaries`.
+    source : :obj:`str`
+        Source table name.
+    numerical_columns : :obj:`list` of :obj:`str`
+        A list of numerical column names.
+    partition : :obj:`str`
+        Expression of a partition key used for the history table.
+    percentiles : :obj:`list` of float, optional
+        Additional percentiles to be computed.
+    long_format : bool
+        Return stats in the format of :func:`compute_stats_long`. Default: same as :func:`compute_stats`
+
+    Returns
+    -------
+    :obj:`str`
+        Built query for Presto.
+    """
+    _columns = ["partition_key", "column_name", "cnt", "sum_value", "sum_squares", "min_value", "max_value", "digest"]
+
+    _percentiles = [(0.25, "25"), (0.5, "median"), (0.75, "75")]
+    _percentiles += [(percentile, percentile_name(percentile)) for percentile in percentiles or []]
+
+    _with_clauses = OrderedDict()  # type: OrderedDict[str, str]
+    _with_clauses["summaries"] = "\nunion all\n".join([
+        build_query(_columns, history_table, without_semicolon=True),
+        partition_summaries(
+            source, numerical_columns, partition,
+            condition=f"where\n  {partition} > coalesce((select max(partition_key) from {history_table}), '')",
+            without_semicolon=True)])
+    _with_clauses["merged"] = build_query(
+        ["column_name", "sum(cnt) as cnt", "sum(sum_value) as sum_value", "sum(sum_squares) as sum_squares",
+         "min(min_value) as min_value", "max(max_value) as max_value",
+         "merge(cast(digest as qdigest(double))) as digest"],
+        "summaries",
+        condition="group by\n  column_name",
+        without_semicolon=True)
+
+    _aggregations = ["column_name", "sum_value / cnt as v_mean",
+                     "sqrt(greatest(sum_squares / cnt - pow(sum_value / cnt, 2), 0.0)) as v_std",
+                     "min_value as v_min"]
+    _aggregations += [f"value_at_quantile(digest, {percentile}) as v_{name}" for percentile, name in _percentiles]
+    _aggregations.append("max_value as v_max")
+    _with_clauses["aggregated"] = build_query(_aggregations, "merged", without_semicolon=True)
+
+    return _build_stats_output(_with_clauses, numerical_columns, percentiles, long_format)
@@ -83,3 +83,25 @@ from
         query += "\n;\n"
 
     return query
+
+
+def chunk_columns(columns: List[str], chunk_size: int) -> List[List[str]]:
+    """Split columns into contiguous chunks keeping their order.
+
+    Parameters
+    ----------
+    columns : :obj:`list` of :obj:`str`
+        List of column names.
+    chunk_size : int
+        Maximum number of columns in a chunk.
+
+    Returns
+    -------
+    :obj:`list` of :obj:`list` of :obj:`str`
+        Chunks of column names.
+    """
+
+    if chunk_size < 1:
+        raise ValueError("chunk_size should be positive.")
+
+    return [columns[i:i + chunk_size] for i in range(0, len(columns), chunk_size)]
@@ -0,0 +1,73 @@
+import random
+import pytest
+from molehill.evaluation import evaluate, leaderboard
+from molehill.local import LocalEngine
+from molehill.model import train_classifier, predict_classifier
+from molehill.preprocessing import vectorize, shuffle, train_test_split, Normalizer
+from molehill.stats import compute_stats
+from molehill.utils import build_query
+
+
+@pytest.fixture
+def engine():
+    engine = LocalEngine()
+    rnd = random.Random(0)
+    rows = []
+    for i in range(200):
+        sex = rnd.choice(["male", "female"])
+        survived = 1 if (sex == "female") ^ (rnd.random() < 0.2) else 0
+        rows.append((i, survived, rnd.uniform(1, 80), sex))
+    engine.load_rows("titanic", ["rowid", "survived", "age", "sex"], rows)
+    return engine
+
+
+def test_pipeline_queries(engine):
+    stats = engine.execute(compute_stats("${source}", ["age"], []), {"source": "titanic"})[0]
+    assert stats["age_min"] <= stats["age_median"] <= stats["age_max"]
+
+    normalize_query = build_query(["rowid", "survived", Normalizer("minmax", None).transform(["age"]), "sex"],
+                                  "${source}")
+    engine.create_table("titanic_norm", normalize_query, {"source": "titanic", "td": {"last_results": stats}})
+    assert all(0.0 <= row["age"] <= 1.0 for row in engine.fetch_table("titanic_norm"))
+
+    engine.create_table("test", vectorize("titanic_norm", "survived", ["sex"], ["age"]))
+    engine.create_table("model", train_classifier("test", "survived", bias=True))
+    engine.create_table("prediction", predict_classifier("test", "rowid", "model", bias=True)[0])
+    assert len(engine.fetch_table("prediction")) == 200
+
+    exact = engine.execute(evaluate(["auc", "logloss"], "survived", "probability"))[0]
+    assert exact["auc"] > 0.7
+
+    histogram = engine.execute(evaluate(["auc", "logloss"], "survived", "probability", auc_bins=10000))[0]
+    assert histogram["auc"] == pytest.approx(exact["auc"], abs=1e-3)
+    assert histogram["logloss"] == pytest.approx(exact["logloss"])
+
+    board = engine.execute(leaderboard(["logloss"], "survived", [("lr", "prediction", "probability")]))
+    assert board[0]["model"] == "lr"
+    assert board[0]["logloss"] == pytest.approx(exact["logloss"])
+
+
+def test_incremental_split_is_stable():
+    engine = LocalEngine()
+    shuffle_query = shuffle(["age", "sex", "time"], "survived", split_key=["rowid", "time"])
+    train_query, test_query = train_test_split(train_sample_rate=0.7)
+    rnd = random.Random(0)
+    rows = []
+    for day in [1, 2]:
+        rows.extend((len(rows) + i, rnd.randint(0, 1), rnd.uniform(1, 80), rnd.choice(["male", "female"]), day)
+                    for i in range(100))
+        engine.load_rows("titanic", ["rowid", "survived", "age", "sex", "time"], rows)
+        # Same as incremental vectorization, which appends only new rows of train data
+        engine.create_table("titanic_shuffled", shuffle_query, {"source": "titanic"})
+        engine.create_table("titanic_train", train_query, {"source": "titanic"})
+        engine.create_table("titanic_test", test_query, {"source": "titanic"})
+        if day == 1:
+            engine.create_table("train", "select * from titanic_train")
+        else:
+            engine.insert_into("train", "select * from titanic_train where time > (select max(time) from train)")
+
+    train = {(row["age"], row["time"]) for row in engine.fetch_table("train")}
+    test = {(row["age"], row["time"]) for row in engine.fetch_table("titanic_test")}
+    assert not train & test
+    assert len(train) + len(test) == 200
+    assert 100 < len(train) < 180
@@ -0,0 +1,65 @@
+import json
+import pytest
+from molehill.local.functions import murmurhash3_32, mhash, quantitative_features, categorical_features
+from molehill.local.functions import feature_hashing, add_bias, extract_feature, extract_weight
+from molehill.local.functions import rescale, zscore, sigmoid, amplify
+from molehill.local.functions import Auc, LogLoss, Percentile, TrainClassifier
+
+
+def test_murmurhash3_32():
+    assert murmurhash3_32("", 0) == 0
+    assert murmurhash3_32("hello", 0) == 0x248bfa47
+    assert murmurhash3_32("The quick brown fox jumps over the lazy dog") == 0x2fa826cd
+    assert 1 <= mhash("sex#male") <= 2 ** 24
+    # "age" is hashed to -1818542454 as a Java int, whose remainder by 1000 is -454
+    assert mhash("age", 1000) == 547
+    assert mhash("sex#male", 1000) == 1766647765 % 1000 + 1
+
+
+def test_features():
+    features = json.loads(quantitative_features('["age", "fare"]', 22, None))
+    assert features == ["age:22.0"]
+    assert json.loads(categorical_features('["sex", "embarked"]', "male", None)) == ["sex#male"]
+    assert json.loads(add_bias('["age:22.0"]')) == ["age:22.0", "0:1.0"]
+    assert json.loads(feature_hashing('["age:22.0", "sex#male"]')) == [f"{mhash('age')}:22.0", str(mhash("sex#male"))]
+    assert json.loads(feature_hashing('["sex#male"]', "-num_features 10")) == [str(mhash("sex#male", 10))]
+    assert extract_feature("age:22.0") == "age"
+    assert extract_weight("age:22.0") == 22.0
+    assert extract_weight("sex#male") == 1.0
+
+
+def test_scalers():
+    assert rescale(5.0, 0.0, 10.0) == 0.5
+    assert rescale(5.0, 1.0, 1.0) == 0.5
+    assert zscore(3.0, 1.0, 2.0) == 1.0
+    assert zscore(3.0, 1.0, 0.0) == 0.0
+    assert sigmoid(0.0) == 0.5
+    assert sigmoid(-1000.0) == 0.0
+
+
+def test_amplify():
+    assert json.loads(amplify(2, '["a:1.0"]', 1)) == [['["a:1.0"]', 1], ['["a:1.0"]', 1]]
+
+
+def _aggregate(aggregate, rows):
+    instance = aggregate()
+    for row in rows:
+        instance.step(*row)
+    return instance.finalize()
+
+
+def test_aggregates():
+    rows = [(0.9, 1), (0.8, 0), (0.7, 1), (0.2, 0)]
+    assert _aggregate(Auc, rows) == pytest.approx(0.75)
+    assert _aggregate(Auc, [(0.5, 1), (0.5, 0)]) == pytest.approx(0.5)
+    assert _aggregate(LogLoss, [(0.5, 1), (0.5, 0)]) == pytest.approx(0.6931471805599453)
+    assert _aggregate(Percentile, [(v, 0.5) for v in [3, 1, 2, None]]) == 2
+
+
+def test_train_classifier():
+    rows = [('["x:1.0"]', 1, "-iters 20"), ('["x:-1.0"]', 0, "-iters 20")] * 5
+    weights = dict(json.loads(_aggregate(TrainClassifier, rows)))
+    assert weights["x"] > 0
+
+    with pytest.raises(ValueError):
+        _aggregate(TrainClassifier, [('["x:1.0"]', 1, "-loss unknown")])
@@ -0,0 +1,118 @@
+import random
+import pytest
+from molehill.local import LocalEngine
+from molehill.model import train_classifier
+from molehill.preprocessing import vectorize
+
+np = pytest.importorskip("numpy")
+
+from molehill.local import NumpyEngine, load_columns, save_columns  # noqa: E402
+from molehill.local.numpy_engine import FeatureMatrix, compute_metric, train_linear  # noqa: E402
+
+
+def _rows(n=300, seed=0):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        sex = rnd.choice(["male", "female"])
+        survived = 1 if (sex == "female") ^ (rnd.random() < 0.2) else 0
+        age = rnd.uniform(1, 80) if rnd.random() > 0.1 else None
+        rows.append((i, survived, age, rnd.uniform(5, 100), sex, rnd.choice(["S", "C", "Q", None])))
+    return rows
+
+
+@pytest.fixture
+def config():
+    return {
+        "source": "titanic",
+        "train_sample_rate": 0.8,
+        "id_column": "rowid",
+        "target_column": "survived",
+        "numerical_columns": [{
+            "columns": ["age", "fare"],
+            "transformer": {
+                "imputer": {"strategy": "median", "phase": "train"},
+                "normalizer": {"strategy": "minmax", "phase": "train"}
+            }
+        }],
+        "categorical_columns": [{
+            "columns": ["sex", "embarked"],
+            "transformer": {"imputer": {"strategy": "constant", "phase": "train", "fill_value": "missing"}}
+        }],
+        "trainer": [{"name": "train_classifier", "model_table": "model_lr", "bias": True}],
+        "predictor": [{"name": "predict_classifier", "model_table": "model_lr", "output_table": "prediction_lr",
+                       "bias": True}],
+        "evaluator": {"metrics": ["auc", "logloss", "accuracy"]}
+    }
+
+
+def test_run_on_memory_mapped_columns(config, tmp_path):
+    names = ["rowid", "survived", "age", "fare", "sex", "embarked"]
+    save_columns(tmp_path / "titanic", dict(zip(names, zip(*_rows()))))
+    columns = load_columns(tmp_path / "titanic")
+    assert isinstance(columns["age"], np.memmap)
+
+    engine = NumpyEngine(config)
+    results = engine.run(columns)
+
+    assert list(results["prediction_lr"]) == ["auc", "logloss", "accuracy"]
+    assert results["prediction_lr"]["auc"] > 0.7
+    assert set(engine.models["model_lr"]) >= {"age", "fare", "sex#male", "embarked#missing", "0"}
+    train, test = engine.tables["titanic_train"], engine.tables["titanic_test"]
+    assert sorted(np.concatenate([train["rowid"], test["rowid"]])) == list(range(300))
+    age = columns["age"][train["rowid"]]
+    assert engine.stats["imputer"]["age"]["median"] == pytest.approx(np.nanmedian(age))
+    assert engine.stats["normalizer"]["age"]["max"] == pytest.approx(np.nanmax(age))
+    assert len(engine.tables["prediction_lr"]["probability"]) == len(test["rowid"])
+
+    batched = NumpyEngine(config, batch_size=7)
+    assert batched.run(columns)["prediction_lr"] == pytest.approx(results["prediction_lr"])
+    assert batched.models["model_lr"] == pytest.approx(engine.models["model_lr"])
+
+
+def test_unsupported_config(config):
+    config["trainer"].append({"name": "train_randomforest_classifier"})
+    config["evaluator"]["metrics"].append("fmeasure")
+    with pytest.raises(ValueError, match="train_randomforest_classifier, fmeasure"):
+        NumpyEngine(config)
+
+
+def test_train_linear_matches_local_engine():
+    rows = [(i, label, age, sex) for i, label, age, _, sex, _ in _rows(100) if age is not None]
+    engine = LocalEngine()
+    engine.load_rows("titanic", ["rowid", "survived", "age", "sex"], rows)
+    engine.create_table("train", vectorize("titanic", "survived", ["sex"], ["age"]))
+    option = "-iters 3 -eta0 0.05"
+    expected = {row["feature"]: row["weight"] for row in engine.execute(
+        train_classifier("train", "survived", option=option))}
+
+    # Each row has age and either of sex#female or sex#male
+    features = FeatureMatrix(["age", "sex#female", "sex#male"], np.arange(0, 2 * len(rows) + 1, 2),
+                             np.array([[0, 1 if row[3] == "female" else 2] for row in rows]).reshape(-1),
+                             np.array([[row[2], 1.0] for row in rows]).reshape(-1))
+    weights = train_linear(features, np.array([row[1] for row in rows]), option)
+
+    assert weights == pytest.approx(expected)
+
+
+def test_feature_matrix():
+    features = FeatureMatrix(["a", "b", "c"], np.array([0, 2, 2, 3]), np.array([0, 2, 1]), np.array([1.0, 2.0, 3.0]))
+
+    assert list(features.dot(np.array([1.0, 10.0, 100.0]))) == [201.0, 0.0, 30.0]
+    taken = features.take(np.array([2, 0]))
+    assert list(taken.indptr) == [0, 1, 3] and list(taken.indices) == [1, 0, 2]
+    renamed = features.rename(["x", "y", "x"]).transform(bias=True)
+    assert renamed.names == ["x", "y", "0"]
+    assert list(renamed.indptr) == [0, 2, 3, 5]
+    assert list(renamed.indices) == [0, 2, 2, 1, 2] and list(renamed.values) == [3.0, 1.0, 1.0, 3.0, 1.0]
+
+
+def test_compute_metric():
+    target = np.array([0, 0, 1, 1, 1])
+    probability = np.array([0.1, 0.6, 0.6, 0.8, 0.9])
+
+    assert compute_metric("auc", target, probability) == pytest.approx(5.5 / 6)
+    assert compute_metric("mae", target, probability) == pytest.approx((0.1 + 0.6 + 0.4 + 0.2 + 0.1) / 5)
+    assert compute_metric("accuracy", target, np.array([0, 1, 1, 1, 0])) == pytest.approx(0.4)
+    with pytest.raises(ValueError):
+        compute_metric("ndcg", target, probability)
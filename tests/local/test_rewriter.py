@@ -0,0 +1,56 @@
+import pytest
+from molehill.local import rewrite_query, substitute
+from molehill.model import train_classifier, predict_classifier
+
+
+def test_substitute():
+    query = "select ${td.last_results.age_mean} from ${source}"
+    params = {"source": "titanic", "td": {"last_results": {"age_mean": 1.5}}}
+    assert substitute(query, params) == "select 1.5 from titanic"
+    assert substitute(query, {"source": "titanic", "td.last_results.age_mean": 2}) == "select 2 from titanic"
+
+    with pytest.raises(KeyError):
+        substitute(query, {"source": "titanic"})
+
+
+def test_rewrite_expressions():
+    query = """\
+select
+  if(age > 1, 'a / b', "x") as "precision"
+  , cast(sex as string) as sex
+  , age / 2 as half
+from
+  titanic
+cluster by rand(43)
+;
+"""
+    expected = """\
+select
+  iif(age > 1, 'a / b', 'x') as "precision"
+  , cast(sex as text) as sex
+  , age * 1.0 / 2 as half
+from
+  titanic
+order by rand(43)"""
+    assert rewrite_query(query) == expected
+
+
+def test_rewrite_lateral_view():
+    query = rewrite_query(predict_classifier("test", "rowid", "model")[0])
+    assert "    , extract_feature(t2.value) as feature\n" in query
+    assert "    join json_each(features) t2\n" in query
+    assert "LATERAL VIEW" not in query
+
+
+def test_rewrite_posexplode():
+    query = "select\n  r.replicate\n  , x\nfrom\n  t\n  LATERAL VIEW posexplode(split(space(3), ' ')) r as replicate, x"
+    assert rewrite_query(query) == (
+        "select\n  r.key as replicate\n  , r.value as x\nfrom\n  t\n  join json_each(split(space(3), ' ')) r")
+
+
+def test_rewrite_udtf():
+    query = rewrite_query(train_classifier("train", "survived", oversample_n_times=2))
+    assert "from (select\n    amplify(2, features, survived) as udtf_rows\n  from\n    train) udtf\n" in query
+    assert "select json_extract(udtf_row.value, '$[0]') as feature, json_extract(udtf_row.value, '$[1]') as weight" \
+        in query
+    assert ") as (" not in query
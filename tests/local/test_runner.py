@@ -0,0 +1,181 @@
+import threading
+import time
+import pytest
+from molehill.local import LocalEngine, WorkflowRunner
+
+
+@pytest.fixture
+def workflow_dir(tmp_path):
+    query_dir = tmp_path / "queries"
+    query_dir.mkdir()
+    (query_dir / "copy.sql").write_text("select * from ${source}\n;\n")
+    (query_dir / "stats.sql").write_text("select count(1) > 0 as has_rows, max(x) as x_max from ${source}\n;\n")
+    (query_dir / "scale.sql").write_text("select x / ${td.last_results.x_max} as x from ${source}\n;\n")
+    (query_dir / "sources.sql").write_text("select 'a' as source union all select 'b' as source\n;\n")
+    return tmp_path
+
+
+class SleepExecutor:
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, query, config, params):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.seconds.get(config.get("create_table"), 0.01))
+        with self.lock:
+            self.running -= 1
+        return [{"value": config.get("create_table")}]
+
+
+def test_substitution_and_last_results(workflow_dir):
+    (workflow_dir / "test.dig").write_text("""
+_export:
+  source: numbers
++prepare:
+  +copy:
+    td>: queries/copy.sql
+    create_table: ${source}_copy
+  +stats:
+    td>: queries/stats.sql
+    source: numbers_copy
+    store_last_results: true
+  +scale:
+    td>: queries/scale.sql
+    create_table: ${source}_scaled
++check:
+  if>: ${td.last_results.has_rows}
+  _do:
+    +show:
+      echo>: "max: ${td.last_results.x_max}"
+""")
+    engine = LocalEngine()
+    engine.load_rows("numbers", ["x"], [(1,), (2,), (4,)])
+    messages = []
+    root = WorkflowRunner(workflow_dir / "test.dig", engine.run_task, output=messages.append).run()
+
+    assert [row["x"] for row in engine.fetch_table("numbers_scaled")] == [0.25, 0.5, 1.0]
+    assert messages[0] == "max: 4"
+    assert messages[1].startswith("Critical path:")
+    assert [task.name for task in root.leaves()] == [
+        "+test+prepare+copy", "+test+prepare+stats", "+test+prepare+scale", "+test+check^sub+show"]
+
+
+def test_parallel_limit_and_critical_path(workflow_dir):
+    (workflow_dir / "test.dig").write_text("""
++stage:
+  _parallel:
+    limit: 2
+  +fast:
+    td>: queries/copy.sql
+    source: a
+    create_table: fast
+  +slow:
+    td>: queries/copy.sql
+    source: a
+    create_table: slow
+  +other:
+    td>: queries/copy.sql
+    source: a
+    create_table: other
++last:
+  td>: queries/copy.sql
+  source: a
+  create_table: last
+""")
+    executor = SleepExecutor({"slow": 0.2})
+    root = WorkflowRunner(workflow_dir / "test.dig", executor, output=lambda _: None).run()
+
+    assert executor.max_running == 2
+    assert [task.name for task in root.critical_path()] == ["+test+stage+slow", "+test+last"]
+    assert root.elapsed < 0.4
+
+
+def test_worker_wait(workflow_dir):
+    (workflow_dir / "test.dig").write_text("""
++stage:
+  _parallel: true
+  +a:
+    td>: queries/copy.sql
+    source: a
+    create_table: a
+  +b:
+    td>: queries/copy.sql
+    source: b
+    create_table: b
+""")
+    runner = WorkflowRunner(workflow_dir / "test.dig", SleepExecutor({"a": 0.1, "b": 0.1}), max_workers=1,
+                            output=lambda _: None)
+    root = runner.run()
+
+    assert root.children[0].waited >= 0.09
+    assert "Waiting time by stage:" in runner.report()
+
+
+def test_for_each(workflow_dir):
+    (workflow_dir / "test.dig").write_text("""
++for_each_source:
+  td_for_each>: queries/sources.sql
+  _parallel: true
+  _do:
+    _export:
+      source: ${td.each.source}
+    +copy:
+      td>: queries/copy.sql
+      create_table: ${source}_copy
++for_each_suffix:
+  for_each>:
+    suffix: [x, y]
+  _do:
+    +copy:
+      td>: queries/copy.sql
+      source: a
+      create_table: a_${suffix}
++replace:
+  td_ddl>:
+  rename_tables:
+    - from: a_x
+      to: a_z
+""")
+    engine = LocalEngine()
+    engine.load_rows("a", ["x"], [(1,)])
+    engine.load_rows("b", ["x"], [(2,)])
+    WorkflowRunner(workflow_dir / "test.dig", engine.run_task, output=lambda _: None).run()
+
+    assert engine.fetch_table("a_copy") == [{"x": 1}]
+    assert engine.fetch_table("b_copy") == [{"x": 2}]
+    assert engine.fetch_table("a_y") == [{"x": 1}]
+    assert engine.fetch_table("a_z") == [{"x": 1}]
+
+
+@pytest.mark.parametrize("database", [":memory:", "file"])
+def test_parallel_local_engine(workflow_dir, database):
+    (workflow_dir / "queries" / "count.sql").write_text(
+        "with recursive c(x) as (select 1 union all select x + 1 from c where x < 300000)\n"
+        "select count(1) as n from c\n;\n")
+    (workflow_dir / "test.dig").write_text("""
++stage:
+  _parallel: true
+  +a:
+    td>: queries/count.sql
+    create_table: a
+  +b:
+    td>: queries/count.sql
+    create_table: b
+""")
+    engine = LocalEngine(str(workflow_dir / "test.db") if database == "file" else database)
+    root = WorkflowRunner(workflow_dir / "test.dig", engine.run_task, output=lambda _: None).run()
+
+    a, b = root.leaves()
+    assert engine.fetch_table("a") == engine.fetch_table("b") == [{"n": 300000}]
+    if database == ":memory:":
+        # Tasks run one by one, and a task waiting for the other isn't reported as running
+        first, second = sorted([a, b], key=lambda task: task.start)
+        assert second.start >= first.end
+        assert second.waited >= first.elapsed * 0.9
+    else:
+        assert a.start < b.end and b.start < a.end
@@ -1,4 +1,5 @@
 import molehill
+import pytest
 from molehill.model import train_classifier, train_regressor
 from molehill.model import predict_classifier, predict_regressor
 
@@ -148,6 +149,105 @@ from
 
         assert train_classifier("src_tbl", "target_val", bias=True, hashing=True) == ret_sql
 
+    def test_train_classifier_feature_ids(self):
+        ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with model as (
+  select
+    train_classifier(
+      features
+      , target_val
+    ) as (feature, weight)
+  from
+    src_tbl
+)
+-- DIGDAG_INSERT_LINE
+select
+  cast(feature as int) as feature
+  , weight
+from
+  model
+;
+"""
+
+        assert train_classifier("src_tbl", "target_val", feature_ids=True) == ret_sql
+
+    def test_train_classifier_previous_model(self):
+        ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with model as (
+  select
+    train_classifier(
+      features
+      , target_val
+    ) as (feature, weight)
+  from
+    src_tbl
+),
+blended as (
+  select
+    feature
+    , weight
+    , 1.0 as model_weight
+  from
+    model
+  union all
+  select
+    feature
+    , weight
+    , 0.3 as model_weight
+  from
+    model_tbl
+)
+-- DIGDAG_INSERT_LINE
+select
+  feature
+  , sum(weight * model_weight) / sum(model_weight) as weight
+from
+  blended
+group by
+  feature
+;
+"""
+
+        assert train_classifier("src_tbl", "target_val", previous_model_table="model_tbl", decay=0.3) == ret_sql
+
+    def test_train_classifier_segment(self):
+        ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with train_segmented as (
+  select
+    split(concat(cast(country as string), '^', concat_ws(concat('\\001', cast(country as string), '^'), add_bias(features))), '\\001') as features
+    , target_val
+  from
+    src_tbl
+  DISTRIBUTE BY country
+),
+model_segmented as (
+  select
+    train_classifier(
+      features
+      , target_val
+    ) as (feature, weight)
+  from
+    train_segmented
+)
+-- DIGDAG_INSERT_LINE
+select
+  substr(feature, 1, instr(feature, '^') - 1) as country
+  , substr(feature, instr(feature, '^') + 1) as feature
+  , weight
+from
+  model_segmented
+;
+"""
+
+        assert train_classifier("src_tbl", "target_val", bias=True, segment_column="country") == ret_sql
+
+    def test_train_classifier_segment_oversampling(self):
+        with pytest.raises(ValueError):
+            train_classifier("src_tbl", "target_val", oversample_n_times=2, segment_column="country")
+
 
 def test_train_regressor():
     ret_sql = f"""\
@@ -306,6 +406,100 @@ group by
         assert pred_sql == ret_sql
         assert pred_col == "total_weight"
 
+    def test_predict_classifier_feature_ids(self):
+        ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with features_exploded as (
+  select
+    id
+    , cast(extract_feature(fv) as int) as feature
+    , extract_weight(fv) as value
+  from
+    target_tbl t1
+    LATERAL VIEW explode(features) t2 as fv
+)
+-- DIGDAG_INSERT_LINE
+select
+  t1.id
+  , sigmoid(sum(m1.weight * t1.value)) as probability
+from
+  features_exploded t1
+  left outer join model_tbl m1
+    on (t1.feature = m1.feature)
+group by
+  t1.id
+;
+"""
+        pred_sql, pred_col = predict_classifier("target_tbl", "id", "model_tbl", feature_ids=True)
+        assert pred_sql == ret_sql
+        assert pred_col == "probability"
+
+    def test_predict_classifier_segment(self):
+        ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with features_exploded as (
+  select
+    id
+    , country
+    , extract_feature(fv) as feature
+    , extract_weight(fv) as value
+  from
+    target_tbl t1
+    LATERAL VIEW explode(features) t2 as fv
+)
+-- DIGDAG_INSERT_LINE
+select
+  t1.id
+  , sigmoid(sum(m1.weight * t1.value)) as probability
+from
+  features_exploded t1
+  left outer join model_tbl m1
+    on (t1.feature = m1.feature and cast(t1.country as string) = m1.country)
+group by
+  t1.id
+;
+"""
+        pred_sql, pred_col = predict_classifier("target_tbl", "id", "model_tbl", segment_column="country")
+        assert pred_sql == ret_sql
+        assert pred_col == "probability"
+
+    def test_predict_classifier_passthrough(self):
+        ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with features_exploded as (
+  select
+    id
+    , country
+    , target_val
+    , extract_feature(fv) as feature
+    , extract_weight(fv) as value
+  from
+    target_tbl t1
+    LATERAL VIEW explode(features) t2 as fv
+)
+-- DIGDAG_INSERT_LINE
+select
+  t1.id
+  , t1.target_val
+  , t1.country
+  , sigmoid(sum(m1.weight * t1.value)) as probability
+from
+  features_exploded t1
+  left outer join model_tbl m1
+    on (t1.feature = m1.feature and cast(t1.country as string) = m1.country)
+group by
+  t1.id, t1.target_val, t1.country
+;
+"""
+        pred_sql, pred_col = predict_classifier(
+            "target_tbl", "id", "model_tbl", segment_column="country", passthrough_columns=["target_val", "country"])
+        assert pred_sql == ret_sql
+        assert pred_col == "probability"
+
+    def test_predict_classifier_passthrough_predicted_column(self):
+        with pytest.raises(ValueError):
+            predict_classifier("target_tbl", "id", "model_tbl", passthrough_columns=["probability"])
+
 
 class TestPredictRegressor:
     def test_predict_regressor(self):
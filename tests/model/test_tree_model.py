@@ -296,3 +296,10 @@ from
         assert pred_sql == ret_sql
         assert pred_col == "target"
 
+
+    def test_predict_regressor_passthrough(self):
+        pred_sql, _ = predict_randomforest_regressor(
+            "target_tbl", "id", "model_tbl", passthrough_columns=["target_val"])
+        assert "    t.id\n    , t.target_val\n    , p.model_weight\n" in pred_sql
+        assert "group by\n    id, target_val\n" in pred_sql
+        assert "select\n  id\n  , target_val\n  , predicted.label\n" in pred_sql
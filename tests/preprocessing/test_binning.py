@@ -0,0 +1,47 @@
+import pytest
+from molehill.preprocessing.binning import Binner
+
+
+@pytest.fixture()
+def num_cols():
+    return ['num1', 'num2']
+
+
+def test_binner(num_cols):
+    ret_sql = """\
+case
+  when num1 is null then null
+  when num1 < ${td.last_results.num1_p25_train} then 0
+  when num1 < ${td.last_results.num1_p50_train} then 1
+  when num1 < ${td.last_results.num1_p75_train} then 2
+  else 3
+end as num1
+, case
+  when num2 is null then null
+  when num2 < ${td.last_results.num2_p25_train} then 0
+  when num2 < ${td.last_results.num2_p50_train} then 1
+  when num2 < ${td.last_results.num2_p75_train} then 2
+  else 3
+end as num2"""
+
+    binner = Binner(4, "train")
+    assert binner.percentiles() == [0.25, 0.5, 0.75]
+    assert binner.transform(num_cols) == ret_sql
+
+
+def test_binner_without_phase(num_cols):
+    ret_sql = """\
+case
+  when num1 is null then null
+  when num1 < ${td.last_results.num1_p33_3333} then 0
+  when num1 < ${td.last_results.num1_p66_6667} then 1
+  else 2
+end as num1"""
+
+    binner = Binner(3, None)
+    assert binner.transform(num_cols[:1]) == ret_sql
+
+
+def test_binner_invalid_n_bins():
+    with pytest.raises(ValueError):
+        Binner(1)
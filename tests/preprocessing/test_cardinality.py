@@ -0,0 +1,79 @@
+import pytest
+import molehill
+from molehill.preprocessing.cardinality import cardinality, profile, load_profile, choose_encoding
+
+
+def test_cardinality():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  array_max(array[approx_distinct(cat1), approx_distinct(cat2)]) as max_categorical_cardinality
+from
+  src_tbl
+;
+"""
+
+    assert cardinality('src_tbl', ['cat1', 'cat2']) == ret_sql
+
+
+def test_profile():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with aggregated as (
+  select
+    count(1) as num_rows
+    , approx_distinct(cat1) as cat1_cardinality
+    , count_if(cat1 is null) as cat1_nulls
+    , approx_distinct(num1) as num1_cardinality
+    , count_if(num1 is null) as num1_nulls
+  from
+    src_tbl
+)
+-- DIGDAG_INSERT_LINE
+select
+  t.column_name
+  , t.cardinality
+  , cast(t.nulls as double) / num_rows as null_rate
+  , num_rows
+from
+  aggregated
+  cross join unnest(
+    array['cat1', 'num1']
+    , array[cat1_cardinality, num1_cardinality]
+    , array[cat1_nulls, num1_nulls]
+  ) as t(column_name, cardinality, nulls)
+;
+"""
+
+    assert profile('src_tbl', ['cat1', 'num1']) == ret_sql
+
+
+def test_load_profile(tmp_path):
+    profile_file = tmp_path / "profile.csv"
+    profile_file.write_text("column_name,cardinality,null_rate,num_rows\ncat1,3,0.0,100\ncat2,50,0.25,100\n")
+
+    assert load_profile(profile_file) == {
+        "cat1": {"cardinality": 3, "null_rate": 0.0, "num_rows": 100},
+        "cat2": {"cardinality": 50, "null_rate": 0.25, "num_rows": 100}
+    }
+
+
+def test_choose_encoding():
+    column_profile = {
+        "sex": {"cardinality": 2},
+        "city": {"cardinality": 5000},
+        "user_agent": {"cardinality": 3000000}
+    }
+
+    encodings = choose_encoding(column_profile, ["sex", "city", "user_agent"], onehot_max_cardinality=10,
+                                dictionary_max_cardinality=10000)
+    assert encodings == {
+        "sex": ("onehot", 20),
+        "city": ("dictionary", 50000),
+        "user_agent": ("hashing", 2 ** 20)
+    }
+
+
+def test_choose_encoding_unknown_column():
+    with pytest.raises(ValueError):
+        choose_encoding({"sex": {"cardinality": 2}}, ["sex", "city"])
@@ -0,0 +1,81 @@
+import pytest
+import molehill
+from molehill.preprocessing.collapse import RareLevelCollapser, level_frequency
+
+
+@pytest.fixture()
+def cat_cols():
+    return ['cat1', 'cat2']
+
+
+def test_level_frequency(cat_cols):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with levels as (
+  select
+    t.column_name
+    , t.level
+    , count(1) as frequency
+  from
+    src_tbl
+    cross join unnest(
+      array['cat1', 'cat2']
+      , array[cast(cat1 as varchar), cast(cat2 as varchar)]
+    ) as t(column_name, level)
+  where
+    t.level is not null
+  group by
+    t.column_name, t.level
+)
+-- DIGDAG_INSERT_LINE
+select
+  column_name
+  , level
+  , frequency
+  , row_number() over (partition by column_name order by frequency desc) as level_rank
+from
+  levels
+;
+"""
+
+    assert level_frequency('src_tbl', cat_cols) == ret_sql
+
+
+def test_collapser(cat_cols):
+    ret_sql = """\
+case
+  when cat1 is null then null
+  when cast(cat1 as varchar) in (
+    select
+      level
+    from
+      freq_tbl
+    where
+      column_name = 'cat1'
+      and frequency >= 5
+      and level_rank <= 100
+  ) then cast(cat1 as varchar)
+  else '__other__'
+end as cat1
+, case
+  when cat2 is null then null
+  when cast(cat2 as varchar) in (
+    select
+      level
+    from
+      freq_tbl
+    where
+      column_name = 'cat2'
+      and frequency >= 5
+      and level_rank <= 100
+  ) then cast(cat2 as varchar)
+  else '__other__'
+end as cat2"""
+
+    collapser = RareLevelCollapser('freq_tbl', min_frequency=5, max_levels=100)
+    assert collapser.transform(cat_cols) == ret_sql
+
+
+def test_collapser_without_threshold():
+    with pytest.raises(ValueError):
+        RareLevelCollapser('freq_tbl')
@@ -0,0 +1,74 @@
+import pytest
+from molehill.preprocessing.feature_selection import feature_scores, select_features
+
+
+def test_feature_scores():
+    ret_sql = """\
+-- client: molehill/0.0.1
+with encoded as (
+  select
+    array(coalesce(num1, 0.0), coalesce(num2, 0.0)) as features
+    , array(if(target = 0, 1, 0), if(target = 1, 1, 0)) as label
+  from
+    src_tbl
+),
+aggregated as (
+  select
+    snr(features, label) as snr
+    , transpose_and_dot(label, features) as observed
+    , array_sum(features) as feature_count
+    , array_avg(label) as class_prob
+  from
+    encoded
+),
+expected as (
+  select
+    transpose_and_dot(class_prob, feature_count) as expected
+  from
+    aggregated
+),
+chi2_result as (
+  select
+    chi2(a.observed, e.expected) as v
+  from
+    aggregated a
+    cross join expected e
+)
+-- DIGDAG_INSERT_LINE
+select
+  a.snr[0] as num1_snr
+  , c.v.chi2[0] as num1_chi2
+  , a.snr[1] as num2_snr
+  , c.v.chi2[1] as num2_chi2
+from
+  aggregated a
+  cross join chi2_result c
+;
+"""
+    assert feature_scores("src_tbl", "target", ["num1", "num2"], ["snr", "chi2"]) == ret_sql
+
+
+def test_feature_scores_unknown_method():
+    with pytest.raises(ValueError):
+        feature_scores("src_tbl", "target", ["num1"], ["mutual_info"])
+
+
+def test_select_features():
+    ret_sql = """\
+-- client: molehill/0.0.1
+select
+  if(s.num1_std > 0.0 and s.num1_count >= s.num_rows * 0.05 and sc.num1_snr >= 0.1, 1, 0) as num1_selected
+  , if(s.cat1_cardinality > 1 and s.cat1_count >= s.num_rows * 0.05, 1, 0) as cat1_selected
+from
+  src_stats s
+  cross join src_scores sc
+;
+"""
+    assert select_features(
+        "src_stats", ["num1"], ["cat1"], max_null_rate=0.95, score_table="src_scores",
+        scored_columns=["num1"], min_scores={"snr": 0.1}) == ret_sql
+
+
+def test_select_features_without_score_table():
+    with pytest.raises(ValueError):
+        select_features("src_stats", ["num1"], [], min_scores={"snr": 0.1})
@@ -1,5 +1,6 @@
 import pytest
 from molehill.preprocessing.impute import Imputer
+from molehill.preprocessing.collapse import RareLevelCollapser
 
 
 @pytest.fixture()
@@ -30,6 +31,14 @@ coalesce(cast(cat1 as varchar), 'missing') as cat1
     assert categorical_imputer.transform(cat_cols) == ret_sql
 
 
+def test_categorical_imputer_hive(cat_cols):
+    ret_sql = """\
+coalesce(cast(cat1 as string), 'missing') as cat1"""
+
+    categorical_imputer = Imputer('constant', 'train', 'missing', categorical=True, dialect="hive")
+    assert categorical_imputer.transform(cat_cols[:1]) == ret_sql
+
+
 def test_numeric_imputer_without_phase(num_cols):
     ret_sql = """\
 coalesce(num1, ${td.last_results.num1_mean}) as num1
@@ -37,3 +46,30 @@ coalesce(num1, ${td.last_results.num1_mean}) as num1
 
     numeric_imputer = Imputer('mean', None)
     assert numeric_imputer.transform(num_cols) == ret_sql
+
+
+def test_categorical_imputer_with_collapser(cat_cols):
+    ret_sql = """\
+coalesce(case
+  when cat1 is null then null
+  when cast(cat1 as varchar) in (
+    select
+      level
+    from
+      freq_tbl
+    where
+      column_name = 'cat1'
+      and frequency >= 5
+  ) then cast(cat1 as varchar)
+  else 'other'
+end, 'missing') as cat1"""
+
+    collapser = RareLevelCollapser('freq_tbl', min_frequency=5, other_token='other')
+    categorical_imputer = Imputer('constant', 'train', 'missing', categorical=True)
+    assert categorical_imputer.transform(cat_cols[:1], collapser.expression()) == ret_sql
+
+
+def test_imputer_with_stats_alias(num_cols):
+    imputer = Imputer("median", None, stats_alias="st")
+    assert imputer.transform(num_cols) == "coalesce(num1, st.num1_median) as num1\n, coalesce(num2, st.num2_median) as num2"
+    assert imputer.required_stats(num_cols) == [("num1", "median", "whole"), ("num2", "median", "whole")]
@@ -89,3 +89,39 @@ exp(num1) - 1 as num1
     normalizer = Normalizer("log1p")
     assert normalizer.transform(num_cols) == ret_sql
     assert normalizer.invert_transform(num_cols) == inv_sql
+
+
+def test_normalizer_with_stats_alias(num_cols):
+    ret_sql = """\
+rescale(
+  num1
+  , st.num1_min_train
+  , st.num1_max_train
+) as num1"""
+
+    normalizer = Normalizer("minmax", "train", stats_alias="st")
+    assert normalizer.transform(num_cols[:1]) == ret_sql
+    assert normalizer.required_stats(num_cols[:1]) == [("num1", "min", "train"), ("num1", "max", "train")]
+    assert Normalizer("log1p").required_stats(num_cols) == []
+
+
+def test_normalizer_presto(num_cols):
+    minmax_sql = """\
+if(
+  st.num1_max_train = st.num1_min_train
+  , 0.5
+  , (cast(num1 as double) - st.num1_min_train) / (st.num1_max_train - st.num1_min_train)
+) as num1"""
+    standardize_sql = """\
+if(
+  st.num1_std = 0
+  , 0.0
+  , (cast(num1 as double) - st.num1_mean) / st.num1_std
+) as num1"""
+
+    assert Normalizer("minmax", "train", "st", dialect="presto").transform(num_cols[:1]) == minmax_sql
+    assert Normalizer("standardize", None, "st", dialect="presto").transform(num_cols[:1]) == standardize_sql
+    assert Normalizer("log1p", dialect="presto").transform(num_cols[:1]) == "ln(num1 + 1) as num1"
+
+    with pytest.raises(ValueError):
+        Normalizer("minmax", dialect="mysql")
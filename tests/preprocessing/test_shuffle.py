@@ -1,3 +1,4 @@
+import pytest
 import molehill
 from molehill.preprocessing import shuffle, train_test_split
 
@@ -38,6 +39,43 @@ from
     assert shuffle(['col1', 'col2'], 'target', 'src_tbl', 'id', stratify=True) == ret_sql
 
 
+def test_shuffle_presto():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  cast(uuid() as varchar) as id
+  , target
+  , col1
+  , random() as rnd
+from
+  src_tbl
+;
+"""
+
+    assert shuffle(['col1'], 'target', 'src_tbl', 'id', dialect="presto") == ret_sql
+    assert "order by random()) as rank_in_label" in shuffle(['col1'], 'target', stratify=True, dialect="presto")
+
+
+def test_shuffle_with_split_key():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  rowid() as id
+  , target
+  , col1
+  , (mhash(concat(coalesce(cast(key as string), ''), '\\t', coalesce(cast(time as string), ''))) - 1) / 16777216.0 as rnd
+from
+  src_tbl
+;
+"""
+
+    assert shuffle(['col1'], 'target', 'src_tbl', 'id', split_key=['key', 'time']) == ret_sql
+    assert "xxhash64(to_utf8(concat(coalesce(cast(key as varchar), ''))))" in shuffle(
+        ['col1'], 'target', split_key=['key'], dialect="presto")
+    with pytest.raises(ValueError):
+        shuffle(['col1'], 'target', stratify=True, split_key=['key'])
+
+
 def test_train_test_split():
     train_sql = f"""\
 -- client: molehill/{molehill.__version__}
@@ -0,0 +1,146 @@
+import pytest
+import molehill
+from molehill.preprocessing.target_encoding import TargetEncoder
+
+
+@pytest.fixture()
+def encoder():
+    return TargetEncoder("enc_tbl", "target", "id", smoothing=5, n_folds=3)
+
+
+def test_compute_encoding(encoder):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with prior as (
+  select
+    avg(cast(target as double)) as prior
+  from
+    src_tbl
+),
+exploded as (
+  select
+    t.column_name
+    , t.level
+    , mod(abs(from_big_endian_64(xxhash64(to_utf8(cast(s.id as varchar))))), 3) as fold
+    , cast(s.target as double) as target
+  from
+    src_tbl s
+    cross join unnest(
+      array['cat1']
+      , array[cast(s.cat1 as varchar)]
+    ) as t(column_name, level)
+  where
+    t.level is not null
+),
+fold_stats as (
+  select
+    column_name
+    , level
+    , fold
+    , sum(target) as target_sum
+    , count(1) as cnt
+  from
+    exploded
+  group by
+    column_name, level, fold
+),
+level_stats as (
+  select
+    column_name
+    , level
+    , fold
+    , target_sum
+    , cnt
+    , sum(target_sum) over (partition by column_name, level) as total_sum
+    , sum(cnt) over (partition by column_name, level) as total_cnt
+  from
+    fold_stats
+),
+encodings as (
+  select
+    column_name
+    , level
+    , fold
+    , (total_sum - target_sum + 5 * p.prior) / nullif(total_cnt - cnt + 5, 0) as encoding
+  from
+    level_stats
+    cross join prior p
+  union all
+  select
+    column_name
+    , level
+    , -1 as fold
+    , (sum(target_sum) + 5 * p.prior) / nullif(sum(cnt) + 5, 0) as encoding
+  from
+    fold_stats
+    cross join prior p
+  group by
+    column_name, level, p.prior
+  union all
+  select
+    '__prior__' as column_name
+    , cast(null as varchar) as level
+    , -1 as fold
+    , prior as encoding
+  from
+    prior
+)
+-- DIGDAG_INSERT_LINE
+select
+  column_name
+  , level
+  , fold
+  , encoding
+from
+  encodings
+;
+"""
+
+    assert encoder.compute_encoding("src_tbl", ["cat1"]) == ret_sql
+
+
+def test_transform_out_of_fold(encoder):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  t.id
+  , t.target
+  , coalesce(e0.encoding, p.encoding) as cat1
+  , t.num1
+from
+  src_tbl t
+  cross join (
+    select encoding from enc_tbl where column_name = '__prior__'
+  ) p
+  left outer join enc_tbl e0
+    on (e0.column_name = 'cat1' and e0.level = cast(t.cat1 as varchar) and e0.fold = mod(abs(from_big_endian_64(xxhash64(to_utf8(cast(t.id as varchar))))), 3))
+;
+"""
+
+    assert encoder.transform("src_tbl", ["cat1"], ["num1"], out_of_fold=True) == ret_sql
+
+
+def test_transform(encoder):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  t.id
+  , t.target
+  , coalesce(e0.encoding, p.encoding) as cat1
+  , t.num1
+from
+  src_tbl t
+  cross join (
+    select encoding from enc_tbl where column_name = '__prior__'
+  ) p
+  left outer join enc_tbl e0
+    on (e0.column_name = 'cat1' and e0.level = cast(t.cat1 as varchar) and e0.fold = -1)
+;
+"""
+
+    assert encoder.transform("src_tbl", ["cat1"], ["num1"]) == ret_sql
+
+
+def test_invalid_n_folds():
+    with pytest.raises(ValueError):
+        TargetEncoder("enc_tbl", "target", n_folds=1)
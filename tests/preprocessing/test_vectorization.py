@@ -1,6 +1,6 @@
 import pytest
 import molehill
-from molehill.preprocessing.vectorization import vectorize
+from molehill.preprocessing.vectorization import vectorize, build_feature_dictionary, merge_vectors
 
 
 @pytest.fixture()
@@ -332,3 +332,184 @@ from
 
     assert vectorize('src_tbl', 'target', cat_cols, num_cols,
                      dense=True, hashing=True, feature_cardinality=100) == ret_sql
+
+
+def test_vectorize_with_feature_dictionary(cat_cols, num_cols):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with vectorized as (
+  select
+    rowid
+    , array_concat(
+      quantitative_features(
+        array("num1", "num2")
+        , num1
+        , num2
+      ),
+      categorical_features(
+        array("cat1", "cat2", "cat3")
+        , cat1
+        , cat2
+        , cat3
+      )
+    ) as features
+    , target
+  from
+    src_tbl
+),
+features_exploded as (
+  select
+    t1.rowid
+    , t1.target
+    , extract_feature(fv) as feature
+    , extract_weight(fv) as value
+  from
+    vectorized t1
+    LATERAL VIEW OUTER explode(t1.features) t2 as fv
+)
+-- DIGDAG_INSERT_LINE
+select
+  t1.rowid
+  , collect_list(concat(cast(d.feature_id as string), ':', cast(t1.value as string))) as features
+  , t1.target
+from
+  features_exploded t1
+  left outer join dict_tbl d
+    on (t1.feature = d.feature)
+group by
+  t1.rowid, t1.target
+;
+"""
+
+    assert vectorize('src_tbl', 'target', cat_cols, num_cols, feature_dictionary="dict_tbl") == ret_sql
+
+
+def test_vectorize_with_feature_dictionary_and_hashing(cat_cols, num_cols):
+    with pytest.raises(ValueError):
+        vectorize('src_tbl', 'target', cat_cols, num_cols, hashing=True, feature_dictionary="dict_tbl")
+
+
+def test_build_feature_dictionary(cat_cols):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with feature_names as (
+  select
+    extract_feature(fv) as feature
+  from
+    src_tbl t1
+    LATERAL VIEW explode(
+      categorical_features(
+        array("cat1", "cat2", "cat3")
+        , cat1
+        , cat2
+        , cat3
+      )
+    ) t2 as fv
+  group by
+    extract_feature(fv)
+)
+-- DIGDAG_INSERT_LINE
+select
+  feature
+  , row_number() over (order by feature) as feature_id
+from
+  feature_names
+;
+"""
+
+    assert build_feature_dictionary('src_tbl', categorical_columns=cat_cols) == ret_sql
+
+
+def test_vectorize_with_hashed_columns(cat_cols, num_cols):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  rowid
+  , array_concat(
+    quantitative_features(
+      array("num1", "num2")
+      , num1
+      , num2
+    ),
+    categorical_features(
+      array("cat1", "cat2", "cat3")
+      , cat1
+      , mhash(cat2, 1024)
+      , cat3
+    )
+  ) as features
+  , target
+from
+  src_tbl
+;
+"""
+
+    assert vectorize('src_tbl', 'target', cat_cols, num_cols, hashed_columns={"cat2": 1024}) == ret_sql
+
+
+def test_vectorize_dense_with_hashed_columns(cat_cols, num_cols):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  rowid
+  , array(num1, num2, mhash(cat1, 30), mhash(cat2, 1024), mhash(cat3, 30)) as features
+  , target
+from
+  src_tbl
+;
+"""
+
+    hashed_columns = {"cat1": 30, "cat2": 1024, "cat3": 30}
+    assert vectorize('src_tbl', 'target', cat_cols, num_cols, dense=True, hashed_columns=hashed_columns) == ret_sql
+
+
+def test_vectorize_with_selection_table(cat_cols, num_cols):
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  rowid
+  , array_concat(
+    quantitative_features(
+      array("num1", "num2")
+      , if(fs.num1_selected = 1, num1, null)
+      , if(fs.num2_selected = 1, num2, null)
+    ),
+    categorical_features(
+      array("cat1", "cat2", "cat3")
+      , if(fs.cat1_selected = 1, cat1, null)
+      , mhash(if(fs.cat2_selected = 1, cat2, null), 1024)
+      , if(fs.cat3_selected = 1, cat3, null)
+    )
+  ) as features
+  , target
+from
+  src_tbl
+  cross join src_selected_features fs
+;
+"""
+
+    assert vectorize('src_tbl', 'target', cat_cols, num_cols, hashed_columns={"cat2": 1024},
+                     selection_table="src_selected_features") == ret_sql
+
+
+def test_merge_vectors():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  t0.rowid
+  , add_bias(
+    array_concat(
+      t0.features,
+      t1.features
+    )
+  ) as features
+  , t0.target
+from
+  train_chunk_0 t0
+  join train_chunk_1 t1
+    on (t0.rowid = t1.rowid)
+;
+"""
+
+    assert merge_vectors('train', 2, 'target', bias=True) == ret_sql
+    assert "  , t0.target\n  , t0.country\nfrom" in merge_vectors('train', 2, 'target', passthrough_columns=['country'])
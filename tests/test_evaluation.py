@@ -1,6 +1,6 @@
 import pytest
 import molehill
-from molehill.evaluation import evaluate
+from molehill.evaluation import evaluate, leaderboard, evaluate_slices, evaluate_thresholds, best_threshold
 
 
 def test_evaluate_with_auc():
@@ -26,6 +26,65 @@ from
     assert evaluate(metrics, 'target', 'probability', 'actual', 'pred', 'id') == ret_sql
 
 
+def test_evaluate_with_histogram_auc():
+    metrics = ['auc', 'pr_auc', 'logloss']
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with histogram as (
+  select
+    least(floor(p.probability * 100), 99) as bin
+    , sum(if(t.target = 1, 1, 0)) as pos
+    , sum(if(t.target = 1, 0, 1)) as neg
+  from
+    pred p
+  join
+    actual t on (p.id = t.id)
+  group by
+    least(floor(p.probability * 100), 99)
+),
+cumulative as (
+  select
+    pos
+    , neg
+    , sum(pos) over (order by bin desc rows between unbounded preceding and current row) as cum_pos
+    , sum(neg) over (order by bin desc rows between unbounded preceding and current row) as cum_neg
+  from
+    histogram
+),
+curve as (
+  select
+    sum(neg * (cum_pos - 0.5 * pos)) / (sum(pos) * sum(neg)) as auc
+    , sum(pos * cast(cum_pos as double) / (cum_pos + cum_neg)) / sum(pos) as pr_auc
+  from
+    cumulative
+),
+scores as (
+  select
+    logloss(p.probability, t.target) as logloss
+  from
+    pred p
+  join
+    actual t on (p.id = t.id)
+)
+-- DIGDAG_INSERT_LINE
+select
+  c.auc
+  , c.pr_auc
+  , s.logloss
+from
+  curve c
+  cross join scores s
+;
+"""
+    assert evaluate(metrics, 'target', 'probability', 'actual', 'pred', 'id', auc_bins=100) == ret_sql
+
+
+def test_evaluate_pr_auc_default_bins():
+    query = evaluate(['pr_auc'], 'target', 'probability')
+    assert "least(floor(p.probability * 10000), 9999) as bin" in query
+    assert "scores" not in query
+
+
 def test_evaluate_with_logloss():
     metrics = ['logloss']
     ret_sql = f"""\
@@ -77,3 +136,257 @@ def test_evaluate_unknown_measure():
     metrics = ['unknown_metrics']
     with pytest.raises(ValueError):
         evaluate(metrics, 'target', 'predicted')
+
+
+def test_leaderboard():
+    predictions = [('lr', 'prediction_lr', 'probability'), ('rf', 'prediction_rf', 'probability')]
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with predictions as (
+  select
+    'lr' as model
+    , rowid
+    , probability as predicted
+  from
+    prediction_lr
+  union all
+  select
+    'rf' as model
+    , rowid
+    , probability as predicted
+  from
+    prediction_rf
+),
+histogram as (
+  select
+    p.model
+    , count(1) as n
+    , sum(if(t.target = 1, 1, 0)) as pos
+    , sum(if(t.target = 1, 0, 1)) as neg
+    , sum(-(t.target * ln(greatest(least(p.predicted, 1.0 - 1e-15), 1e-15)) + (1 - t.target) * ln(1 - greatest(least(p.predicted, 1.0 - 1e-15), 1e-15)))) as log_loss
+    , sum(pow(p.predicted - t.target, 2)) as squared_error
+    , sum(abs(p.predicted - t.target)) as absolute_error
+    , sum(t.target) as target_sum
+    , sum(pow(t.target, 2)) as target_squared_sum
+    , sum(if(p.predicted = t.target and t.target = 1, 1, 0)) as true_positive
+    , sum(if(p.predicted = 1, 1, 0)) as predicted_positive
+  from
+    predictions p
+  join
+    test t on (p.rowid = t.rowid)
+  group by
+    p.model
+)
+-- DIGDAG_INSERT_LINE
+select
+  model
+  , sum(log_loss) / sum(n) as logloss
+  , sqrt(sum(squared_error) / sum(n)) as rmse
+  , 1 - sum(squared_error) / (sum(target_squared_sum) - pow(sum(target_sum), 2) / sum(n)) as r2
+from
+  histogram
+group by
+  model
+;
+"""
+    assert leaderboard(['logloss', 'rmse', 'r2'], 'target', predictions) == ret_sql
+
+
+def test_leaderboard_with_auc():
+    query = leaderboard(['auc', 'pr_auc'], 'target', [('lr', 'prediction_lr', 'probability')], auc_bins=100)
+    assert "least(floor(p.predicted * 100), 99) as bin" in query
+    assert "over (partition by model order by bin desc" in query
+    assert "from\n  cumulative\ngroup by\n  model" in query
+
+
+def test_leaderboard_unsupported_metric():
+    with pytest.raises(ValueError):
+        leaderboard(['fmeasure'], 'target', [('lr', 'prediction_lr', 'predicted')])
+
+
+def test_evaluate_without_target_table():
+    metrics = ['logloss', 'recall']
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  logloss(p.probability, p.target) as logloss
+  , cast(sum(if(p.predicted = p.target and p.target = 1, 1, 0)) as double)/sum(if(p.target = 1, 1, 0)) as recall
+from
+  prediction p
+;
+"""
+    assert evaluate(metrics, 'target', 'predicted', target_table=None) == ret_sql
+
+
+def test_evaluate_auc_bins_without_target_table():
+    query = evaluate(['auc', 'mae'], 'target', 'probability', target_table=None, auc_bins=100)
+    assert "join\n" not in query
+    assert "sum(if(p.target = 1, 1, 0)) as pos" in query
+    assert "mae(p.probability, p.target) as mae" in query
+
+
+def test_evaluate_auc_bins_with_precision():
+    query = evaluate(['auc', 'precision'], 'target', 'probability', target_table=None, auc_bins=100)
+    # A double-quoted name is a string literal in Hive
+    assert "  c.auc\n  , s.`precision`\nfrom" in query
+
+
+def test_leaderboard_without_target_table():
+    query = leaderboard(['mse'], 'target', [('lr', 'prediction_lr', 'probability')], target_table=None)
+    assert "    , target\n    , probability as predicted\n" in query
+    assert "join" not in query
+    assert "sum(pow(p.predicted - p.target, 2)) as squared_error" in query
+
+
+def test_evaluate_thresholds():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with histogram as (
+  select
+    least(floor(p.probability * 10), 9) as bin
+    , count(1) as n
+    , sum(if(t.target = 1, 1, 0)) as pos
+    , sum(p.probability) as sum_probability
+  from
+    prediction p
+  join
+    test t on (p.rowid = t.rowid)
+  group by
+    least(floor(p.probability * 10), 9)
+),
+cumulative as (
+  select
+    bin
+    , n
+    , pos
+    , sum_probability
+    , sum(n) over (order by bin desc rows between unbounded preceding and current row) as cum_n
+    , sum(pos) over (order by bin desc rows between unbounded preceding and current row) as tp
+    , sum(n - pos) over (order by bin desc rows between unbounded preceding and current row) as fp
+    , sum(n) over () as total
+    , sum(pos) over () as total_pos
+  from
+    histogram
+)
+-- DIGDAG_INSERT_LINE
+select
+  cast(bin as double) / 10 as threshold
+  , n
+  , cast(tp as double) / (tp + fp) as "precision"
+  , cast(tp as double) / total_pos as recall
+  , 2.0 * tp / (cum_n + total_pos) as f1
+  , cast(tp + (total - total_pos) - fp as double) / total as accuracy
+  , sum_probability / n as mean_probability
+  , cast(pos as double) / n as positive_rate
+  , cast(cum_n as double) / total as depth
+  , (cast(tp as double) / cum_n) / (cast(total_pos as double) / total) as lift
+from
+  cumulative
+order by
+  threshold
+;
+"""
+    assert evaluate_thresholds('target', bins=10) == ret_sql
+
+
+def test_best_threshold():
+    query = best_threshold('prediction_thresholds', 'precision')
+    assert "  threshold\n  , `precision`\n" in query
+    assert "from\n  prediction_thresholds\norder by\n  `precision` desc, threshold\nlimit 1\n" in query
+
+    with pytest.raises(ValueError):
+        best_threshold('prediction_thresholds', 'auc')
+
+
+def test_evaluate_bootstrap():
+    query = evaluate(['auc', 'logloss'], 'target', 'probability', bootstrap=200, confidence=0.9)
+    assert "LATERAL VIEW posexplode(split(space(200), ' ')) r as replicate, x" in query
+    assert "if(replicate = 0, 1, case when uniform < 0.367879 then 0 " in query
+    assert "sum(if(p.target = 1, p.weight, 0)) as pos" in query
+    assert "partition by replicate order by bin desc" in query
+    assert "  max(if(replicate = 0, auc, null)) as auc\n" in query
+    assert "percentile_approx(if(replicate > 0, logloss, null), 0.05) as logloss_lower" in query
+    assert "percentile_approx(if(replicate > 0, logloss, null), 0.95) as logloss_upper" in query
+
+
+def test_evaluate_bootstrap_precision():
+    query = evaluate(['precision'], 'target', 'predicted', bootstrap=100)
+    assert "  max(if(replicate = 0, `precision`, null)) as `precision`\n" in query
+    assert "percentile_approx(if(replicate > 0, `precision`, null), 0.025) as precision_lower" in query
+
+
+def test_evaluate_bootstrap_unsupported_metric():
+    with pytest.raises(ValueError):
+        evaluate(['fmeasure'], 'target', 'predicted', bootstrap=100)
+    with pytest.raises(ValueError):
+        evaluate(['auc'], 'target', 'probability', bootstrap=100, confidence=1.0)
+
+
+def test_evaluate_slices():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with labeled as (
+  select
+    t.country
+    , t.device
+    , p.predicted as predicted
+    , t.target as target
+  from
+    prediction p
+  join
+    test t on (p.rowid = t.rowid)
+),
+histogram as (
+  select
+    case when grouping(country) = 0 then 'country' when grouping(device) = 0 then 'device' else 'overall' end as slice_column
+    , case when grouping(country) = 0 then cast(country as string) when grouping(device) = 0 then cast(device as string) end as slice_value
+    , count(1) as n
+    , sum(if(p.target = 1, 1, 0)) as pos
+    , sum(if(p.target = 1, 0, 1)) as neg
+    , sum(-(p.target * ln(greatest(least(p.predicted, 1.0 - 1e-15), 1e-15)) + (1 - p.target) * ln(1 - greatest(least(p.predicted, 1.0 - 1e-15), 1e-15)))) as log_loss
+    , sum(pow(p.predicted - p.target, 2)) as squared_error
+    , sum(abs(p.predicted - p.target)) as absolute_error
+    , sum(p.target) as target_sum
+    , sum(pow(p.target, 2)) as target_squared_sum
+    , sum(if(p.predicted = p.target and p.target = 1, 1, 0)) as true_positive
+    , sum(if(p.predicted = 1, 1, 0)) as predicted_positive
+  from
+    labeled p
+  group by
+    country, device
+    grouping sets ((country), (device), ())
+),
+sliced_metrics as (
+  select
+    slice_column
+    , slice_value
+    , sum(n) as num_rows
+    , map('accuracy', cast(sum(true_positive) as double) / sum(n), 'mae', sum(absolute_error) / sum(n)) as metrics
+  from
+    histogram
+  group by
+    slice_column, slice_value
+)
+-- DIGDAG_INSERT_LINE
+select
+  slice_column
+  , slice_value
+  , num_rows
+  , m.metric
+  , m.value
+from
+  sliced_metrics
+  LATERAL VIEW explode(metrics) m as metric, value
+;
+"""
+    assert evaluate_slices(['accuracy', 'mae'], 'target', 'predicted', ['country', 'device']) == ret_sql
+
+
+def test_evaluate_slices_with_auc():
+    query = evaluate_slices(['auc'], 'target', 'probability', ['country'], target_table=None, auc_bins=10)
+    assert "    p.country\n" in query
+    assert "grouping sets ((country, bin), (bin))" in query
+    assert "partition by slice_column, slice_value order by bin desc" in query
+
+    with pytest.raises(ValueError):
+        evaluate_slices(['fmeasure'], 'target', 'predicted', ['country'])
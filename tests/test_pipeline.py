@@ -1,12 +1,29 @@
 import filecmp
 import pytest
 import os
+import yaml
 from pathlib import Path
 from molehill.pipeline import Pipeline
 
 TEST_DATA_DIR = Path(__file__).resolve().parent / 'resources'
 
 
+def load_config(file_name):
+    with (TEST_DATA_DIR / file_name).open() as f:
+        return yaml.load(f, Loader=yaml.Loader)
+
+
+def dump_workflow(config, mode="train"):
+    config_file = Path("config.yml")
+    config_file.write_text(yaml.dump(config, default_flow_style=False))
+    dig_file = Path("output.dig")
+
+    pipeline = Pipeline()
+    pipeline.dump_pipeline(config_file, dig_file, False, mode)
+    with dig_file.open() as f:
+        return yaml.load(f, Loader=yaml.Loader)
+
+
 @pytest.fixture(scope='function', autouse=True)
 def change_dir(tmp_path):
     current_dir = os.curdir
@@ -80,3 +97,475 @@ def test_dump_yaml_randomforest():
                == (Path('queries') / diff_file).read_text()
 
     assert len(dc.diff_files) == 0
+
+
+def test_dump_yaml_feature_ids():
+    config = load_config("titanic_pipeline.yml")
+    config["vectorizer"]["feature_ids"] = True
+
+    workflow = dump_workflow(config)
+    vectorization = workflow["+vectorization"]
+    assert list(vectorization.keys()) == ["+feature_dictionary", "+vectorize"]
+    assert vectorization["+feature_dictionary"]["source"] == "titanic_norm_train"
+    assert vectorization["+feature_dictionary"]["create_table"] == "feature_dictionary"
+    assert "left outer join feature_dictionary d" in Path("queries/vectorize.sql").read_text()
+    assert "cast(feature as int) as feature" in Path("queries/train_classifier.sql").read_text()
+    assert "cast(extract_feature(fv) as int) as feature" in Path("queries/predict_classifier.sql").read_text()
+
+
+def test_dump_yaml_profile_task():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["vectorizer"]["categorical_encoding"] = {"profile_file": "titanic_profile.csv"}
+
+    workflow = dump_workflow(config)
+    assert workflow["+profile"]["+compute"]["create_table"] == "titanic_profile"
+    assert workflow["+profile"]["+download"]["download_file"] == "titanic_profile.csv"
+    assert "+compute_cardinality" in workflow
+
+
+def test_dump_yaml_with_profile():
+    Path("titanic_profile.csv").write_text(
+        "column_name,cardinality,null_rate,num_rows\n"
+        "embarked,4,0.0,1000\nsex,2,0.0,1000\npclass,3,0.0,1000\n")
+    config = load_config("titanic_pipeline_rf.yml")
+    config["vectorizer"]["categorical_encoding"] = {"profile_file": "titanic_profile.csv"}
+
+    workflow = dump_workflow(config)
+    assert "+profile" not in workflow
+    assert "+compute_cardinality" not in workflow
+    assert "feature_cardinality" not in workflow["+vectorization"]["+train_dense"]
+    assert "array(age, fare, mhash(embarked, 40), mhash(sex, 20), mhash(pclass, 30)) as features" \
+        in Path("queries/vectorize_dense.sql").read_text()
+
+
+def test_dump_yaml_with_profile_without_hashing():
+    Path("titanic_profile.csv").write_text(
+        "column_name,cardinality,null_rate,num_rows\n"
+        "embarked,4,0.0,1000\nsex,2,0.0,1000\npclass,3,0.0,1000\n")
+    config = load_config("titanic_pipeline_rf.yml")
+    config["vectorizer"]["categorical_encoding"] = {"profile_file": "titanic_profile.csv"}
+    config["vectorizer"]["dense"] = {"hashing": False}
+
+    workflow = dump_workflow(config)
+    assert "+compute_cardinality" not in workflow
+    assert workflow["+vectorization"]["+train_dense"]["feature_cardinality"] == 40
+    assert "array(age, fare, embarked, sex, pclass) as features" in Path("queries/vectorize_dense.sql").read_text()
+
+
+def test_dump_yaml_with_profile_dictionary_and_hashing():
+    Path("titanic_profile.csv").write_text(
+        "column_name,cardinality,null_rate,num_rows\n"
+        "embarked,2000000,0.0,1000\nsex,2000,0.0,1000\npclass,3,0.0,1000\n")
+    config = load_config("titanic_pipeline.yml")
+    config["vectorizer"]["categorical_encoding"] = {"profile_file": "titanic_profile.csv"}
+    config["trainer"] = config["trainer"][:1]
+    config["predictor"] = config["predictor"][:1]
+
+    workflow = dump_workflow(config)
+    assert "+feature_dictionary" in workflow["+vectorization"]
+    # Hashed features are looked up with the same names as vectorized ones
+    assert "  , mhash(embarked, 1048576)\n" in Path("queries/vectorize.sql").read_text()
+    assert "  , mhash(embarked, 1048576)\n" in Path("queries/feature_dictionary.sql").read_text()
+
+
+def test_dump_yaml_collapser():
+    config = load_config("titanic_pipeline.yml")
+    config["categorical_columns"][0]["transformer"]["collapser"] = {"min_frequency": 5}
+
+    workflow = dump_workflow(config)
+    compute_stats = workflow["+preparation"]["+imputation"]["+compute_stats"]
+    assert compute_stats["+level_frequency"]["source"] == "titanic_train"
+    assert compute_stats["+level_frequency"]["create_table"] == "titanic_level_frequency"
+    impute_query = Path("queries/impute.sql").read_text()
+    assert "titanic_level_frequency" in impute_query
+    assert "else '__other__'" in impute_query
+
+
+def test_dump_yaml_target_encoder():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["categorical_columns"][0]["transformer"]["target_encoder"] = {"smoothing": 20, "n_folds": 5}
+
+    workflow = dump_workflow(config)
+    target_encoding = workflow["+preparation"]["+target_encoding"]
+    assert target_encoding["+compute_encoding"]["source"] == "titanic_imputed_train"
+    assert target_encoding["+compute_encoding"]["create_table"] == "titanic_target_encoding"
+    assert target_encoding["+execute"]["+train"]["td>"] == "queries/target_encode_oof.sql"
+    assert workflow["+vectorization"]["+train"]["source"] == "titanic_encoded_train"
+    assert "-attrs Q,Q,Q,Q,Q" in Path("queries/train_randomforest_classifier.sql").read_text()
+
+
+def test_dump_yaml_binner():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["numerical_columns"][0]["transformer"]["binner"] = {"n_bins": 4, "phase": "train"}
+
+    workflow = dump_workflow(config)
+    assert workflow["+preparation"]["+normalization"]["+execute"]["+train"]["create_table"] == "titanic_norm_train"
+    assert "approx_percentile(age, 0.75) as age_p75" in Path("queries/stats.sql").read_text()
+    assert "train.age_p75 as age_p75_train" in Path("queries/combine_stats.sql").read_text()
+    assert "when age < ${td.last_results.age_p25_train} then 0" in Path("queries/normalize.sql").read_text()
+
+
+def test_dump_yaml_feature_selection():
+    config = load_config("titanic_pipeline.yml")
+    config["feature_selection"] = {"max_null_rate": 0.9, "min_std": 0.0, "scores": {"snr": 0.01}}
+
+    workflow = dump_workflow(config)
+    assert list(workflow.keys()).index("+feature_selection") == list(workflow.keys()).index("+vectorization") - 1
+    feature_selection = workflow["+feature_selection"]
+    assert "+compute_stats" not in feature_selection
+    assert feature_selection["+compute_scores"]["source"] == "titanic_norm_train"
+    assert feature_selection["+select"]["create_table"] == "titanic_selected_features"
+    assert "count(age) as age_count" in Path("queries/stats.sql").read_text()
+    assert "s.age_std > 0.0 and s.age_count >= s.num_rows * 0.1 and sc.age_snr >= 0.01" \
+        in Path("queries/select_features.sql").read_text()
+    assert "cross join titanic_selected_features fs" in Path("queries/vectorize.sql").read_text()
+
+
+def test_dump_yaml_feature_selection_without_imputation():
+    config = load_config("titanic_pipeline.yml")
+    for cols in config["numerical_columns"] + config["categorical_columns"]:
+        cols.pop("transformer", None)
+    config["feature_selection"] = {"max_null_rate": 0.9}
+
+    workflow = dump_workflow(config)
+    feature_selection = workflow["+feature_selection"]
+    assert list(feature_selection.keys()) == ["+compute_stats", "+select"]
+    assert feature_selection["+compute_stats"]["source"] == "titanic_train"
+    assert feature_selection["+compute_stats"]["create_table"] == "titanic_selection_stats"
+
+
+def test_dump_yaml_stats_table():
+    config = load_config("titanic_pipeline.yml")
+    config["stats"] = {"mode": "table"}
+
+    workflow = dump_workflow(config)
+    imputation = workflow["+preparation"]["+imputation"]
+    assert imputation["+compute_stats"]["+whole"]["create_table"] == "titanic_stats"
+    assert imputation["+combine_train_test_stats"]["create_table"] == "titanic_combined_stats"
+    assert "store_last_results" not in imputation["+combine_train_test_stats"]
+    normalize_query = Path("queries/normalize.sql").read_text()
+    assert "td.last_results" not in normalize_query
+    assert "from\n    titanic_imputed_combined_stats" in normalize_query
+    assert "cross join stats st" in normalize_query
+    assert "coalesce(age, st.age_median) as age" in Path("queries/impute_whole.sql").read_text()
+
+
+def test_dump_yaml_chunking():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["chunking"] = {"threshold": 3, "chunk_size": 2}
+    config["vectorizer"]["bias"] = True
+
+    workflow = dump_workflow(config)
+    compute_stats = workflow["+preparation"]["+imputation"]["+compute_stats"]
+    assert compute_stats["+whole_0"]["create_table"] == "titanic_stats_chunk_0"
+    assert compute_stats["+train_0"]["create_table"] == "${source}_stats_chunk_0"
+    assert "${source}_train_stats_chunk_0" in Path("queries/combine_stats.sql").read_text()
+
+    vectorization = workflow["+vectorization"]
+    assert list(vectorization.keys()) == ["+chunks", "+merge"]
+    assert vectorization["+chunks"]["+train_2"]["create_table"] == "train_chunk_2"
+    assert vectorization["+chunks"]["+train_dense_1"]["td>"] == "queries/vectorize_dense_chunk_1.sql"
+    assert vectorization["+merge"]["+train_dense"]["table"] == "train_dense"
+    assert not Path("queries/vectorize.sql").exists()
+    assert "add_bias(" in Path("queries/vectorize_merge.sql").read_text()
+    assert "add_bias(" not in Path("queries/vectorize_dense_merge.sql").read_text()
+    assert "add_bias(" not in Path("queries/vectorize_chunk_0.sql").read_text()
+
+
+def test_dump_yaml_chunking_segment():
+    config = load_config("titanic_pipeline.yml")
+    config["chunking"] = {"threshold": 3, "chunk_size": 2}
+    config["segment_column"] = "country"
+    config["trainer"] = config["trainer"][:1]
+    config["predictor"] = config["predictor"][:1]
+
+    dump_workflow(config)
+    assert "  , country\nfrom" in Path("queries/vectorize_chunk_0.sql").read_text()
+    assert "  , t0.country\nfrom" in Path("queries/vectorize_merge.sql").read_text()
+    assert "DISTRIBUTE BY country" in Path("queries/train_classifier.sql").read_text()
+
+
+def test_dump_yaml_chunking_with_last_results():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["chunking"] = {"threshold": 3, "chunk_size": 2}
+    config["stats"] = {"mode": "last_results"}
+
+    with pytest.raises(ValueError):
+        dump_workflow(config)
+
+
+def test_dump_yaml_incremental_stats():
+    config = load_config("titanic_pipeline.yml")
+    config["stats"] = {"incremental": {"partition": "td_time_string(time, 'd!')"}}
+
+    workflow = dump_workflow(config)
+    whole = workflow["+preparation"]["+imputation"]["+compute_stats"]["+whole"]
+    assert list(whole.keys()) == ["+check_history", "+update_history", "+merge"]
+    assert whole["+update_history"]["_do"]["insert_into"] == "titanic_stats_history"
+    assert whole["+update_history"]["_else_do"]["create_table"] == "titanic_stats_history"
+    assert whole["+merge"]["create_table"] == "titanic_stats"
+    assert "td_time_string(time, 'd!') < '${session_date}'" in Path("queries/stats_history_init.sql").read_text()
+    # An empty history stored by the init run shouldn't stop appending partitions
+    assert "> coalesce((select max(partition_key) from titanic_stats_history), '')" \
+        in Path("queries/stats_history_append.sql").read_text()
+    assert "+check_history" not in workflow["+preparation"]["+normalization"]["+compute_stats"]["+whole"]
+
+
+def test_dump_yaml_incremental():
+    config = load_config("titanic_pipeline.yml")
+    config["incremental"] = {"time_column": "time", "decay": 0.3}
+    config["trainer"] = config["trainer"][:1]
+    config["predictor"] = config["predictor"][:1]
+
+    workflow = dump_workflow(config)
+    shuffle_query = Path("queries/shuffle.sql").read_text()
+    assert "  , time\n" in shuffle_query
+    assert "(mhash(concat(coalesce(cast(survived as string), '')" in shuffle_query
+    assert "cluster by" not in shuffle_query
+
+    vectorize_train = workflow["+vectorization"]["+train"]
+    assert vectorize_train["+delta"]["_do"]["create_table"] == "train_delta"
+    assert vectorize_train["+append"]["insert_into"] == "train"
+    assert "time > w.watermark" in Path("queries/vectorize_delta.sql").read_text()
+
+    model_table = config["trainer"][0].get("model_table", "model")
+    train = workflow["+main"]["+train"]["+train_0"]["+train"]
+    assert train["_do"]["+blend"]["source"] == "train_delta"
+    assert train["_do"]["+replace"]["rename_tables"] == [{"from": f"{model_table}_incremental", "to": model_table}]
+    assert train["_else_do"]["create_table"] == model_table
+    assert "0.3 as model_weight" in Path("queries/train_classifier_incremental.sql").read_text()
+
+
+def test_dump_yaml_incremental_tree_model():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["incremental"] = {}
+
+    with pytest.raises(ValueError):
+        dump_workflow(config)
+
+
+def test_dump_yaml_segment():
+    config = load_config("titanic_pipeline.yml")
+    config["segment_column"] = "country"
+    config["trainer"] = config["trainer"][:1]
+    config["predictor"] = config["predictor"][:1]
+
+    workflow = dump_workflow(config)
+    assert workflow["+preparation"]["+imputation"]["+combine_train_test_stats"]["create_table"] == \
+        "titanic_combined_stats"
+    assert "  , country\n" in Path("queries/shuffle.sql").read_text()
+    assert "country as segment" in Path("queries/stats.sql").read_text()
+    assert "left join stats st\n    on (country = st.stats_segment)" in Path("queries/impute.sql").read_text()
+    assert "  , country\nfrom" in Path("queries/vectorize.sql").read_text()
+    assert "DISTRIBUTE BY country" in Path("queries/train_classifier.sql").read_text()
+    assert "= m1.country" in Path("queries/predict_classifier.sql").read_text()
+
+
+def test_dump_yaml_segment_categorical_column():
+    config = load_config("titanic_pipeline.yml")
+    config["segment_column"] = "embarked"
+    config["trainer"] = config["trainer"][:1]
+    config["predictor"] = config["predictor"][:1]
+
+    dump_workflow(config)
+    for query in ["shuffle", "impute", "normalize"]:
+        assert Path(f"queries/{query}.sql").read_text().count("embarked\n") == 1
+    assert "left join stats st\n    on (embarked = st.stats_segment)" in Path("queries/impute.sql").read_text()
+
+
+def test_dump_yaml_segment_tree_model():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["segment_column"] = "country"
+
+    with pytest.raises(ValueError):
+        dump_workflow(config)
+
+
+def test_dump_yaml_sources():
+    config = load_config("titanic_pipeline.yml")
+    config["sources"] = {"tables": ["titanic_a", "titanic_b"], "max_concurrency": 2}
+
+    workflow = dump_workflow(config)
+    assert "source" not in workflow["_export"]
+    for_each = workflow["+for_each_source"]
+    assert for_each["for_each>"] == {"source_name": ["titanic_a", "titanic_b"]}
+    assert for_each["_parallel"] == {"limit": 2}
+    assert for_each["_do"]["_export"] == {"source": "${source_name}"}
+    assert for_each["_do"]["+vectorization"]["+train"]["create_table"] == "train_${source_name}"
+    assert for_each["_do"]["+main"]["+train"]["+train_0"]["create_table"] == "model_${source_name}"
+
+
+def test_dump_yaml_sources_query():
+    config = load_config("titanic_pipeline.yml")
+    config["sources"] = {"query": "select table_name as source from source_tables"}
+
+    for_each = dump_workflow(config)["+for_each_source"]
+    assert for_each["td_for_each>"] == "queries/sources.sql"
+    assert "_parallel" not in for_each
+    assert for_each["_do"]["_export"]["source_name"] == "${td.each.source}"
+    assert Path("queries/sources.sql").read_text() == "select table_name as source from source_tables\n;\n"
+
+
+def test_dump_yaml_parallelism():
+    config = load_config("titanic_pipeline.yml")
+    config["parallelism"] = {"max_concurrency": 2, "stages": {"split": 1}}
+
+    workflow = dump_workflow(config)
+    assert workflow["+preparation"]["+split"]["_parallel"] == {"limit": 1}
+    # Presto tasks get a wider limit than Hive tasks
+    assert workflow["+preparation"]["+imputation"]["+execute"]["_parallel"] == {"limit": 2}
+    assert workflow["+preparation"]["+normalization"]["+execute"]["_parallel"] == {"limit": 1}
+    assert workflow["+vectorization"]["_parallel"] == {"limit": 1}
+
+
+def test_dump_yaml_parallelism_without_max_concurrency():
+    config = load_config("titanic_pipeline.yml")
+    config["parallelism"] = {"stages": {"vectorization": 2}}
+
+    workflow = dump_workflow(config)
+    assert workflow["+preparation"]["+split"]["_parallel"] is True
+    assert workflow["+vectorization"]["_parallel"] == {"limit": 2}
+
+
+def test_dump_yaml_planner():
+    config = load_config("titanic_pipeline.yml")
+    Path("profile.yml").write_text(yaml.dump(
+        {"num_rows": 10 ** 9, "bytes": 100 * 1024 ** 3, "columns": {"embarked": {"cardinality": 10 ** 8}}}))
+    config["planner"] = {"profile_file": "profile.yml"}
+
+    workflow = dump_workflow(config)
+    assert workflow["+preparation"]["+split"]["+train"]["engine"] == "hive"
+    assert workflow["+main"]["+train"]["+train_0"]["td>"] == "queries/train_classifier.sql"
+    train_query = Path("queries/train_classifier.sql").read_text()
+    assert train_query.split("\n")[1].startswith("-- plan: stage=train engine=hive")
+    assert "feature_hashing(features)" in train_query
+
+
+def test_dump_yaml_planner_incremental():
+    config = load_config("titanic_pipeline.yml")
+    Path("profile.yml").write_text(yaml.dump({"num_rows": 1000, "bytes": 1024 ** 2, "columns": {}}))
+    config["planner"] = {"profile_file": "profile.yml"}
+    config["incremental"] = {}
+    config["trainer"] = config["trainer"][:1]
+    config["predictor"] = config["predictor"][:1]
+
+    dump_workflow(config)
+    assert "-- plan: stage=vectorization" in Path("queries/vectorize_delta.sql").read_text()
+    assert "-- plan: stage=train" in Path("queries/train_classifier_incremental.sql").read_text()
+    for query in ["train_table_exists", "train_classifier_model_exists"]:
+        assert "-- plan:" not in Path(f"queries/{query}.sql").read_text()
+
+
+def test_dump_yaml_stage_engines():
+    config = load_config("titanic_pipeline.yml")
+    config["stage_engines"] = {"shuffle": "presto", "normalization": "presto"}
+
+    workflow = dump_workflow(config)
+    assert workflow["+preparation"]["+shuffle"]["engine"] == "presto"
+    assert workflow["+preparation"]["+normalization"]["+execute"]["+train"]["engine"] == "presto"
+    assert "random() as rnd" in Path("queries/shuffle.sql").read_text()
+    assert "zscore" not in Path("queries/normalize.sql").read_text()
+
+
+def test_dump_yaml_unknown_stage_engine():
+    config = load_config("titanic_pipeline.yml")
+    config["stage_engines"] = {"vectorization": "presto"}
+
+    with pytest.raises(ValueError):
+        dump_workflow(config)
+
+
+def test_dump_yaml_score_mode():
+    config = load_config("titanic_pipeline.yml")
+    config["scoring"] = {"source": "titanic_new", "schedule": {"daily>": "07:00:00"}}
+
+    workflow = dump_workflow(config, mode="score")
+    assert workflow["schedule"] == {"daily>": "07:00:00"}
+    assert "+train" not in workflow["+vectorization"]
+    assert workflow["+preparation"]["+select"]["create_table"] == "titanic_new_selected"
+    assert workflow["+preparation"]["+imputation"]["+execute"]["source"] == "titanic_new_selected"
+    assert workflow["+preparation"]["+normalization"]["+execute"]["create_table"] == "titanic_new_norm"
+    assert workflow["+vectorization"]["+whole"]["source"] == "titanic_new_norm"
+
+    exec_predict = workflow["+predict"]["+seq_0"]["+exec_predict"]
+    assert exec_predict["target_table"] == "titanic_new_vectorized"
+    assert exec_predict["insert_into"] == "titanic_new_prediction"
+    assert "create_table" not in exec_predict
+    assert "td_time_range(time, '${last_session_time}', '${session_time}')" in Path("queries/score_select.sql").read_text()
+
+
+def test_dump_yaml_score_mode_without_source():
+    config = load_config("titanic_pipeline.yml")
+
+    with pytest.raises(ValueError):
+        dump_workflow(config, mode="score")
+
+
+def test_dump_yaml_leaderboard():
+    config = load_config("titanic_pipeline.yml")
+    config["predictor"].append({"name": "predict_classifier", "model_table": "model", "output_table": "prediction_2"})
+    config["evaluator"]["leaderboard_table"] = "leaderboard"
+
+    workflow = dump_workflow(config)
+    assert list(workflow["+main"]["+predict"]["+seq_1"].keys()) == ["+exec_predict"]
+    assert workflow["+main"]["+leaderboard"] == {
+        "td>": "queries/leaderboard.sql", "create_table": "leaderboard"}
+    query = Path("queries/leaderboard.sql").read_text()
+    assert "'prediction_2' as model" in query
+    assert "test t on (p.rowid = t.rowid)" in query
+
+
+def test_dump_yaml_carry_target():
+    config = load_config("titanic_pipeline.yml")
+    config["evaluator"]["carry_target"] = True
+
+    workflow = dump_workflow(config)
+    assert "actual" not in workflow["+main"]["+predict"]["+seq_0"]["+evaluate"]
+    assert "join" not in Path("queries/evaluate.sql").read_text()
+    assert "  , t1.survived\n" in Path("queries/predict_classifier.sql").read_text()
+
+
+def test_dump_yaml_thresholds():
+    config = load_config("titanic_pipeline.yml")
+    config["evaluator"]["thresholds"] = {"bins": 20}
+
+    workflow = dump_workflow(config)
+    seq = workflow["+main"]["+predict"]["+seq_0"]
+    assert seq["+thresholds"]["create_table"] == "prediction_thresholds"
+    assert "store_last_results" not in seq["+thresholds"]
+    assert seq["+best_threshold"]["threshold_table"] == "prediction_thresholds"
+    assert seq["+best_threshold"]["store_last_results"] is True
+    assert "least(floor(p.probability * 20), 19) as bin" in Path("queries/thresholds.sql").read_text()
+
+
+def test_dump_yaml_bootstrap():
+    config = load_config("titanic_pipeline.yml")
+    config["evaluator"]["bootstrap"] = 50
+
+    workflow = dump_workflow(config)
+    assert workflow["+main"]["+predict"]["+seq_0"]["+show_accuracy"]["echo>"].startswith(
+        "auc: ${td.last_results.auc} [${td.last_results.auc_lower}, ${td.last_results.auc_upper}]")
+    assert "space(50)" in Path("queries/evaluate.sql").read_text()
+
+
+def test_dump_yaml_slices():
+    config = load_config("titanic_pipeline.yml")
+    config["evaluator"]["slices"] = ["embarked", "deck"]
+
+    workflow = dump_workflow(config)
+    evaluate_slices = workflow["+main"]["+predict"]["+seq_0"]["+evaluate_slices"]
+    assert evaluate_slices["create_table"] == "prediction_slices"
+    assert evaluate_slices["actual"] == "test"
+    vectorize_query = Path("queries/vectorize.sql").read_text()
+    assert "  , survived\n  , embarked\n  , deck\n" in vectorize_query
+    assert "grouping sets ((embarked, bin), (deck, bin), (bin))" in Path("queries/evaluate_slices.sql").read_text()
+
+
+def test_dump_yaml_slices_carry_target_tree_model():
+    config = load_config("titanic_pipeline_rf.yml")
+    config["evaluator"]["slices"] = ["sex"]
+    config["evaluator"]["carry_target"] = True
+
+    dump_workflow(config)
+    assert "  , t.sex\n" in Path("queries/predict_randomforest_classifier.sql").read_text()
+    assert "  , survived\n  , sex\nfrom" in Path("queries/vectorize_dense.sql").read_text()
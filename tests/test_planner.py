@@ -0,0 +1,52 @@
+import math
+from molehill.planner import Plan, plan_pipeline, load_table_profile, estimate_cost, query_stage
+
+
+def test_estimate_cost():
+    assert estimate_cost("presto", 0) == 5.0
+    assert estimate_cost("hive", 64 * 1024 ** 2) == 61.0
+    assert estimate_cost("presto", 65 * 1024 ** 3) == math.inf
+
+
+def test_query_stage():
+    assert query_stage("normalize_whole.sql") == "normalization"
+    assert query_stage("stats_chunk_0.sql") == "stats"
+    assert query_stage("split_test.sql") == "split"
+    assert query_stage("profile.sql") is None
+    assert query_stage("train_table_exists.sql") is None
+    assert query_stage("train_classifier_model_exists.sql") is None
+
+
+def test_plan_pipeline_small_table():
+    table_profile = {"num_rows": 1000, "bytes": 1024 ** 2, "columns": {"cat1": {"cardinality": 10}}}
+    plan = plan_pipeline(table_profile, ["cat1"], 2)
+
+    assert plan.engines["split"] == "presto"
+    assert plan.engines["normalization"] == "presto"
+    assert plan.engines["vectorization"] == "hive"
+    assert not plan.hashing
+    assert plan.chunk_size is None
+    assert plan.comment("split") == \
+        "-- plan: stage=split engine=presto estimated_cost=5.0s hashing=false chunk_size=none"
+
+
+def test_plan_pipeline_large_table():
+    table_profile = {"num_rows": 10 ** 9, "bytes": 100 * 1024 ** 3, "columns": {"cat1": {"cardinality": 10 ** 8}}}
+    plan = plan_pipeline(table_profile, ["cat1"], 1200)
+
+    assert plan.engines["split"] == "hive"
+    # Presto is kept for stats since no other engine can execute them
+    assert plan.engines["stats"] == "presto"
+    assert plan.costs["stats"] != math.inf
+    assert plan.hashing
+    assert plan.chunk_size == 400
+
+
+def test_load_table_profile_csv(tmp_path):
+    profile_file = tmp_path / "profile.csv"
+    profile_file.write_text("column_name,cardinality,null_rate,num_rows\ncat1,10,0.0,100\nnum1,50,0.1,100\n")
+
+    table_profile = load_table_profile(profile_file)
+    assert table_profile["num_rows"] == 100
+    assert table_profile["bytes"] == 1600
+    assert table_profile["columns"]["cat1"]["cardinality"] == 10
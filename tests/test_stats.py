@@ -1,5 +1,7 @@
 import molehill
-from molehill.stats import compute_stats, combine_train_test_stats
+from molehill.stats import compute_stats, combine_train_test_stats, percentile_name
+from molehill.stats import compute_stats_long, combine_train_test_stats_long, pivot_stats
+from molehill.stats import partition_summaries, merge_partition_summaries
 
 
 def test_compute_stats():
@@ -58,3 +60,150 @@ from
 """
 
     assert combine_train_test_stats('src_tbl', ['col1']) == ret_sql
+
+
+def test_compute_stats_with_percentiles():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  avg(col1) as col1_mean
+  , stddev_pop(col1) as col1_std
+  , min(col1) as col1_min
+  , approx_percentile(col1, 0.25) as col1_25
+  , approx_percentile(col1, 0.5) as col1_median
+  , approx_percentile(col1, 0.75) as col1_75
+  , max(col1) as col1_max
+  , approx_percentile(col1, 0.1) as col1_p10
+  , approx_percentile(col1, 0.9) as col1_p90
+from
+  src_tbl
+;
+"""
+    assert compute_stats('src_tbl', ['col1'], [0.1, 0.9]) == ret_sql
+
+
+def test_percentile_name():
+    assert percentile_name(0.1) == "p10"
+    assert percentile_name(0.125) == "p12_5"
+
+
+def test_compute_stats_long():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+with aggregated as (
+  select
+    t.column_name
+    , avg(t.value) as v_mean
+    , stddev_pop(t.value) as v_std
+    , min(t.value) as v_min
+    , approx_percentile(t.value, 0.25) as v_25
+    , approx_percentile(t.value, 0.5) as v_median
+    , approx_percentile(t.value, 0.75) as v_75
+    , approx_percentile(t.value, 0.1) as v_p10
+    , max(t.value) as v_max
+  from
+    src_tbl
+    cross join unnest(
+      array['col1', 'col2']
+      , array[cast(col1 as double), cast(col2 as double)]
+    ) as t(column_name, value)
+  group by
+    t.column_name
+)
+-- DIGDAG_INSERT_LINE
+select
+  a.column_name
+  , s.stat
+  , s.value
+from
+  aggregated a
+  cross join unnest(
+    array['mean', 'std', 'min', '25', 'median', '75', 'max', 'p10']
+    , array[a.v_mean, a.v_std, a.v_min, a.v_25, a.v_median, a.v_75, a.v_max, a.v_p10]
+  ) as s(stat, value)
+;
+"""
+    assert compute_stats_long('src_tbl', ['col1', 'col2'], [0.1]) == ret_sql
+
+
+def test_compute_stats_long_segment():
+    query = compute_stats_long('src_tbl', ['col1'], segment_column='country')
+    assert "  select\n    country as segment\n    , t.column_name\n" in query
+    assert "  group by\n    country, t.column_name\n" in query
+    assert "select\n  a.segment\n  , a.column_name\n" in query
+
+
+def test_combine_train_test_stats_long():
+    query = combine_train_test_stats_long('src_tbl')
+    assert "'train' as phase" in query
+    assert "from\n    src_tbl_train_stats\n  union all" in query
+    assert "from\n    src_tbl_test_stats\n  union all" in query
+    assert "from\n    src_tbl_stats\n)" in query
+
+
+def test_pivot_stats():
+    ret_sql = """\
+select
+  max(case when column_name = 'col1' and stat = 'median' and phase = 'train' then value end) as col1_median_train
+  , max(case when column_name = 'col1' and stat = 'max' and phase = 'whole' then value end) as col1_max
+from
+  src_tbl_combined_stats"""
+    required_stats = [("col1", "median", "train"), ("col1", "max", "whole"), ("col1", "median", "train")]
+    assert pivot_stats('src_tbl_combined_stats', required_stats) == ret_sql
+
+
+def test_pivot_stats_segment():
+    ret_sql = """\
+select
+  segment as stats_segment
+  , max(case when column_name = 'col1' and stat = 'mean' and phase = 'whole' then value end) as col1_mean
+from
+  src_tbl_combined_stats
+group by
+  segment"""
+    assert pivot_stats('src_tbl_combined_stats', [("col1", "mean", "whole")], segmented=True) == ret_sql
+    assert "  segment\n  , column_name\n" in combine_train_test_stats_long('src_tbl', segmented=True)
+
+
+def test_partition_summaries():
+    ret_sql = f"""\
+-- client: molehill/{molehill.__version__}
+select
+  td_time_string(time, 'd!') as partition_key
+  , t.column_name
+  , count(t.value) as cnt
+  , sum(t.value) as sum_value
+  , sum(t.value * t.value) as sum_squares
+  , min(t.value) as min_value
+  , max(t.value) as max_value
+  , cast(qdigest_agg(t.value) as varbinary) as digest
+from
+  src_tbl
+  cross join unnest(
+    array['col1']
+    , array[cast(col1 as double)]
+  ) as t(column_name, value)
+where
+  td_time_string(time, 'd!') < '2019-01-01'
+group by
+  td_time_string(time, 'd!'), t.column_name
+;
+"""
+    assert partition_summaries(
+        'src_tbl', ['col1'], "td_time_string(time, 'd!')",
+        condition="where\n  td_time_string(time, 'd!') < '2019-01-01'") == ret_sql
+
+
+def test_merge_partition_summaries():
+    query = merge_partition_summaries('src_tbl_history', 'src_tbl', ['col1'], "td_time_string(time, 'd!')", [0.1])
+    assert "from\n    src_tbl_history\n  union all" in query
+    assert "td_time_string(time, 'd!') > coalesce((select max(partition_key) from src_tbl_history), '')" in query
+    assert "merge(cast(digest as qdigest(double))) as digest" in query
+    assert "sqrt(greatest(sum_squares / cnt - pow(sum_value / cnt, 2), 0.0)) as v_std" in query
+    assert "value_at_quantile(digest, 0.1) as v_p10" in query
+    assert "max(case when column_name = 'col1' then v_median end) as col1_median" in query
+    assert "max(case when column_name = 'col1' then v_p10 end) as col1_p10" in query
+
+    query = merge_partition_summaries(
+        'src_tbl_history', 'src_tbl', ['col1'], "td_time_string(time, 'd!')", long_format=True)
+    assert "as s(stat, value)" in query
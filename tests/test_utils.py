@@ -1,5 +1,6 @@
+import pytest
 import molehill
-from molehill.utils import build_query
+from molehill.utils import build_query, chunk_columns
 
 
 def test_build_query():
@@ -64,3 +65,11 @@ select
 from
   other"""
     assert build_query(['col1', 'col2'], 'sample_datasets', with_clauses={'test': with_clause}) == ret_sql
+
+
+def test_chunk_columns():
+    assert chunk_columns(['col1', 'col2', 'col3'], 2) == [['col1', 'col2'], ['col3']]
+    assert chunk_columns(['col1'], 2) == [['col1']]
+
+    with pytest.raises(ValueError):
+        chunk_columns(['col1'], 0)